@@ -1,95 +1,930 @@
 """
 AI service layer for handling Gemini API interactions
 """
+import asyncio
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
 from google import genai
-from google.genai import types
-from config import API_KEY, GEMINI_MODEL, GEMINI_CONFIG
+from google.genai import errors, types
+from config import (
+    API_KEY, GEMINI_MODEL, GEMINI_CONFIG,
+    GEMINI_POOL_SIZE, GEMINI_KEEPALIVE_EXPIRY, DOCUMENT_UPLOAD_ENABLED,
+    CONTEXT_CACHE_ENABLED, HISTORY_COUNT_TOKENS_API, EMBEDDING_MODEL,
+    COMPARE_MAX_CONCURRENCY, COMPARE_TIMEOUT_SECONDS, RETRIEVAL_EMBEDDING_WEIGHT, EMBEDDING_BATCH_SIZE,
+    HEDGING_ENABLED, GEMINI_BACKEND, FAKE_LATENCY_SECONDS, FAKE_CHUNK_INTERVAL_SECONDS,
+    EXTRACTION_CONFIG, EXTRACTION_WORKERS, EXTRACTION_MAX_ATTEMPTS, MODEL_ROUTES, MODEL_PRICES
+)
+from pydantic import ValidationError
+from document_store import get_document_store, hash_document
+from attachment_cache import AttachmentCache
+from context_cache import get_context_cache_manager
+from history_manager import estimate_tokens, content_text
+from document_ingest import ingest_documents
+from retrieval import retrieve, format_passages
+from resilience import get_resilient_caller
+from tracing import tracer, usage_to_dict
+from extraction import (
+    DocumentExtraction, ExtractionRecord, EXTRACTION_INSTRUCTIONS, get_extraction_store
+)
+
+
+HISTORY_SUMMARY_INSTRUCTION = (
+    "You maintain a running summary of a legal consultation between a lawyer and co-counsel. "
+    "Merge the previous summary with the new exchanges into one concise summary. Preserve facts, "
+    "dates, parties, statutes and articles cited, procedural posture, conclusions reached and open "
+    "questions. Write in the language of the conversation. Output only the summary."
+)
+
+
+_client = None
+_client_lock = threading.Lock()
+_connection_stats = {"created": 0, "reused": 0}
+_connection_stats_lock = threading.Lock()
+_async_loop = None
+_async_loop_lock = threading.Lock()
+
+# Used when no route is given: the base model and config, unchanged
+DEFAULT_ROUTE = {"name": "default", "model": GEMINI_MODEL, "max_output_tokens": None, "thinking_budget": None}
+
+
+class _CountingTransport(httpx.HTTPTransport):
+    """HTTP transport that counts new versus reused pooled connections"""
+    
+    def handle_request(self, request):
+        # httpcore reports each TCP connect to the request's own trace callback,
+        # so concurrent requests cannot be credited with each other's connections
+        connected = []
+        outer_trace = request.extensions.get("trace")
+        
+        def trace(event_name, info):
+            if event_name == "connection.connect_tcp.started":
+                connected.append(True)
+            if outer_trace is not None:
+                outer_trace(event_name, info)
+        
+        request.extensions = {**request.extensions, "trace": trace}
+        response = super().handle_request(request)
+        
+        with _connection_stats_lock:
+            _connection_stats["created" if connected else "reused"] += 1
+        
+        return response
+
+
+def get_client():
+    """
+    Get the process-wide Gemini client, creating it on first use
+    
+    The client keeps a pool of keep-alive HTTP connections that is shared
+    by every session served by this process.
+    
+    Returns:
+        genai.Client: Shared Gemini client
+    """
+    global _client
+    
+    if _client is None:
+        with _client_lock:
+            if _client is None and GEMINI_BACKEND == "fake":
+                # Offline stand-in for load tests; never ships real traffic
+                from fake_gemini import FakeGeminiClient
+                _client = FakeGeminiClient(
+                    "Offline answer. " * 40,
+                    latency=FAKE_LATENCY_SECONDS,
+                    chunk_interval=FAKE_CHUNK_INTERVAL_SECONDS
+                )
+            elif _client is None:
+                limits = httpx.Limits(
+                    max_connections=GEMINI_POOL_SIZE,
+                    max_keepalive_connections=GEMINI_POOL_SIZE,
+                    keepalive_expiry=GEMINI_KEEPALIVE_EXPIRY
+                )
+                _client = genai.Client(
+                    api_key=API_KEY,
+                    http_options=types.HttpOptions(
+                        client_args={"transport": _CountingTransport(limits=limits)},
+                        async_client_args={"limits": limits}
+                    )
+                )
+    
+    return _client
+
+
+def get_connection_stats():
+    """
+    Get connection pool usage counters for the shared client
+    
+    Returns:
+        dict: Number of requests that opened a new connection ('created')
+            and that reused a pooled one ('reused')
+    """
+    with _connection_stats_lock:
+        return dict(_connection_stats)
+
+
+def run_async(coroutine):
+    """
+    Run a coroutine on the process-wide background event loop
+    
+    The shared client's async connections belong to one event loop, so all
+    async calls go through a single long-lived loop instead of asyncio.run.
+    
+    Args:
+        coroutine: Coroutine to run
+        
+    Returns:
+        Any: The coroutine's result
+    """
+    global _async_loop
+    
+    with _async_loop_lock:
+        if _async_loop is None:
+            _async_loop = asyncio.new_event_loop()
+            threading.Thread(
+                target=_async_loop.run_forever,
+                name="gemini-async-loop",
+                daemon=True
+            ).start()
+    
+    return asyncio.run_coroutine_threadsafe(coroutine, _async_loop).result()
+
+
+def route_request(settings, prompt, history_messages=0, routes=MODEL_ROUTES):
+    """
+    Pick the model and generation limits for a request
+    
+    Args:
+        settings (dict): User settings from sidebar
+        prompt (str): User prompt
+        history_messages (int): Messages in the conversation before the prompt
+        routes (list): Routing rules, first match wins
+        
+    Returns:
+        dict: Route with 'name', 'model', 'max_output_tokens' and 'thinking_budget'
+    """
+    features = {
+        "depth": settings.get("analysis_depth", "Standard Analysis"),
+        "attachment_bytes": sum(uploaded_file.size for uploaded_file in settings.get("uploaded_files") or ()),
+        "prompt_chars": len(prompt),
+        "history_messages": history_messages
+    }
+    
+    for route in routes:
+        if _route_matches(route.get("when") or {}, features):
+            return route
+    
+    return DEFAULT_ROUTE
+
+
+def _route_matches(when, features):
+    """Whether request features satisfy every condition of a route"""
+    if "depths" in when and features["depth"] not in when["depths"]:
+        return False
+    
+    for feature in ("attachment_bytes", "prompt_chars", "history_messages"):
+        if features[feature] < when.get(f"min_{feature}", features[feature]):
+            return False
+        if features[feature] > when.get(f"max_{feature}", features[feature]):
+            return False
+    
+    return True
+
+
+def estimate_cost(model, usage):
+    """
+    Estimate the price of a response from its token usage
+    
+    Args:
+        model (str): Model that answered
+        usage (dict): Token counts from usage_to_dict
+        
+    Returns:
+        float: Cost in USD, 0.0 for models without a configured price
+    """
+    prices = MODEL_PRICES.get(model)
+    if not prices or not usage:
+        return 0.0
+    
+    cached = usage.get("cached_content_token_count", 0)
+    uncached = max(0, usage.get("prompt_token_count", 0) - cached)
+    output = usage.get("candidates_token_count", 0) + usage.get("thoughts_token_count", 0)
+    return (uncached * prices["input"] + cached * prices["cached_input"] + output * prices["output"]) / 1e6
+
+
+tracer.register_collector("connections", get_connection_stats)
+tracer.register_collector("resilience", lambda: get_resilient_caller().snapshot())
+
+
+def is_file_reference_error(exc):
+    """
+    Decide whether the model rejected a Files API reference
+    
+    Files deleted or expired before their recorded expiry are reported as
+    a permission or not-found error naming the file.
+    
+    Args:
+        exc (Exception): Error raised by a model call
+        
+    Returns:
+        bool: True if re-uploading the documents may fix the request
+    """
+    return (
+        isinstance(exc, errors.APIError)
+        and exc.code in (400, 403, 404)
+        and "file" in (exc.message or "").lower()
+    )
 
 
 class GeminiService:
     """Handles all interactions with Google's Gemini API"""
     
-    def __init__(self):
-        """Initialize Gemini client"""
-        self.client = genai.Client(api_key=API_KEY)
+    def __init__(self, client=None, route=None):
+        """
+        Initialize the service
+        
+        Args:
+            client (genai.Client): Client to use, defaults to the shared client
+            route (dict): Model and generation limits from route_request(),
+                defaults to GEMINI_MODEL with GEMINI_CONFIG
+        """
+        self.client = client or get_client()
+        self.route = route or DEFAULT_ROUTE
+        self.model = self.route["model"]
+        self.documents = get_document_store(self.client)
+        self.context_caches = get_context_cache_manager(self.client)
+        self.resilience = get_resilient_caller()
+        self.last_turn_stats = {}
+        self.last_call_metrics = {}
+        # File URI -> (bytes, display name, digest) of documents this service uploaded
+        self._document_sources = {}
     
-    def build_conversation_history(self, messages):
+    def message_to_content(self, msg):
+        """
+        Convert one Streamlit message to Gemini format
+        
+        Args:
+            msg (dict): Message dictionary with 'role' and 'content'
+            
+        Returns:
+            types.Content: Converted message, or None for unsupported roles
+        """
+        if msg["role"] == "user":
+            return types.Content(
+                role="user",
+                parts=[types.Part.from_text(text=msg["content"])]
+            )
+        elif msg["role"] == "assistant":
+            return types.Content(
+                role="model",
+                parts=[types.Part.from_text(text=msg["content"])]
+            )
+        
+        return None
+    
+    def build_conversation_history(self, messages, history_cache=None):
         """
         Convert Streamlit message history to Gemini format
         
         Args:
             messages (list): List of message dictionaries with 'role' and 'content'
+            history_cache (ConversationHistoryCache): Optional cache of already
+                converted messages, extended with new turns only
             
         Returns:
             list: Formatted conversation contents for Gemini
         """
+        if history_cache is not None:
+            return history_cache.build(messages, self.message_to_content)
+        
         conversation_contents = []
         
         for msg in messages:
-            if msg["role"] == "user":
-                conversation_contents.append(
-                    types.Content(
-                        role="user",
-                        parts=[types.Part.from_text(text=msg["content"])]
-                    )
-                )
-            elif msg["role"] == "assistant":
-                conversation_contents.append(
-                    types.Content(
-                        role="model",
-                        parts=[types.Part.from_text(text=msg["content"])]
-                    )
-                )
+            content = self.message_to_content(msg)
+            if content is not None:
+                conversation_contents.append(content)
         
         return conversation_contents
     
-    def prepare_message_with_files(self, prompt, uploaded_files=None):
+    def count_contents_tokens(self, contents):
+        """
+        Count the tokens of several conversation contents in one request
+        
+        The count_tokens API only reports a total, which is shared out in
+        proportion to the local estimate of each content. Without the API,
+        or if the call fails, the local estimates are returned.
+        
+        Args:
+            contents (list): Conversation contents
+            
+        Returns:
+            list: Token count per content
+        """
+        estimates = [estimate_tokens(content_text(content)) for content in contents]
+        if not HISTORY_COUNT_TOKENS_API or not contents:
+            return estimates
+        
+        try:
+            result, _ = self.resilience.call(
+                lambda: self.client.models.count_tokens(model=self.model, contents=contents),
+                kind="count_tokens"
+            )
+        except Exception:
+            return estimates
+        
+        if result.total_tokens is None or not sum(estimates):
+            return estimates
+        
+        scale = result.total_tokens / sum(estimates)
+        return [max(1, round(estimate * scale)) for estimate in estimates]
+    
+    def summarize_history(self, previous_summary, contents):
+        """
+        Fold conversation contents into a rolling summary
+        
+        Args:
+            previous_summary (str): Summary of everything before contents
+            contents (list): Conversation contents to fold in
+            
+        Returns:
+            str: Updated summary
+        """
+        transcript = "\n\n".join(
+            f"{'Lawyer' if content.role == 'user' else 'Co-counsel'}: {content_text(content)}"
+            for content in contents
+        )
+        request = f"PREVIOUS SUMMARY:\n{previous_summary or '(none)'}\n\nNEW EXCHANGES:\n{transcript}"
+        
+        response, _ = self.resilience.call(
+            lambda: self.client.models.generate_content(
+                model=GEMINI_MODEL,
+                contents=request,
+                config={"system_instruction": HISTORY_SUMMARY_INSTRUCTION, **GEMINI_CONFIG}
+            ),
+            kind="summary"
+        )
+        
+        return response.text
+    
+    def embed_texts(self, texts):
+        """
+        Embed several texts, EMBEDDING_BATCH_SIZE per rate-limited request
+        
+        Args:
+            texts (list): Texts to embed
+            
+        Returns:
+            list: One embedding vector per text, in order
+        """
+        vectors = []
+        
+        for start in range(0, len(texts), EMBEDDING_BATCH_SIZE):
+            batch = texts[start:start + EMBEDDING_BATCH_SIZE]
+            response, _ = self.resilience.call(
+                lambda: self.client.models.embed_content(model=EMBEDDING_MODEL, contents=batch),
+                kind="embedding"
+            )
+            vectors.extend(embedding.values for embedding in response.embeddings)
+        
+        return vectors
+    
+    def prepare_document_parts(self, uploaded_files=None, attachments=None):
+        """
+        Prepare message parts for uploaded files
+        
+        Files are uploaded once through the Files API and referenced by URI
+        on later turns; they are inlined only if uploading is disabled.
+        
+        Args:
+            uploaded_files (list): List of uploaded file objects
+            attachments (AttachmentCache): Session cache the files are read
+                through; without it every call reads and hashes them again
+            
+        Returns:
+            list: One part per uploaded file
+        """
+        return [
+            self.document_part(attachment.data, attachment.name, attachment.digest)
+            for attachment in self._attachments(uploaded_files, attachments)
+        ]
+    
+    def _attachments(self, uploaded_files, attachments=None):
+        """Cached attachment for each uploaded file"""
+        if not uploaded_files:
+            return []
+        attachments = attachments or AttachmentCache(spill_bytes=0)
+        return [attachments.get(uploaded_file) for uploaded_file in uploaded_files]
+    
+    def document_part(self, file_bytes, display_name=None, digest=None):
+        """
+        Prepare the message part for one PDF
+        
+        Args:
+            file_bytes (bytes | memoryview): Raw PDF bytes
+            display_name (str): File name shown in the Files API
+            digest (str): Precomputed content hash, computed if omitted
+            
+        Returns:
+            types.Part: Files API reference, or inline data if uploading is disabled
+        """
+        if DOCUMENT_UPLOAD_ENABLED:
+            entry = self.documents.get_file(
+                file_bytes,
+                mime_type="application/pdf",
+                display_name=display_name,
+                digest=digest
+            )
+            # Kept so a reference the model rejects can be uploaded again
+            self._document_sources[entry["uri"]] = (file_bytes, display_name, entry["digest"])
+            return types.Part.from_uri(file_uri=entry["uri"], mime_type=entry["mime_type"])
+        
+        # Inline parts must be bytes; only a spilled file is copied here
+        return types.Part.from_bytes(
+            data=file_bytes if isinstance(file_bytes, bytes) else bytes(file_bytes),
+            mime_type="application/pdf"
+        )
+    
+    def ingest_documents(self, uploaded_files=None, attachments=None):
+        """
+        Extract page-level text chunks from uploaded PDFs locally
+        
+        Args:
+            uploaded_files (list): List of uploaded file objects
+            attachments (AttachmentCache): Session cache the files are read through
+            
+        Returns:
+            dict: Per content hash, a dict with 'name' and 'chunks'
+        """
+        if not uploaded_files:
+            return {}
+        
+        return ingest_documents([
+            (attachment.name, attachment.data, attachment.digest)
+            for attachment in self._attachments(uploaded_files, attachments)
+        ])
+    
+    def prepare_passage_parts(self, prompt, uploaded_files, detected_lang="en", attachments=None):
+        """
+        Prepare message parts carrying only the passages relevant to the prompt
+        
+        Args:
+            prompt (str): User's text prompt, used as the search query
+            uploaded_files (list): List of uploaded file objects
+            detected_lang (str): Detected language ('en' or 'el')
+            attachments (AttachmentCache): Session cache the files are read through
+            
+        Returns:
+            list: A text part with cited passages, followed by a full document
+                part for each file no text could be extracted from (e.g. scans)
+        """
+        if not uploaded_files:
+            return []
+        
+        attachments = attachments or AttachmentCache(spill_bytes=0)
+        documents = self.ingest_documents(uploaded_files, attachments)
+        chunks = [chunk for document in documents.values() for chunk in document["chunks"]]
+        
+        parts = []
+        passages = retrieve(
+            prompt,
+            chunks,
+            embed=self.embed_texts if RETRIEVAL_EMBEDDING_WEIGHT > 0 else None
+        )
+        if passages:
+            document_names = {doc_hash: document["name"] for doc_hash, document in documents.items()}
+            parts.append(types.Part.from_text(
+                text=format_passages(passages, document_names, detected_lang == "el")
+            ))
+        
+        # Documents without text reach the model whole, next to the others' passages
+        sent = set()
+        for attachment in self._attachments(uploaded_files, attachments):
+            if not documents[attachment.digest]["chunks"] and attachment.digest not in sent:
+                sent.add(attachment.digest)
+                parts.append(self.document_part(attachment.data, attachment.name, attachment.digest))
+        
+        return parts
+    
+    def extract_document(self, name, file_bytes, language="en"):
+        """
+        Extract the Document Analysis Protocol fields of one document as a typed record
+        
+        The model is constrained to the DocumentExtraction schema and its
+        output is validated locally; records are cached by document hash.
+        
+        Args:
+            name (str): Document file name
+            file_bytes (bytes): Raw PDF bytes
+            language (str): Language of the extracted text ('en' or 'el')
+            
+        Returns:
+            ExtractionRecord: Validated record
+            
+        Raises:
+            ValueError: If the model output does not match the schema
+        """
+        document_hash = hash_document(file_bytes)
+        store = get_extraction_store()
+        
+        record = store.get(document_hash, language)
+        if record is not None:
+            return record
+        
+        contents = [types.Content(role="user", parts=[
+            self.document_part(file_bytes, name),
+            types.Part.from_text(text=f"Document: {name}")
+        ])]
+        config = {
+            "system_instruction": EXTRACTION_INSTRUCTIONS[language],
+            **EXTRACTION_CONFIG,
+            "response_schema": DocumentExtraction
+        }
+        
+        for attempt in range(EXTRACTION_MAX_ATTEMPTS):
+            response, _ = self.resilience.call(
+                lambda: self.client.models.generate_content(
+                    model=GEMINI_MODEL,
+                    contents=contents,
+                    config=config
+                ),
+                kind="extraction"
+            )
+            try:
+                extraction = DocumentExtraction.model_validate_json(response.text or "")
+                break
+            except ValidationError as exc:
+                error = exc
+        else:
+            first = error.errors()[0]
+            raise ValueError(
+                f"Extraction for {name} did not match the schema "
+                f"({error.error_count()} errors, first at {'.'.join(map(str, first['loc']))}: {first['msg']})"
+            )
+        
+        record = ExtractionRecord(document_hash=document_hash, document_name=name, extraction=extraction)
+        store.put(record, language)
+        return record
+    
+    def extract_documents(self, documents, language="en"):
+        """
+        Extract several documents concurrently
+        
+        Args:
+            documents (list): (file name, bytes) tuples
+            language (str): Language of the extracted text ('en' or 'el')
+            
+        Returns:
+            tuple: (list of ExtractionRecord in document order, dict of
+                file name to error message for failed documents)
+        """
+        def extract(document):
+            try:
+                return self.extract_document(document[0], document[1], language), None
+            except Exception as exc:
+                return None, str(exc)
+        
+        with ThreadPoolExecutor(max_workers=EXTRACTION_WORKERS) as executor:
+            results = list(executor.map(extract, documents))
+        
+        records = [record for record, _ in results if record is not None]
+        errors = {name: error for (name, _), (_, error) in zip(documents, results) if error}
+        return records, errors
+    
+    def prepare_message_with_files(self, prompt, uploaded_files=None, document_parts=None):
         """
         Prepare the current message with optional file attachments
         
         Args:
             prompt (str): User's text prompt
             uploaded_files (list): List of uploaded file objects
+            document_parts (list): Already prepared document parts, used
+                instead of uploaded_files when given
             
         Returns:
             list: Message parts including text and files
         """
-        current_parts = []
+        if document_parts is None:
+            document_parts = self.prepare_document_parts(uploaded_files)
         
-        # Add files if present
-        if uploaded_files:
-            for uploaded_file in uploaded_files:
-                file_bytes = uploaded_file.read()
-                current_parts.append(
-                    types.Part.from_bytes(
-                        data=file_bytes,
-                        mime_type="application/pdf"
-                    )
-                )
+        current_parts = list(document_parts)
         
         # Add text prompt
         current_parts.append(types.Part.from_text(text=prompt))
         
         return current_parts
     
-    def generate_response(self, conversation_contents, system_instruction):
+    def get_cached_context(self, cache_key, system_instruction, document_parts=None):
+        """
+        Get a server-side cache holding the system prompt and pinned documents
+        
+        Args:
+            cache_key (tuple): Key from context_cache.build_cache_key
+            system_instruction (str): System prompt for the model
+            document_parts (list): Document parts to pin into the cache
+            
+        Returns:
+            str: Cached content name, or None to send everything inline
+        """
+        if not CONTEXT_CACHE_ENABLED:
+            return None
+        
+        return self.context_caches.get(cache_key, system_instruction, document_parts)
+    
+    def build_generation_config(self, system_instruction, cached_content=None):
+        """
+        Build the generation config for a request
+        
+        Args:
+            system_instruction (str): System prompt for the model
+            cached_content (str): Cached content already holding the prompt
+            
+        Returns:
+            dict: Generation config
+        """
+        if cached_content:
+            return {"cached_content": cached_content, **self.generation_settings()}
+        return {"system_instruction": system_instruction, **self.generation_settings()}
+    
+    def generation_settings(self):
+        """
+        Sampling settings and the routed generation limits
+        
+        Returns:
+            dict: Generation config without the system prompt
+        """
+        config = dict(GEMINI_CONFIG)
+        
+        if self.route.get("max_output_tokens"):
+            config["max_output_tokens"] = self.route["max_output_tokens"]
+        if self.route.get("thinking_budget") is not None:
+            config["thinking_config"] = {"thinking_budget": self.route["thinking_budget"]}
+        
+        return config
+    
+    def refresh_documents(self, conversation_contents):
+        """
+        Upload again the documents referenced by a request whose files were rejected
+        
+        Their registry entries are invalidated first, so other sessions and
+        replicas stop using the dead references too.
+        
+        Args:
+            conversation_contents (list): Request contents (Content objects or dicts)
+            
+        Returns:
+            list: Contents with fresh file references, or None if they
+                reference no document this service uploaded
+        """
+        fresh_parts = {}
+        refreshed = []
+        
+        for content in conversation_contents:
+            if isinstance(content, dict):
+                role, parts = content["role"], content["parts"]
+            else:
+                role, parts = content.role, content.parts
+            new_parts = []
+            for part in parts or []:
+                file_data = getattr(part, "file_data", None)
+                source = self._document_sources.get(file_data.file_uri) if file_data is not None else None
+                if source is not None:
+                    file_bytes, display_name, digest = source
+                    if digest not in fresh_parts:
+                        self.documents.invalidate(digest)
+                        fresh_parts[digest] = self.document_part(file_bytes, display_name, digest)
+                    part = fresh_parts[digest]
+                new_parts.append(part)
+            refreshed.append({"role": role, "parts": new_parts})
+        
+        return refreshed if fresh_parts else None
+    
+    def _with_fresh_documents(self, request, conversation_contents):
+        """
+        Make a request, retrying once with re-uploaded documents if a file reference is rejected
+        
+        Args:
+            request (callable): Makes the call for the given contents
+            conversation_contents (list): Request contents
+            
+        Returns:
+            Any: The request's result
+        """
+        try:
+            return request(conversation_contents)
+        except errors.APIError as exc:
+            refreshed = self.refresh_documents(conversation_contents) if is_file_reference_error(exc) else None
+            if refreshed is None:
+                raise
+        
+        tracer.increment("document_reuploads_total")
+        return request(refreshed)
+    
+    def _record_route(self, stats):
+        """Add route, model and cost to a turn's stats and to the per-route metrics"""
+        name = self.route["name"]
+        stats.update(route=name, model=self.model, cost_usd=estimate_cost(self.model, stats["usage"]))
+        tracer.observe(f"route_{name}", stats["total_latency"])
+        tracer.increment(f"route_{name}_requests_total")
+        tracer.increment(f"route_{name}_cost_usd_total", stats["cost_usd"])
+    
+    def generate_response(self, conversation_contents, system_instruction, cached_content=None):
         """
         Generate a response from Gemini
         
         Args:
             conversation_contents (list): Full conversation history
             system_instruction (str): System prompt for the model
+            cached_content (str): Cached content replacing the inline prompt
             
         Returns:
             str: Generated response text
         """
-        response = self.client.models.generate_content(
-            model=GEMINI_MODEL,
-            contents=conversation_contents,
-            config={
-                "system_instruction": system_instruction,
-                **GEMINI_CONFIG
-            }
+        start_time = time.perf_counter()
+        
+        response, self.last_call_metrics = self._with_fresh_documents(
+            lambda contents: self.resilience.call(
+                lambda: self.client.models.generate_content(
+                    model=self.model,
+                    contents=contents,
+                    config=self.build_generation_config(system_instruction, cached_content)
+                ),
+                hedge=HEDGING_ENABLED
+            ),
+            conversation_contents
         )
         
+        total_latency = time.perf_counter() - start_time
+        self.last_turn_stats = {
+            "time_to_first_token": total_latency,
+            "total_latency": total_latency,
+            "streamed": False,
+            "usage": usage_to_dict(response.usage_metadata),
+            **self.last_call_metrics
+        }
+        self._record_route(self.last_turn_stats)
+        
         return response.text
+    
+    def stream_response(self, conversation_contents, system_instruction, cached_content=None):
+        """
+        Stream a response from Gemini chunk by chunk
+        
+        Timing for the turn (time to first token and total latency, in
+        seconds) is stored in ``last_turn_stats`` once the stream is exhausted.
+        Failures are retried only until the first chunk arrives; with
+        HEDGING_ENABLED, a slow first chunk is raced by a second request.
+        
+        Args:
+            conversation_contents (list): Full conversation history
+            system_instruction (str): System prompt for the model
+            cached_content (str): Cached content replacing the inline prompt
+            
+        Yields:
+            str: Text chunks as they arrive from the model
+        """
+        start_time = time.perf_counter()
+        first_token_time = None
+        usage_metadata = None
+        self.last_turn_stats = {}
+        
+        def open_stream(contents):
+            # Errors surface on iteration, so pull the first chunk inside the retry
+            stream = iter(self.client.models.generate_content_stream(
+                model=self.model,
+                contents=contents,
+                config=self.build_generation_config(system_instruction, cached_content)
+            ))
+            return next(stream, None), stream
+        
+        def close_stream(opened):
+            close = getattr(opened[1], "close", None)
+            if close is not None:
+                close()
+        
+        # Hedged on time to first chunk: the slow part that a second request can win
+        (first_chunk, stream), self.last_call_metrics = self._with_fresh_documents(
+            lambda contents: self.resilience.call(
+                lambda: open_stream(contents),
+                hedge=HEDGING_ENABLED,
+                kind="stream_open",
+                discard=close_stream
+            ),
+            conversation_contents
+        )
+        
+        for chunk in itertools.chain([] if first_chunk is None else [first_chunk], stream):
+            # Token usage is reported on the final chunk
+            if chunk.usage_metadata is not None:
+                usage_metadata = chunk.usage_metadata
+            
+            text = chunk.text
+            if not text:
+                continue
+            
+            if first_token_time is None:
+                first_token_time = time.perf_counter() - start_time
+            
+            yield text
+        
+        total_latency = time.perf_counter() - start_time
+        self.last_turn_stats = {
+            "time_to_first_token": first_token_time if first_token_time is not None else total_latency,
+            "total_latency": total_latency,
+            "streamed": True,
+            "usage": usage_to_dict(usage_metadata),
+            **self.last_call_metrics
+        }
+        self._record_route(self.last_turn_stats)
+
+
+class AsyncGeminiService(GeminiService):
+    """Gemini service variant issuing requests through the SDK's async client"""
+    
+    async def generate_response_async(self, conversation_contents, system_instruction, cached_content=None):
+        """
+        Generate a response from Gemini without blocking the event loop
+        
+        Args:
+            conversation_contents (list): Full conversation history
+            system_instruction (str): System prompt for the model
+            cached_content (str): Cached content replacing the inline prompt
+            
+        Returns:
+            str: Generated response text
+        """
+        text, _ = await self._generate_async(conversation_contents, system_instruction, cached_content)
+        return text
+    
+    async def _generate_async(self, conversation_contents, system_instruction, cached_content=None):
+        """Generate a response, returning its text and its stats tagged with the route"""
+        start_time = time.perf_counter()
+        
+        response, call_metrics = await self.resilience.call_async(
+            lambda: self.client.aio.models.generate_content(
+                model=self.model,
+                contents=conversation_contents,
+                config=self.build_generation_config(system_instruction, cached_content)
+            )
+        )
+        
+        # Local stats: concurrent calls on one service must not share last_turn_stats
+        stats = {
+            "total_latency": time.perf_counter() - start_time,
+            "usage": usage_to_dict(response.usage_metadata),
+            **call_metrics
+        }
+        self._record_route(stats)
+        
+        return response.text, stats
+    
+    async def compare_jurisdictions(self, conversation_contents, system_instructions,
+                                    max_concurrency=COMPARE_MAX_CONCURRENCY,
+                                    timeout=COMPARE_TIMEOUT_SECONDS):
+        """
+        Answer the same conversation under several system prompts concurrently
+        
+        Args:
+            conversation_contents (list): Full conversation history
+            system_instructions (dict): System prompt per branch label
+            max_concurrency (int): Maximum branches in flight at once
+            timeout (float): Per-branch timeout in seconds
+            
+        Returns:
+            dict: Per label, a dict with 'text', 'error', 'latency', 'usage'
+                and 'cost_usd'; answered branches are recorded under this
+                service's route like single answers
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def run_branch(system_instruction):
+            async with semaphore:
+                start_time = time.perf_counter()
+                stats = {}
+                try:
+                    text, stats = await asyncio.wait_for(
+                        self._generate_async(conversation_contents, system_instruction),
+                        timeout
+                    )
+                    error = None
+                except asyncio.TimeoutError:
+                    text, error = None, f"Timed out after {timeout:.0f}s"
+                except Exception as exc:
+                    text, error = None, str(exc)
+                
+                return {
+                    "text": text,
+                    "error": error,
+                    "latency": time.perf_counter() - start_time,
+                    "usage": stats.get("usage", {}),
+                    "cost_usd": stats.get("cost_usd", 0.0)
+                }
+        
+        labels = list(system_instructions)
+        results = await asyncio.gather(
+            *(run_branch(system_instructions[label]) for label in labels)
+        )
+        
+        return dict(zip(labels, results))
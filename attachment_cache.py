@@ -0,0 +1,158 @@
+"""
+Per-session cache of attached files: one copy of each file's bytes and its content hash
+"""
+import mmap
+import tempfile
+import threading
+
+from config import ATTACHMENT_SPILL_BYTES
+from document_store import hash_document
+
+
+class Attachment:
+    """One attached file, read once"""
+    
+    def __init__(self, name, data):
+        """
+        Initialize the attachment
+        
+        Args:
+            name (str): File name
+            data (bytes | mmap.mmap): File contents
+        """
+        self.name = name
+        self.size = len(data)
+        self._data = data
+        self._digest = None
+    
+    @property
+    def data(self):
+        """
+        File contents without copying
+        
+        Returns:
+            bytes | memoryview: The cached bytes, or a read-only view of the
+                spilled file
+        """
+        if isinstance(self._data, bytes):
+            return self._data
+        return memoryview(self._data)
+    
+    @property
+    def spilled(self):
+        """Whether the contents live in a memory-mapped temp file"""
+        return isinstance(self._data, mmap.mmap)
+    
+    @property
+    def digest(self):
+        """Content hash, computed on first use"""
+        if self._digest is None:
+            self._digest = hash_document(self.data)
+        return self._digest
+    
+    def close(self):
+        """Release a spilled file's mapping"""
+        if self.spilled:
+            try:
+                self._data.close()
+            except BufferError:
+                # A request still holds a view; the mapping goes when it does
+                pass
+
+
+class AttachmentCache:
+    """Attachments of one session keyed by uploader file ID and size"""
+    
+    def __init__(self, spill_bytes=ATTACHMENT_SPILL_BYTES):
+        """
+        Initialize the cache
+        
+        Args:
+            spill_bytes (int): Files at least this large are kept in a
+                memory-mapped temp file; 0 keeps everything in memory
+        """
+        self.spill_bytes = spill_bytes
+        self.stats = {"hits": 0, "misses": 0, "spilled": 0, "evictions": 0}
+        self._entries = {}
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def key(uploaded_file):
+        """
+        Identify an uploaded file without reading it
+        
+        Args:
+            uploaded_file: Streamlit UploadedFile or any object with 'name' and 'size'
+        
+        Returns:
+            tuple: (uploader file ID, or the name where there is none, size)
+        """
+        return (getattr(uploaded_file, "file_id", None) or uploaded_file.name, uploaded_file.size)
+    
+    def get(self, uploaded_file):
+        """
+        Look up an attached file, reading it on first use
+        
+        Args:
+            uploaded_file: Streamlit UploadedFile or any object with 'name',
+                'size' and 'getvalue()'
+        
+        Returns:
+            Attachment: The cached attachment
+        """
+        key = self.key(uploaded_file)
+        with self._lock:
+            attachment = self._entries.get(key)
+            if attachment is not None:
+                self.stats["hits"] += 1
+                return attachment
+            
+            self.stats["misses"] += 1
+            # getvalue() returns the uploader's own buffer and ignores the read position
+            attachment = Attachment(uploaded_file.name, self._load(uploaded_file.getvalue()))
+            self._entries[key] = attachment
+            return attachment
+    
+    def _load(self, data):
+        """Keep small files as they are and spill large ones to a mapped temp file"""
+        if not self.spill_bytes or len(data) < self.spill_bytes:
+            return data
+        
+        with tempfile.TemporaryFile(prefix="draco-attachment-") as handle:
+            handle.write(data)
+            handle.flush()
+            mapping = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        self.stats["spilled"] += 1
+        return mapping
+    
+    def sync(self, uploaded_files):
+        """
+        Match the cache to the files currently attached
+        
+        Files removed from the uploader are evicted.
+        
+        Args:
+            uploaded_files (list): Files currently in the uploader
+        
+        Returns:
+            list: One Attachment per file, in uploader order
+        """
+        uploaded_files = uploaded_files or []
+        keys = {self.key(uploaded_file) for uploaded_file in uploaded_files}
+        
+        with self._lock:
+            for key in [key for key in self._entries if key not in keys]:
+                self._entries.pop(key).close()
+                self.stats["evictions"] += 1
+        
+        return [self.get(uploaded_file) for uploaded_file in uploaded_files]
+    
+    def clear(self):
+        """Evict every attachment"""
+        self.sync([])
+    
+    @property
+    def total_bytes(self):
+        """Size of all cached attachments"""
+        with self._lock:
+            return sum(attachment.size for attachment in self._entries.values())
@@ -1,20 +1,27 @@
 """
 Authentication and login functionality
 """
+import uuid
+
 import streamlit as st
 from config import APP_PASSWORD
 
 
 def initialize_session_state():
     """Initialize session state variables"""
+    if "client_id" not in st.session_state:
+        # Kept in the URL so a refreshed browser can pick up pending answers
+        client_id = st.query_params.get("client")
+        if not client_id:
+            client_id = uuid.uuid4().hex
+            st.query_params["client"] = client_id
+        st.session_state.client_id = client_id
+    
     if "logged_in" not in st.session_state:
         st.session_state.logged_in = False
     
     if "ui_language" not in st.session_state:
         st.session_state.ui_language = "en"
-    
-    if "messages" not in st.session_state:
-        st.session_state.messages = []
 
 
 def login_page():
@@ -0,0 +1,411 @@
+"""
+Batch document review: the same analysis run over many documents as one batch job
+"""
+import csv
+import io
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from google.genai import types
+from config import (
+    GEMINI_MODEL, BATCH_REVIEW_USE_BATCH_API, BATCH_POLL_SECONDS, BATCH_TIMEOUT_SECONDS,
+    BATCH_FALLBACK_WORKERS, BATCH_REVIEW_FOLDER_ROOT, JOB_RESULT_TTL_SECONDS
+)
+from prompt_builder import build_complete_system_prompt
+from ai_service import GeminiService
+
+
+_reviewer = None
+_reviewer_lock = threading.Lock()
+
+REVIEW_PROMPTS = {
+    "en": (
+        "Apply the Document Analysis Protocol to the attached document ({name}). Report concisely: "
+        "document type and procedural stage; every date and what it refers to; authorities involved; "
+        "service details and any service defects; other procedural defects; alleged versus proven facts."
+    ),
+    "el": (
+        "Εφάρμοσε το Πρωτόκολλο Ανάλυσης Εγγράφων στο συνημμένο έγγραφο ({name}). Ανάφερε συνοπτικά: "
+        "είδος εγγράφου και διαδικαστικό στάδιο· κάθε ημερομηνία και σε τι αναφέρεται· εμπλεκόμενες αρχές· "
+        "στοιχεία επίδοσης και τυχόν ελαττώματα επίδοσης· λοιπά διαδικαστικά ελαττώματα· "
+        "ισχυριζόμενα έναντι αποδεδειγμένων γεγονότων."
+    )
+}
+
+TABLE_COLUMNS = ("document", "status", "analysis", "error")
+
+_TERMINAL_STATES = {
+    types.JobState.JOB_STATE_SUCCEEDED, types.JobState.JOB_STATE_FAILED,
+    types.JobState.JOB_STATE_CANCELLED, types.JobState.JOB_STATE_EXPIRED,
+    types.JobState.JOB_STATE_PARTIALLY_SUCCEEDED
+}
+
+
+def load_folder(path, root=BATCH_REVIEW_FOLDER_ROOT):
+    """
+    Read the PDFs in a server-side folder
+    
+    Args:
+        path (str): Folder, relative to the configured root
+        root (str): Only folders inside this directory may be read
+    
+    Returns:
+        list: (file name, bytes) tuples, sorted by name
+    
+    Raises:
+        ValueError: If folder review is disabled or the path leaves the root
+    """
+    if not root:
+        raise ValueError("Folder review is disabled")
+    
+    root = os.path.realpath(root)
+    folder = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, folder]) != root:
+        raise ValueError(f"Folder is outside {root}")
+    
+    documents = []
+    for name in sorted(os.listdir(folder)):
+        if name.lower().endswith(".pdf"):
+            with open(os.path.join(folder, name), "rb") as handle:
+                documents.append((name, handle.read()))
+    return documents
+
+
+class BatchReview:
+    """Progress and results of one batch review"""
+    
+    def __init__(self, review_id, owner, names):
+        self.id = review_id
+        self.owner = owner
+        self.backend = None
+        self.batch_name = None
+        self.state = "preparing"
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self.items = [
+            {"document": name, "status": "pending", "analysis": "", "error": ""}
+            for name in names
+        ]
+        self._reported_completed = 0
+        self._lock = threading.Lock()
+    
+    @property
+    def done(self):
+        """Whether the review finished, successfully or not"""
+        return self.state in ("done", "failed")
+    
+    @property
+    def progress(self):
+        """
+        Documents completed so far
+        
+        Returns:
+            tuple: (completed, total)
+        """
+        with self._lock:
+            completed = sum(item["status"] != "pending" for item in self.items)
+            return max(completed, self._reported_completed), len(self.items)
+    
+    def rows(self):
+        """
+        Results table, one row per document
+        
+        Returns:
+            list: Dicts keyed by TABLE_COLUMNS
+        """
+        with self._lock:
+            return [dict(item) for item in self.items]
+    
+    def to_csv(self):
+        """
+        Results table as CSV
+        
+        Returns:
+            str: CSV text with a header row
+        """
+        output = io.StringIO()
+        writer = csv.DictWriter(output, fieldnames=TABLE_COLUMNS)
+        writer.writeheader()
+        writer.writerows(self.rows())
+        return output.getvalue()
+    
+    def complete(self, index, analysis=None, error=None):
+        """
+        Record the outcome for one document
+        
+        Args:
+            index (int): Position of the document in the review
+            analysis (str): Model output
+            error (str): Error message if the request failed
+        """
+        with self._lock:
+            item = self.items[index]
+            item["status"] = "failed" if error else "done"
+            item["analysis"] = analysis or ""
+            item["error"] = error or ""
+    
+    def report_progress(self, completed):
+        """
+        Record progress reported by the batch service before results arrive
+        
+        Args:
+            completed (int): Requests the service has finished
+        """
+        with self._lock:
+            self._reported_completed = completed
+    
+    def finish(self, error=None):
+        """
+        Mark the review finished
+        
+        Args:
+            error (str): Error message if the review as a whole failed
+        """
+        with self._lock:
+            self.state = "failed" if error else "done"
+            self.error = error
+            self.finished_at = time.time()
+
+
+class BatchReviewer:
+    """
+    Runs batch reviews through the Batch API, or a thread pool where it is
+    unavailable; documents a batch job failed or timed out on are sent
+    through the thread pool as well
+    """
+    
+    def __init__(self, service, use_batch_api=BATCH_REVIEW_USE_BATCH_API,
+                 poll_seconds=BATCH_POLL_SECONDS, workers=BATCH_FALLBACK_WORKERS,
+                 result_ttl=JOB_RESULT_TTL_SECONDS, batch_timeout=BATCH_TIMEOUT_SECONDS):
+        """
+        Initialize the reviewer
+        
+        Args:
+            service (GeminiService): Service whose client and uploads are used
+            use_batch_api (bool): Try the Batch API before the thread pool
+            poll_seconds (float): Interval between batch status checks
+            workers (int): Concurrent requests in the thread-pool fallback
+            result_ttl (float): Seconds finished reviews are kept for download
+            batch_timeout (float): Seconds a batch job may run before it is
+                cancelled and its documents are sent through the thread pool
+        """
+        self.service = service
+        self.use_batch_api = use_batch_api
+        self.poll_seconds = poll_seconds
+        self.workers = workers
+        self.batch_timeout = batch_timeout
+        self.result_ttl = result_ttl
+        self._reviews = {}
+        self._lock = threading.Lock()
+    
+    def start(self, owner, documents, settings, language):
+        """
+        Start reviewing documents in the background
+        
+        Args:
+            owner (str): Stable identifier of the requesting user/browser
+            documents (list): (file name, bytes) tuples
+            settings (dict): User settings from sidebar
+            language (str): Language of the analysis ('en' or 'el')
+        
+        Returns:
+            BatchReview: Review whose progress can be polled
+        """
+        review = BatchReview(uuid.uuid4().hex, owner, [name for name, _ in documents])
+        with self._lock:
+            self._purge_expired()
+            self._reviews[review.id] = review
+        
+        threading.Thread(
+            target=self._run,
+            args=(review, documents, settings, language),
+            name=f"batch-review-{review.id[:8]}",
+            daemon=True
+        ).start()
+        return review
+    
+    def get(self, review_id):
+        """
+        Look up a review
+        
+        Args:
+            review_id (str): Review ID
+        
+        Returns:
+            BatchReview: The review, or None if unknown
+        """
+        with self._lock:
+            return self._reviews.get(review_id)
+    
+    def reviews_for(self, owner):
+        """
+        Reviews started by a user, oldest first
+        
+        Args:
+            owner (str): Stable identifier of the user/browser
+        
+        Returns:
+            list: BatchReview objects
+        """
+        with self._lock:
+            return [review for review in self._reviews.values() if review.owner == owner]
+    
+    def _purge_expired(self):
+        """Forget finished reviews older than the result TTL (lock held)"""
+        cutoff = time.time() - self.result_ttl
+        for review_id in [
+            review_id for review_id, review in self._reviews.items()
+            if review.done and review.finished_at < cutoff
+        ]:
+            del self._reviews[review_id]
+    
+    def build_requests(self, documents, settings, language):
+        """
+        Build one generate request per document
+        
+        Args:
+            documents (list): (file name, bytes) tuples
+            settings (dict): User settings from sidebar
+            language (str): Language of the analysis ('en' or 'el')
+        
+        Returns:
+            list: (contents, GenerateContentConfig) pairs in document order
+        """
+        system_instruction = build_complete_system_prompt(
+            settings["jurisdiction"],
+            settings["specialty"],
+            dict(settings, uploaded_files=[None]),
+            language
+        )
+        config = self.service.build_generation_config(system_instruction)
+        
+        requests = []
+        for name, data in documents:
+            contents = [types.Content(role="user", parts=[
+                self.service.document_part(data, name),
+                types.Part.from_text(text=REVIEW_PROMPTS[language].format(name=name))
+            ])]
+            requests.append((contents, config))
+        
+        return requests
+    
+    def _run(self, review, documents, settings, language):
+        """Prepare requests and run them on the best available backend"""
+        try:
+            requests = self.build_requests(documents, settings, language)
+        except Exception as exc:
+            review.finish(error=f"Could not prepare documents: {exc}")
+            return
+        
+        review.state = "running"
+        
+        batch_job = None
+        if self.use_batch_api and hasattr(self.service.client, "batches"):
+            try:
+                batch_job = self.service.client.batches.create(
+                    model=GEMINI_MODEL,
+                    src=[
+                        types.InlinedRequest(contents=contents, config=config, metadata={"index": str(index)})
+                        for index, (contents, config) in enumerate(requests)
+                    ],
+                    config=types.CreateBatchJobConfig(display_name=f"draco-review-{review.id[:8]}")
+                )
+            except Exception:
+                # Batch mode unavailable (model, key tier or SDK); answer interactively instead
+                batch_job = None
+        
+        try:
+            if batch_job is not None:
+                review.backend = "batch"
+                review.batch_name = batch_job.name
+                answered = self._collect_batch(review, batch_job)
+                remaining = [index for index in range(len(requests)) if index not in answered]
+                if remaining:
+                    review.backend = "batch+threads"
+                    self._run_threads(review, requests, remaining)
+            else:
+                review.backend = "threads"
+                self._run_threads(review, requests)
+        except Exception as exc:
+            review.finish(error=str(exc))
+            return
+        
+        review.finish()
+    
+    def _collect_batch(self, review, batch_job):
+        """
+        Poll a submitted batch job until it ends or times out, then store its responses
+        
+        Returns:
+            set: Indexes of the documents the job answered, successfully or not
+        """
+        deadline = time.monotonic() + self.batch_timeout
+        
+        while batch_job.state not in _TERMINAL_STATES:
+            if time.monotonic() >= deadline:
+                try:
+                    self.service.client.batches.cancel(name=batch_job.name)
+                except Exception:
+                    pass
+                return set()
+            time.sleep(self.poll_seconds)
+            batch_job = self.service.client.batches.get(name=batch_job.name)
+            stats = batch_job.completion_stats
+            if stats is not None:
+                review.report_progress((stats.successful_count or 0) + (stats.failed_count or 0))
+        
+        answered = set()
+        responses = (batch_job.dest.inlined_responses or []) if batch_job.dest else []
+        for position, inlined in enumerate(responses):
+            # Responses are matched to documents by the index sent as metadata
+            index = int((inlined.metadata or {}).get("index", position))
+            answered.add(index)
+            if inlined.error is not None:
+                review.complete(index, error=inlined.error.message or "Request failed")
+            else:
+                review.complete(index, analysis=inlined.response.text)
+        
+        return answered
+    
+    def _run_threads(self, review, requests, indexes=None):
+        """Send the requests (or those at the given indexes) as ordinary calls from a bounded thread pool"""
+        def analyze(contents, config):
+            response, _ = self.service.resilience.call(
+                lambda: self.service.client.models.generate_content(
+                    model=GEMINI_MODEL,
+                    contents=contents,
+                    config=config
+                ),
+                kind="batch_review"
+            )
+            return response.text
+        
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="batch-review") as executor:
+            futures = {
+                executor.submit(analyze, *requests[index]): index
+                for index in (range(len(requests)) if indexes is None else indexes)
+            }
+            for future in as_completed(futures):
+                try:
+                    review.complete(futures[future], analysis=future.result())
+                except Exception as exc:
+                    review.complete(futures[future], error=str(exc))
+
+
+def get_batch_reviewer():
+    """
+    Get the process-wide batch reviewer
+    
+    Returns:
+        BatchReviewer: Reviewer shared by all sessions
+    """
+    global _reviewer
+    
+    with _reviewer_lock:
+        if _reviewer is None:
+            _reviewer = BatchReviewer(GeminiService())
+        return _reviewer
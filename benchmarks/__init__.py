@@ -0,0 +1,3 @@
+"""
+Offline benchmarks for Draco Legal AI (run from the repository root)
+"""
@@ -0,0 +1,123 @@
+"""
+Benchmark: peak RSS and per-turn preparation time of a session with large attachments
+
+Each mode runs in a fresh interpreter holding N Streamlit UploadedFile
+objects, and prepares the document parts of several turns against the
+fake backend:
+
+    legacy   rewind and read() every file each turn, hashing it again
+    cached   read through the session AttachmentCache (the app's path)
+    spilled  as cached, with every file spilled to a memory-mapped temp file
+
+The fake Files API keeps its own copy of every upload, in every mode.
+
+Usage:
+    python -m benchmarks.bench_attachments [--files 10] [--size-mb 20] [--turns 5]
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+from benchmarks.common import current_rss_mb, make_case_bundle
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODES = ("legacy", "cached", "spilled")
+
+
+def make_uploads(files, size_mb):
+    """
+    Build uploader files the way Streamlit hands them to the script
+    
+    Args:
+        files (int): Number of files
+        size_mb (float): Size of each file
+    
+    Returns:
+        list: UploadedFile objects
+    """
+    from streamlit.runtime.uploaded_file_manager import UploadedFile, UploadedFileRec
+    
+    uploads = []
+    for index in range(files):
+        bundle = make_case_bundle(20, seed_topic=f"file {index}")
+        # Padded with incompressible bytes, like scanned exhibits
+        data = bundle + os.urandom(max(0, int(size_mb * 2**20) - len(bundle)))
+        uploads.append(UploadedFile(
+            UploadedFileRec(f"upload-{index}", f"bundle-{index}.pdf", "application/pdf", data), None
+        ))
+    return uploads
+
+
+def run_mode(mode, files, size_mb, turns):
+    """
+    Prepare the document parts of several turns in one mode
+    
+    Returns:
+        dict: Timings in seconds and memory in MB
+    """
+    from ai_service import GeminiService
+    from attachment_cache import AttachmentCache
+    from fake_gemini import FakeGeminiClient
+    
+    service = GeminiService(FakeGeminiClient(latency=0.0))
+    uploads = make_uploads(files, size_mb)
+    attachments = AttachmentCache(spill_bytes=1 if mode == "spilled" else 0)
+    rss_before = current_rss_mb()
+    
+    timings = []
+    for _ in range(turns):
+        start = time.perf_counter()
+        if mode == "legacy":
+            for upload in uploads:
+                upload.seek(0)
+            parts = [service.document_part(upload.read(), upload.name) for upload in uploads]
+        else:
+            attachments.sync(uploads)
+            parts = service.prepare_document_parts(uploads, attachments)
+        timings.append(time.perf_counter() - start)
+        assert len(parts) == files
+    
+    return {
+        "first_turn_s": timings[0],
+        "later_turn_s": sum(timings[1:]) / max(1, len(timings) - 1),
+        "rss_before_mb": rss_before,
+        "rss_after_mb": current_rss_mb(),
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "uploads": service.client.files.upload_count
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--files", type=int, default=10)
+    parser.add_argument("--size-mb", type=float, default=20.0)
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--run", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.run:
+        print(json.dumps(run_mode(args.run, args.files, args.size_mb, args.turns)))
+        return
+    
+    print(f"{args.files} files x {args.size_mb:g} MB, {args.turns} turns")
+    print(f"{'mode':<9} {'turn 1 (s)':>11} {'later (s)':>10} {'RSS before':>11} "
+          f"{'RSS after':>10} {'peak RSS':>9} {'uploads':>8}")
+    for mode in MODES:
+        result = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_attachments", "--run", mode,
+             "--files", str(args.files), "--size-mb", str(args.size_mb), "--turns", str(args.turns)],
+            cwd=ROOT, capture_output=True, text=True, check=True
+        )
+        stats = json.loads(result.stdout.splitlines()[-1])
+        print(f"{mode:<9} {stats['first_turn_s']:>11.3f} {stats['later_turn_s']:>10.4f} "
+              f"{stats['rss_before_mb']:>10.0f}M {stats['rss_after_mb']:>9.0f}M "
+              f"{stats['peak_rss_mb']:>8.0f}M {stats['uploads']:>8}")
+
+
+if __name__ == "__main__":
+    main()
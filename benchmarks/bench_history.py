@@ -0,0 +1,63 @@
+"""
+Micro-benchmark: per-turn conversation history conversion cost
+
+Usage:
+    python -m benchmarks.bench_history [--turns 250]
+"""
+import argparse
+import time
+
+from ai_service import GeminiService
+from fake_gemini import FakeGeminiClient
+from history_manager import ConversationHistoryCache
+
+
+REPORT_AT = (1, 10, 50, 100, 200, 250, 500)
+
+
+def run(turns):
+    """
+    Simulate a consultation and time history conversion at each turn
+    
+    Args:
+        turns (int): Number of user/assistant exchanges to simulate
+        
+    Returns:
+        list: (turn, full rebuild seconds, incremental seconds) rows
+    """
+    service = GeminiService(client=FakeGeminiClient())
+    history_cache = ConversationHistoryCache()
+    messages = []
+    rows = []
+    
+    for turn in range(1, turns + 1):
+        messages.append({"role": "user", "content": f"Question {turn} about art. 386 PK " * 20})
+        
+        start = time.perf_counter()
+        service.build_conversation_history(messages[:-1])
+        full_time = time.perf_counter() - start
+        
+        start = time.perf_counter()
+        service.build_conversation_history(messages[:-1], history_cache)
+        incremental_time = time.perf_counter() - start
+        
+        messages.append({"role": "assistant", "content": f"Answer {turn}. " * 200})
+        
+        if turn in REPORT_AT or turn == turns:
+            rows.append((turn, full_time, incremental_time))
+    
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--turns", type=int, default=250)
+    args = parser.parse_args()
+    
+    print(f"{'turn':>6} {'full (ms)':>12} {'incremental (ms)':>18}")
+    for turn, full_time, incremental_time in run(args.turns):
+        print(f"{turn:>6} {full_time * 1000:>12.3f} {incremental_time * 1000:>18.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Benchmark: language detection on 1 KB to 10 MB inputs
+
+Compares language_utils.detect_language with the previous two-pass
+generator implementation, reproduced below as the baseline.
+
+Usage:
+    python -m benchmarks.bench_language [--repeat 3]
+"""
+import argparse
+import time
+
+from config import GREEK_DETECTION_THRESHOLD
+from language_utils import detect_language, language_ratios
+
+
+SIZES = (1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+GREEK_TEXT = "Η προθεσμία παραγραφής για την απάτη του άρθρου 386 ΠΚ αρχίζει από την τέλεση της πράξης. "
+ENGLISH_TEXT = "The limitation period for fraud under art. 386 PC runs from the commission of the offence. "
+
+
+def baseline_detect_language(text):
+    """Previous implementation: two generator passes over every character"""
+    if not text:
+        return "en"
+    
+    greek_chars = sum(1 for c in text if '\u0370' <= c <= '\u03FF' or '\u1F00' <= c <= '\u1FFF')
+    total_chars = sum(1 for c in text if c.isalpha())
+    
+    if total_chars == 0:
+        return "en"
+    
+    greek_ratio = greek_chars / total_chars
+    return "el" if greek_ratio > GREEK_DETECTION_THRESHOLD else "en"
+
+
+def make_text(size):
+    """Mixed pleading text: mostly Greek with quoted English passages"""
+    unit = GREEK_TEXT * 3 + ENGLISH_TEXT
+    return (unit * (size // len(unit) + 1))[:size]
+
+
+def best_time(function, text, repeat):
+    """Fastest of several runs, in seconds"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(text)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    
+    print(f"{'size':>10} {'baseline (ms)':>14} {'current (ms)':>13} {'speedup':>8} {'agree':>6}  ratios")
+    for size in SIZES:
+        text = make_text(size)
+        baseline = best_time(baseline_detect_language, text, args.repeat)
+        current = best_time(detect_language, text, args.repeat)
+        agree = baseline_detect_language(text) == detect_language(text)
+        ratios = ", ".join(f"{key}={value:.2f}" for key, value in language_ratios(text).items())
+        print(f"{size:>10,} {baseline * 1000:>14.2f} {current * 1000:>13.2f} "
+              f"{baseline / current:>7.1f}x {str(agree):>6}  {ratios}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+"""
+Benchmark: concurrent users one instance serves before p95 latency collapses
+
+Each virtual user drives app.py headlessly through Streamlit's AppTest
+against the fake Gemini backend. It logs in on the login page, picks
+sidebar settings, attaches PDFs and holds a multi-turn chat. The user
+count ramps through the given stages. Each stage reports turn throughput,
+latency percentiles, memory per session and error rates.
+
+Usage:
+    python -m benchmarks.bench_load [--users 1,2,4,8,16] [--turns 4] [--attachments 1]
+        [--think-seconds 0.2] [--latency 0.5] [--slo-p95 10] [--output FILE]
+"""
+import argparse
+import gc
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+
+from benchmarks.common import current_rss_mb, make_case_bundle, percentile
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(ROOT, "app.py")
+PASSWORD = uuid.uuid4().hex
+
+PROMPTS = (
+    "Was the summons validly served if the defendant had moved abroad?",
+    "Ποια είναι η παραγραφή για το άρθρο 386 ΠΚ;",
+    "Which procedural defects in the attached file could support an appeal?",
+    "Μπορεί ο κατηγορούμενος να ζητήσει αναβολή λόγω ασθένειας;",
+    "Summarise the open questions for the hearing."
+)
+
+DEPTHS = ("Quick Review", "Standard Analysis", "Deep Dive")
+
+
+def configure_environment(args, workdir):
+    """Point the app at the fake backend and private stores before it is imported"""
+    os.environ.update({
+        "GEMINI_BACKEND": "fake",
+        "FAKE_LATENCY_SECONDS": str(args.latency),
+        "APP_PASSWORD": PASSWORD,
+        # Every turn should reach the model, not the response cache
+        "RESPONSE_CACHE_ENABLED": "false",
+        "CONVERSATION_STORE_PATH": os.path.join(workdir, "conversations.sqlite3"),
+        "EXTRACTION_CACHE_PATH": os.path.join(workdir, "extractions.sqlite3"),
+        "STATE_BACKEND_PATH": os.path.join(workdir, "state.sqlite3"),
+        "METRICS_PORT": "0"
+    })
+
+
+def share_runtime():
+    """
+    Give all virtual users one Streamlit runtime, as a server does
+    
+    AppTest installs a runtime and patches the config for each script run,
+    and undoes both when the run ends, which breaks every other session
+    running at that moment.
+    """
+    from contextlib import nullcontext
+    from unittest.mock import MagicMock
+    from streamlit import config
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+    from streamlit.runtime.dataframe_source_manager import DataframeSourceManager
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+    from streamlit.testing.v1 import app_test
+    from streamlit.testing.v1.util import build_mock_config_get_option
+    
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    runtime.dataframe_source_mgr = DataframeSourceManager()
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    Runtime._instance = runtime
+    # AppTest's per-run install and removal land on this subclass instead
+    app_test.Runtime = type("AppTestRuntime", (Runtime,), {})
+    
+    config.get_option = build_mock_config_get_option({"global.appTest": True})
+    app_test.patch_config_options = lambda overrides: nullcontext()
+    # The virtual users read session state from outside a script run
+    logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context").addFilter(
+        lambda record: record.levelno > logging.WARNING
+    )
+
+
+def widget(widgets, label):
+    """First widget of a kind with the given label"""
+    return next(item for item in widgets if item.label == label)
+
+
+def check(app, step):
+    """Raise if the script run failed"""
+    if app.exception:
+        raise RuntimeError(f"{step}: {app.exception[0].message}")
+
+
+def virtual_user(index, args, documents, record):
+    """
+    Log in, configure the sidebar, attach documents and chat
+    
+    Args:
+        index (int): User number, varies settings and prompts
+        args (argparse.Namespace): Load options
+        documents (list): (file name, bytes) attached by every user
+        record (dict): Filled with 'app', 'login', 'turns' and 'errors'
+    """
+    from streamlit.testing.v1 import AppTest
+    from language_utils import UI_TRANSLATIONS
+    
+    try:
+        app = AppTest.from_file(APP_PATH, default_timeout=args.timeout)
+        app.query_params["client"] = f"load-{index}-{uuid.uuid4().hex[:8]}"
+        record["app"] = app
+        
+        start = time.perf_counter()
+        app.run()
+        app.text_input[0].input(PASSWORD)
+        widget(app.button, "Log In").click().run()
+        check(app, "login")
+        record["login"] = time.perf_counter() - start
+        
+        widget(app.selectbox, UI_TRANSLATIONS["specialty"]["en"]).select_index(index % 6)
+        app.select_slider[0].set_value(DEPTHS[index % len(DEPTHS)])
+        if documents:
+            app.file_uploader[0].set_value([(name, data, "application/pdf") for name, data in documents])
+        app.run()
+        check(app, "settings")
+        
+        for turn in range(args.turns):
+            time.sleep(args.think_seconds)
+            prompt = f"{PROMPTS[(index + turn) % len(PROMPTS)]} ({index}.{turn})"
+            start = time.perf_counter()
+            app.chat_input[0].set_value(prompt).run()
+            elapsed = time.perf_counter() - start
+            # Older turns may have been compacted, so look at the tail only
+            tail = [(message["role"], message["content"]) for message in app.session_state.messages[-2:]]
+            
+            if app.exception:
+                record["errors"].append(f"exception: {app.exception[0].message}")
+            elif len(tail) < 2 or tail[0] != ("user", prompt) or tail[1][0] != "assistant":
+                # Busy warning (job queue full) or error message instead of an answer
+                record["errors"].append("no answer")
+            else:
+                record["turns"].append(elapsed)
+    except Exception as exc:
+        record["errors"].append(f"{type(exc).__name__}: {exc}")
+
+
+def run_stage(users, args, documents):
+    """
+    Run one ramp stage with a fixed number of concurrent users
+    
+    Returns:
+        dict: Stage metrics
+    """
+    gc.collect()
+    rss_before = current_rss_mb()
+    records = [{"app": None, "login": None, "turns": [], "errors": []} for _ in range(users)]
+    threads = [
+        threading.Thread(target=virtual_user, args=(index, args, documents, record), name=f"load-user-{index}")
+        for index, record in enumerate(records)
+    ]
+    
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+    
+    # Sessions are still alive here, so their memory is counted
+    rss_after = current_rss_mb()
+    
+    turns = [seconds for record in records for seconds in record["turns"]]
+    logins = [record["login"] for record in records if record["login"] is not None]
+    errors = [error for record in records for error in record["errors"]]
+    attempted = len(turns) + len(errors)
+    
+    return {
+        "users": users,
+        "turns": len(turns),
+        "errors": len(errors),
+        "error_rate": len(errors) / attempted if attempted else 0.0,
+        "error_samples": sorted(set(errors))[:5],
+        "throughput_turns_per_s": len(turns) / wall if wall else 0.0,
+        "turn_p50_s": percentile(turns, 0.5),
+        "turn_p95_s": percentile(turns, 0.95),
+        "turn_p99_s": percentile(turns, 0.99),
+        "login_p95_s": percentile(logins, 0.95),
+        "rss_mb": rss_after,
+        "mb_per_session": max(0.0, rss_after - rss_before) / users,
+        "wall_s": wall
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", default="1,2,4,8,16", help="concurrent users per ramp stage")
+    parser.add_argument("--turns", type=int, default=4, help="chat turns per user")
+    parser.add_argument("--attachments", type=int, default=1, help="PDFs each user attaches")
+    parser.add_argument("--pdf-pages", type=int, default=40)
+    parser.add_argument("--think-seconds", type=float, default=0.2, help="pause before each turn")
+    parser.add_argument("--latency", type=float, default=0.5, help="fake model call latency (s)")
+    parser.add_argument("--timeout", type=float, default=120.0, help="seconds per script run")
+    parser.add_argument("--slo-p95", type=float, default=10.0, help="p95 turn latency considered collapsed (s)")
+    parser.add_argument("--output", help="write stage results as JSON")
+    args = parser.parse_args()
+    
+    workdir = tempfile.mkdtemp(prefix="draco-load-")
+    configure_environment(args, workdir)
+    share_runtime()
+    
+    documents = [
+        (f"bundle-{index}.pdf", make_case_bundle(args.pdf_pages, seed_topic=f"file {index}"))
+        for index in range(args.attachments)
+    ]
+    
+    print(f"{args.turns} turns per user, {args.attachments} attachment(s), fake latency {args.latency}s")
+    print(f"{'users':>5} {'turns':>6} {'err %':>6} {'turns/s':>8} {'p50 (s)':>8} {'p95 (s)':>8} "
+          f"{'p99 (s)':>8} {'login p95':>10} {'MB/session':>11} {'RSS (MB)':>9}")
+    
+    # Unmeasured session so imports and process-wide singletons are not billed to stage one
+    run_stage(1, args, documents)
+    
+    stages = []
+    saturated_at = None
+    for users in (int(value) for value in args.users.split(",")):
+        stage = run_stage(users, args, documents)
+        stages.append(stage)
+        print(f"{users:>5} {stage['turns']:>6} {stage['error_rate'] * 100:>6.1f} "
+              f"{stage['throughput_turns_per_s']:>8.2f} {stage['turn_p50_s']:>8.2f} {stage['turn_p95_s']:>8.2f} "
+              f"{stage['turn_p99_s']:>8.2f} {stage['login_p95_s']:>10.2f} {stage['mb_per_session']:>11.1f} "
+              f"{stage['rss_mb']:>9.0f}")
+        for error in stage["error_samples"]:
+            print(f"      error: {error}")
+        
+        if saturated_at is None and (stage["turn_p95_s"] > args.slo_p95 or stage["error_rate"] > 0.05):
+            saturated_at = users
+    
+    if saturated_at is None:
+        print(f"\np95 stayed under {args.slo_p95:g}s with under 5% errors up to {stages[-1]['users']} users")
+    else:
+        print(f"\np95 over {args.slo_p95:g}s or errors over 5% from {saturated_at} concurrent users")
+    
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump({"args": vars(args), "stages": stages, "saturated_at": saturated_at}, handle, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Benchmark: tokens sent and latency, full-PDF path versus retrieved passages
+
+The model call is simulated: the fake backend has no real prefill cost,
+so model latency is modeled as a fixed overhead plus a per-token prefill
+cost. PDF input is billed at 258 tokens per page by Gemini.
+
+Usage:
+    python -m benchmarks.bench_retrieval [--pages 400] [--files 2]
+"""
+import argparse
+import time
+
+from benchmarks.common import make_case_bundle
+from document_ingest import chunk_store, ingest_documents
+from history_manager import estimate_tokens
+from retrieval import retrieve, format_passages
+
+
+PDF_TOKENS_PER_PAGE = 258
+QUERY = "Was the summons validly served, and has the limitation period expired?"
+
+
+def modeled_latency(input_tokens, overhead_s, prefill_ms_per_1k):
+    """Model call latency as fixed overhead plus prefill time"""
+    return overhead_s + input_tokens / 1000 * prefill_ms_per_1k / 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pages", type=int, default=400, help="pages per file")
+    parser.add_argument("--files", type=int, default=2)
+    parser.add_argument("--top-k", type=int, default=8)
+    parser.add_argument("--overhead", type=float, default=0.4, help="fixed model latency (s)")
+    parser.add_argument("--prefill-ms-per-1k", type=float, default=25.0)
+    args = parser.parse_args()
+    
+    documents = [
+        (f"bundle-{index}.pdf", make_case_bundle(args.pages, seed_topic=f"file {index}"))
+        for index in range(args.files)
+    ]
+    
+    full_tokens = PDF_TOKENS_PER_PAGE * args.pages * args.files + estimate_tokens(QUERY)
+    
+    start = time.perf_counter()
+    ingested = ingest_documents(documents)
+    cold_ingest = time.perf_counter() - start
+    
+    timings = {}
+    for label in ("cold", "warm"):
+        start = time.perf_counter()
+        ingested = ingest_documents(documents)
+        chunks = [chunk for document in ingested.values() for chunk in document["chunks"]]
+        passages = retrieve(QUERY, chunks, top_k=args.top_k)
+        block = format_passages(passages, {h: d["name"] for h, d in ingested.items()})
+        timings[label] = time.perf_counter() - start
+        if label == "cold":
+            timings["cold"] += cold_ingest
+    
+    retrieval_tokens = estimate_tokens(block) + estimate_tokens(QUERY)
+    
+    print(f"bundle: {args.files} file(s) x {args.pages} pages, {len(chunks)} chunks")
+    print(f"pages cited: {sorted({chunk.page for chunk in passages})}")
+    print(f"{'path':<12} {'input tokens':>14} {'local prep (s)':>15} {'modeled model (s)':>18}")
+    print(f"{'full PDF':<12} {full_tokens:>14,} {0.0:>15.3f} "
+          f"{modeled_latency(full_tokens, args.overhead, args.prefill_ms_per_1k):>18.3f}")
+    for label in ("cold", "warm"):
+        print(f"{'top-k ' + label:<12} {retrieval_tokens:>14,} {timings[label]:>15.3f} "
+              f"{modeled_latency(retrieval_tokens, args.overhead, args.prefill_ms_per_1k):>18.3f}")
+    print(f"chunk store: {chunk_store.stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Benchmark: cold-start import time of the login page and the chat page
+
+Each path is imported in a fresh interpreter under ``-X importtime``. The
+login path must not pull in the GenAI SDK; --budget-ms fails the run when
+the login path gets slower than the budget, to catch regressions.
+
+Usage:
+    python -m benchmarks.bench_startup [--repeats 5] [--budget-ms 800] [--top 8]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PATHS = {
+    # What app.py imports before check_authentication()
+    "login": ("streamlit", "config", "auth"),
+    # Imported lazily once the user is authenticated
+    "chat": ("streamlit", "config", "auth", "chat_app")
+}
+
+HEAVY_MODULES = ("google.genai", "pypdf", "numpy", "pydantic")
+
+
+def import_profile(modules):
+    """
+    Import modules in a fresh interpreter and parse its import timings
+    
+    Args:
+        modules (tuple): Module names imported in order
+    
+    Returns:
+        dict: 'total_us' (cumulative time of top-level imports) and
+            'modules' (name to (self us, cumulative us))
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {', '.join(modules)}"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+        env=dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    )
+    
+    timings = {}
+    total = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        timings[name.strip()] = (int(self_us), int(cumulative_us))
+        if not name[1:].startswith(" "):
+            total += int(cumulative_us)
+    
+    return {"total_us": total, "modules": timings}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=0.0, help="fail if the login path is slower")
+    parser.add_argument("--top", type=int, default=8, help="slowest modules listed per path")
+    args = parser.parse_args()
+    
+    failed = False
+    for path, modules in PATHS.items():
+        profiles = [import_profile(modules) for _ in range(args.repeats)]
+        median_ms = statistics.median(profile["total_us"] for profile in profiles) / 1000
+        loaded = [name for name in HEAVY_MODULES if name in profiles[-1]["modules"]]
+        
+        print(f"\n[{path}] median {median_ms:.1f} ms over {args.repeats} runs; "
+              f"heavy modules: {', '.join(loaded) or 'none'}")
+        slowest = sorted(profiles[-1]["modules"].items(), key=lambda item: item[1][0], reverse=True)
+        for name, (self_us, cumulative_us) in slowest[:args.top]:
+            print(f"  {name:<48} self {self_us / 1000:>8.1f} ms   cumulative {cumulative_us / 1000:>8.1f} ms")
+        
+        if path == "login":
+            if "google.genai" in loaded:
+                print("  FAIL: the login path imports the GenAI SDK")
+                failed = True
+            if args.budget_ms and median_ms > args.budget_ms:
+                print(f"  FAIL: over budget ({median_ms:.1f} ms > {args.budget_ms:.1f} ms)")
+                failed = True
+    
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,339 @@
+"""
+Benchmark suite: end-to-end turn throughput and latency on the fake backend
+
+Drives the real language detection, prompt building, history, document
+and streaming code paths against FakeGeminiClient, whose call latency,
+chunk cadence and token usage are configurable. Each scenario reports
+throughput, latency percentiles and peak memory; results are written to
+a JSON file that a later run can be compared against.
+
+Usage:
+    python -m benchmarks.bench_suite [--scenarios single,conversation,concurrent,multi_pdf]
+        [--label NAME] [--compare benchmarks/results/OTHER.json]
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+from ai_service import GeminiService
+from attachment_cache import AttachmentCache
+from benchmarks.common import make_case_bundle, percentile
+from context_cache import build_cache_key
+from fake_gemini import FakeGeminiClient
+from history_manager import ConversationHistoryCache, HistoryManager
+from language_utils import detect_language
+from prompt_builder import build_complete_system_prompt_with_hash
+from resilience import ResilientCaller, TokenBucket
+
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+SETTINGS = {
+    "jurisdiction": "Greek",
+    "specialty": "Criminal Law",
+    "analysis_depth": "Standard Analysis",
+    "focus_area": ["Case Law", "Procedural Issues"],
+    "retrieval_mode": False,
+    "compare_jurisdictions": []
+}
+
+PROMPTS = (
+    "Ποια είναι η παραγραφή για το άρθρο 386 ΠΚ;",
+    "Was the summons validly served if the defendant had moved abroad?",
+    "Μπορεί ο κατηγορούμενος να ζητήσει αναβολή λόγω ασθένειας;",
+    "Summarise the procedural history and the open questions for the appeal."
+)
+
+ANSWER = (
+    "Under the applicable provisions the limitation period runs from the completion of the act. "
+    "The case law of the Areios Pagos treats defective service as a ground for annulment. "
+) * 6
+
+
+class UploadedDocument(io.BytesIO):
+    """In-memory stand-in for a Streamlit UploadedFile"""
+    
+    def __init__(self, name, data):
+        super().__init__(data)
+        self.name = name
+        self.size = len(data)
+
+
+class BenchSession:
+    """Per-user state mirroring what the app keeps in st.session_state"""
+    
+    def __init__(self, service, settings=SETTINGS, uploaded_files=None):
+        self.service = service
+        self.settings = dict(settings, uploaded_files=uploaded_files or [])
+        self.messages = []
+        self.history_cache = ConversationHistoryCache()
+        self.history_manager = HistoryManager()
+        self.attachments = AttachmentCache()
+    
+    def turn(self, prompt):
+        """
+        Run one chat turn through the same steps as the app
+        
+        Args:
+            prompt (str): User prompt
+        
+        Returns:
+            dict: Turn timings and token usage reported by the service
+        """
+        start = time.perf_counter()
+        self.messages.append({"role": "user", "content": prompt})
+        
+        detected_lang = detect_language(prompt)
+        system_instruction, prompt_hash = build_complete_system_prompt_with_hash(
+            self.settings["jurisdiction"],
+            self.settings["specialty"],
+            self.settings,
+            detected_lang
+        )
+        
+        contents = self.service.build_conversation_history(self.messages[:-1], self.history_cache)
+        contents = self.history_manager.apply(contents, self.service)
+        
+        document_parts = self.service.prepare_document_parts(self.settings["uploaded_files"], self.attachments)
+        cached_content = self.service.get_cached_context(
+            build_cache_key(prompt_hash, document_parts),
+            system_instruction,
+            document_parts
+        )
+        current_parts = self.service.prepare_message_with_files(
+            prompt,
+            document_parts=[] if cached_content else document_parts
+        )
+        contents.append({"role": "user", "parts": current_parts})
+        prepare_seconds = time.perf_counter() - start
+        
+        response_text = "".join(
+            self.service.stream_response(contents, system_instruction, cached_content)
+        )
+        self.messages.append({"role": "assistant", "content": response_text})
+        
+        stats = dict(self.service.last_turn_stats)
+        stats["prepare"] = prepare_seconds
+        stats["turn"] = time.perf_counter() - start
+        return stats
+
+
+def make_service(args):
+    """
+    Build a service on a fresh fake client, so no state leaks between scenarios
+    
+    Args:
+        args (argparse.Namespace): Fake backend and rate limit options
+    
+    Returns:
+        GeminiService: Service backed by the fake
+    """
+    client = FakeGeminiClient(
+        ANSWER,
+        latency=args.latency,
+        chunk_size=args.chunk_size,
+        chunk_interval=args.chunk_interval
+    )
+    service = GeminiService(client=client)
+    if args.rate_limit:
+        limiter = TokenBucket(rate=args.rate_limit, capacity=max(1, int(args.rate_limit)))
+    else:
+        # Effectively unlimited, so the benchmark measures the app rather than the limiter
+        limiter = TokenBucket(rate=1e9, capacity=10 ** 9)
+    service.resilience = ResilientCaller(limiter=limiter)
+    
+    # Pay one-off import and setup costs outside the measured turns
+    BenchSession(service).turn(PROMPTS[0])
+    return service
+
+
+def run_sessions(sessions, turns_per_session, workers=None):
+    """
+    Run sessions side by side, each turn after the previous one
+    
+    Args:
+        sessions (list): BenchSession objects
+        turns_per_session (int): Turns each session runs
+        workers (int): Sessions running at once, all of them by default
+    
+    Returns:
+        dict: Scenario metrics
+    """
+    results = []
+    results_lock = threading.Lock()
+    
+    def drive(session):
+        for index in range(turns_per_session):
+            stats = session.turn(PROMPTS[index % len(PROMPTS)])
+            with results_lock:
+                results.append(stats)
+    
+    tracemalloc.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers or len(sessions)) as executor:
+        list(executor.map(drive, sessions))
+    wall = time.perf_counter() - start
+    _, peak_traced = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    
+    def summary(key):
+        values = [stats[key] for stats in results]
+        return {
+            "p50_ms": percentile(values, 0.50) * 1000,
+            "p95_ms": percentile(values, 0.95) * 1000,
+            "p99_ms": percentile(values, 0.99) * 1000
+        }
+    
+    return {
+        "sessions": len(sessions),
+        "turns": len(results),
+        "wall_seconds": wall,
+        "turns_per_second": len(results) / wall if wall else 0.0,
+        "turn_latency": summary("turn"),
+        "time_to_first_token": summary("time_to_first_token"),
+        "prepare_latency": summary("prepare"),
+        "prompt_tokens": sum(stats["usage"]["prompt_token_count"] for stats in results),
+        "output_tokens": sum(stats["usage"]["candidates_token_count"] for stats in results),
+        "peak_traced_mb": peak_traced / 2 ** 20
+    }
+
+
+def scenario_single(args):
+    """Independent single-turn questions, one after another"""
+    service = make_service(args)
+    sessions = [BenchSession(service) for _ in range(args.single_repeats)]
+    return run_sessions(sessions, 1, workers=1)
+
+
+def scenario_conversation(args):
+    """One long consultation"""
+    service = make_service(args)
+    return run_sessions([BenchSession(service)], args.conversation_turns)
+
+
+def scenario_concurrent(args):
+    """Many users chatting at once"""
+    service = make_service(args)
+    sessions = [BenchSession(service) for _ in range(args.sessions)]
+    return run_sessions(sessions, args.session_turns)
+
+
+def scenario_multi_pdf(args):
+    """Users chatting about several attached case bundles"""
+    service = make_service(args)
+    bundles = [
+        (f"bundle-{index}.pdf", make_case_bundle(args.pdf_pages, seed_topic=f"file {index}"))
+        for index in range(args.pdfs)
+    ]
+    sessions = [
+        BenchSession(service, uploaded_files=[UploadedDocument(name, data) for name, data in bundles])
+        for _ in range(args.pdf_sessions)
+    ]
+    metrics = run_sessions(sessions, args.session_turns)
+    metrics["uploads"] = service.client.files.upload_count
+    metrics["inline_bytes"] = sum(call["inline_bytes"] for call in service.client.models.calls)
+    return metrics
+
+
+SCENARIOS = {
+    "single": scenario_single,
+    "conversation": scenario_conversation,
+    "concurrent": scenario_concurrent,
+    "multi_pdf": scenario_multi_pdf
+}
+
+
+def git_revision():
+    """Current commit hash, or None outside a git checkout"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def flatten(metrics, prefix=""):
+    """Flatten nested metric dicts to 'a.b' keys"""
+    flat = {}
+    for key, value in metrics.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{key}."))
+        else:
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def print_results(results, baseline=None):
+    """Print each scenario's metrics, with the change against a baseline run"""
+    for scenario, metrics in results["scenarios"].items():
+        print(f"\n[{scenario}]")
+        previous = flatten((baseline or {}).get("scenarios", {}).get(scenario, {}))
+        for key, value in flatten(metrics).items():
+            line = f"  {key:<32} {value:>12.3f}" if isinstance(value, float) else f"  {key:<32} {value:>12}"
+            old = previous.get(key)
+            if isinstance(old, (int, float)) and old:
+                line += f"   {(value - old) / old * 100:+7.1f}%"
+            print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--label", default=time.strftime("%Y%m%d-%H%M%S"))
+    parser.add_argument("--compare", help="results file of an earlier run")
+    parser.add_argument("--latency", type=float, default=0.05, help="fake call latency (s)")
+    parser.add_argument("--chunk-size", type=int, default=32, help="characters per streamed chunk")
+    parser.add_argument("--chunk-interval", type=float, default=0.002, help="seconds between chunks")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="requests per second, 0 for none")
+    parser.add_argument("--single-repeats", type=int, default=50)
+    parser.add_argument("--conversation-turns", type=int, default=200)
+    parser.add_argument("--sessions", type=int, default=32)
+    parser.add_argument("--session-turns", type=int, default=5)
+    parser.add_argument("--pdfs", type=int, default=4)
+    parser.add_argument("--pdf-pages", type=int, default=100)
+    parser.add_argument("--pdf-sessions", type=int, default=8)
+    args = parser.parse_args()
+    
+    results = {
+        "label": args.label,
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "options": vars(args),
+        "scenarios": {}
+    }
+    
+    for name in args.scenarios.split(","):
+        print(f"running {name}...", file=sys.stderr)
+        results["scenarios"][name] = SCENARIOS[name](args)
+    
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results["peak_rss_mb"] = max_rss / (2 ** 20 if sys.platform == "darwin" else 2 ** 10)
+    
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as handle:
+            baseline = json.load(handle)
+    print_results(results, baseline)
+    print(f"\npeak RSS: {results['peak_rss_mb']:.1f} MB")
+    
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f"{args.label}.json")
+    with open(path, "w", encoding="utf-8") as handle:
+        json.dump(results, handle, indent=2)
+    print(f"results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
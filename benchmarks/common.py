@@ -0,0 +1,109 @@
+"""
+Shared helpers for the offline benchmarks
+"""
+import math
+import os
+
+
+def percentile(values, fraction):
+    """
+    Nearest-rank percentile of a list of numbers
+    
+    Args:
+        values (list): Samples
+        fraction (float): Percentile as a fraction, e.g. 0.95
+        
+    Returns:
+        float: The percentile, or 0.0 for no samples
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def current_rss_mb():
+    """
+    Resident set size of this process now
+    
+    Returns:
+        float: RSS in MB, 0.0 where /proc is unavailable
+    """
+    try:
+        with open("/proc/self/statm") as handle:
+            return int(handle.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        return 0.0
+
+
+def make_pdf(pages):
+    """
+    Build a minimal text PDF without third-party writers
+    
+    Args:
+        pages (list): One string per page; lines separated by newlines,
+            Latin-1 text only
+        
+    Returns:
+        bytes: PDF file contents
+    """
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [{}] /Count {} >>".format(
+            " ".join(f"{4 + 2 * index} 0 R" for index in range(len(pages))), len(pages)
+        ),
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"
+    ]
+    
+    for index, text in enumerate(pages):
+        escaped = text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+        lines = " ".join(f"({line}) Tj T*" for line in escaped.split("\n"))
+        stream = f"BT /F1 10 Tf 50 780 Td 12 TL {lines} ET"
+        objects.append(
+            "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792]"
+            f" /Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * index} 0 R >>"
+        )
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+    
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    
+    xref_offset = len(output)
+    output += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    for offset in offsets:
+        output += f"{offset:010d} 00000 n \n".encode("latin-1")
+    output += (
+        f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\n"
+        f"startxref\n{xref_offset}\n%%EOF\n"
+    ).encode("latin-1")
+    
+    return bytes(output)
+
+
+def make_case_bundle(num_pages, seed_topic="service"):
+    """
+    Build a synthetic case-file PDF with a few pages on a distinctive topic
+    
+    Args:
+        num_pages (int): Number of pages
+        seed_topic (str): Label for the relevant pages
+        
+    Returns:
+        bytes: PDF file contents
+    """
+    filler = (
+        "The witness described the premises and the sequence of meetings in general terms. "
+        "Counsel for the complainant submitted further correspondence regarding invoices. "
+    )
+    relevant = (
+        "The summons was served on 12 March 2021 at an address the defendant had left in 2019. "
+        "The bailiff report does not record personal service and the limitation period expired. "
+    )
+    pages = []
+    for page in range(num_pages):
+        body = relevant if page % 97 == 13 else filler
+        pages.append("\n".join([f"Page {page + 1} - {seed_topic} record"] + [body[i:i + 90] for i in range(0, len(body), 90)] * 6))
+    return make_pdf(pages)
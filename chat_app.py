@@ -0,0 +1,630 @@
+"""
+Chat, comparison and batch review pages shown after login
+"""
+import time
+
+import streamlit as st
+
+from config import (
+    RESPONSE_CACHE_ENABLED, RESPONSE_CACHE_SEMANTIC,
+    METRICS_PORT, CONVERSATION_STORE_ENABLED, MATTER_LIST_LIMIT, HISTORY_PAGE_SIZE,
+    BATCH_REVIEW_FOLDER_ROOT, SESSION_STATE_TTL_SECONDS, PREFETCH_ENABLED
+)
+from history_manager import ConversationHistoryCache, HistoryManager
+from attachment_cache import AttachmentCache
+from ui_components import (
+    render_custom_css, render_sidebar, render_chat_history,
+    render_comparison, format_comparison, render_batch_results, render_batch_progress,
+    render_extraction, display_markdown, display_stream,
+    get_chat_placeholder, get_spinner_text, get_busy_text
+)
+from language_utils import detect_language, UI_TRANSLATIONS
+from prompt_builder import build_complete_system_prompt, build_complete_system_prompt_with_hash, is_bilingual
+from ai_service import GeminiService, AsyncGeminiService, run_async, route_request
+from context_cache import build_cache_key
+from response_cache import get_response_cache, build_response_key
+from jobs import get_job_queue, JobRejected
+from conversation_store import get_conversation_store
+from state_backend import get_state_backend
+from prefetch import prefetch_signature, start_prefetch
+from batch_review import get_batch_reviewer, load_folder
+from tracing import tracer, start_metrics_server
+
+
+# Expose /metrics and /turns for scraping, once per process
+if METRICS_PORT:
+    start_metrics_server(METRICS_PORT)
+
+
+def initialize_chat_state():
+    """Initialize the session state used by the chat pages"""
+    if "messages" not in st.session_state:
+        st.session_state.messages = []
+    
+    if "turn_metrics" not in st.session_state:
+        st.session_state.turn_metrics = []
+    
+    if "history_cache" not in st.session_state:
+        st.session_state.history_cache = ConversationHistoryCache()
+    
+    if "history_manager" not in st.session_state:
+        st.session_state.history_manager = HistoryManager()
+    
+    if "matter_id" not in st.session_state:
+        st.session_state.matter_id = None
+    
+    if "history_visible" not in st.session_state:
+        st.session_state.history_visible = HISTORY_PAGE_SIZE
+    
+    if "extraction_records" not in st.session_state:
+        st.session_state.extraction_records = []
+    
+    if "attachments" not in st.session_state:
+        st.session_state.attachments = AttachmentCache()
+    
+    if "prefetch" not in st.session_state:
+        st.session_state.prefetch = None
+    
+    if "last_language" not in st.session_state:
+        st.session_state.last_language = st.session_state.ui_language
+    
+    if "session_restored" not in st.session_state:
+        st.session_state.session_restored = True
+        restore_session()
+
+
+def restore_session():
+    """Continue the matter this browser last used, whichever replica served it"""
+    record = get_state_backend().get("sessions", st.session_state.client_id)
+    if record is None:
+        return
+    
+    if record.get("matter_id") and CONVERSATION_STORE_ENABLED:
+        open_matter(record["matter_id"], record.get("summary"))
+    else:
+        st.session_state.messages = record.get("messages", [])
+        st.session_state.history_manager.restore_state(record.get("summary"))
+
+
+def save_session():
+    """Share this browser's current matter and history summary with other replicas"""
+    record = {
+        "matter_id": st.session_state.matter_id,
+        "summary": st.session_state.history_manager.export_state()
+    }
+    if not CONVERSATION_STORE_ENABLED:
+        record["messages"] = st.session_state.messages
+    
+    get_state_backend().set(
+        "sessions",
+        st.session_state.client_id,
+        record,
+        expires_at=time.time() + SESSION_STATE_TTL_SECONDS
+    )
+
+
+def open_matter(matter_id, summary=None):
+    """
+    Switch the session to a saved matter, or to a new empty one
+    
+    Args:
+        matter_id (str): Matter to open, or None for a new matter
+        summary (dict): History summary of the matter saved by another session
+    """
+    st.session_state.matter_id = matter_id
+    st.session_state.messages = (
+        get_conversation_store().load_messages(st.session_state.client_id, matter_id) if matter_id else []
+    )
+    st.session_state.turn_metrics = []
+    st.session_state.history_cache = ConversationHistoryCache()
+    st.session_state.history_manager = HistoryManager()
+    st.session_state.history_manager.restore_state(summary)
+    st.session_state.history_visible = HISTORY_PAGE_SIZE
+    save_session()
+
+
+def update_prefetch(settings):
+    """
+    Start preparing the next turn when the settings or attachments change
+    
+    Args:
+        settings (dict): User settings from sidebar
+    """
+    current = st.session_state.prefetch
+    language = st.session_state.last_language
+    route = route_request(settings, "", len(st.session_state.messages))
+    if (current is None or current.signature != prefetch_signature(settings)
+            or current.language != language or current.route != route):
+        st.session_state.prefetch = start_prefetch(settings, st.session_state.attachments, language, route)
+
+
+def save_turn(user_message, assistant_message):
+    """
+    Persist a finished exchange, opening a matter on the first one
+    
+    Args:
+        user_message (dict): The user's message
+        assistant_message (dict): The answer to it
+    """
+    if CONVERSATION_STORE_ENABLED:
+        store = get_conversation_store()
+        owner = st.session_state.client_id
+        messages = [user_message, assistant_message]
+        try:
+            store.append_messages(owner, st.session_state.matter_id, messages)
+        except KeyError:
+            # No matter open yet, or one saved before ownership was recorded
+            st.session_state.matter_id = store.create_matter(owner, user_message["content"])
+            store.append_messages(owner, st.session_state.matter_id, messages)
+    
+    save_session()
+
+
+def prepare_model_request(ai_service, prompt, settings, detected_lang,
+                          system_instruction=None, prompt_hash=None, turn=None):
+    """
+    Assemble history, attachments and cached context for a model call
+    
+    Args:
+        ai_service (GeminiService): Service handling the request
+        prompt (str): Current user prompt
+        settings (dict): User settings from sidebar
+        detected_lang (str): Detected language ('en' or 'el')
+        system_instruction (str): System prompt for the model
+        prompt_hash (str): Stable hash of the system prompt, or None to
+            skip server-side context caching
+        turn (dict): Trace record the stage timings are attached to
+        
+    Returns:
+        tuple: (conversation contents, cached content name or None)
+    """
+    # Build conversation history (excluding current message)
+    with tracer.span("history_build", turn):
+        conversation_contents = ai_service.build_conversation_history(
+            st.session_state.messages[:-1],
+            st.session_state.history_cache
+        )
+    
+    # Keep recent turns within the token budget, summarize the rest
+    with tracer.span("history_budget", turn):
+        conversation_contents = st.session_state.history_manager.apply(
+            conversation_contents,
+            ai_service
+        )
+    
+    if settings["retrieval_mode"] and settings["uploaded_files"]:
+        # Send only the passages relevant to this prompt
+        document_parts = []
+        with tracer.span("retrieval", turn):
+            passage_parts = ai_service.prepare_passage_parts(
+                prompt,
+                settings["uploaded_files"],
+                detected_lang,
+                st.session_state.attachments
+            )
+    else:
+        # Upload (or reuse) attached documents
+        with tracer.span("document_upload", turn):
+            document_parts = ai_service.prepare_document_parts(
+                settings["uploaded_files"],
+                st.session_state.attachments
+            )
+        passage_parts = []
+    
+    # Reuse a server-side cache of the system prompt and documents
+    cached_content = None
+    if prompt_hash is not None:
+        with tracer.span("context_cache", turn):
+            cached_content = ai_service.get_cached_context(
+                build_cache_key(prompt_hash, document_parts, ai_service.model),
+                system_instruction,
+                document_parts
+            )
+    
+    # Prepare current message, with files unless already cached
+    with tracer.span("message_parts", turn):
+        current_parts = ai_service.prepare_message_with_files(
+            prompt,
+            document_parts=([] if cached_content else document_parts) + passage_parts
+        )
+    
+    # Add current message to conversation
+    conversation_contents.append({"role": "user", "parts": current_parts})
+    
+    return conversation_contents, cached_content
+
+
+def model_job(ai_service, conversation_contents, system_instruction, cached_content, turn=None):
+    """
+    Build the work function that streams a model answer into a job
+    
+    Args:
+        ai_service (GeminiService): Service handling the request
+        conversation_contents (list): Full conversation history
+        system_instruction (str): System prompt for the model
+        cached_content (str): Cached content replacing the inline prompt
+        turn (dict): Trace record the model call timing is attached to
+        
+    Returns:
+        callable: Work function for the job queue
+    """
+    def work(job):
+        with tracer.span("generate", turn):
+            for chunk in ai_service.stream_response(conversation_contents, system_instruction, cached_content):
+                job.append(chunk)
+        return ai_service.last_turn_stats
+    
+    return work
+
+
+def finish_trace(turn, turn_stats):
+    """
+    Record a turn's model timings and token usage, then close its trace
+    
+    Args:
+        turn (dict): Trace record from tracer.start_turn()
+        turn_stats (dict): Per-turn measurements reported by the service
+    """
+    tracer.record_usage(turn_stats.get("usage", {}), turn)
+    tracer.observe("time_to_first_token", turn_stats["time_to_first_token"], turn)
+    tracer.observe("total_latency", turn_stats["total_latency"], turn)
+    tracer.finish_turn(turn, turn_stats)
+
+
+def complete_turn(user_message, response_text, turn_stats, turn=None, cache_entry=None):
+    """
+    Record a delivered answer in the history, the store, the response cache and the trace
+    
+    Args:
+        user_message (dict): The user's message
+        response_text (str): The answer, unescaped as the model wrote it
+        turn_stats (dict): Per-turn measurements reported by the service
+        turn (dict): Trace record from tracer.start_turn(), None if untraced
+        cache_entry (tuple): (ResponseCache, key) to store a cacheable answer under
+    """
+    if cache_entry is not None:
+        response_cache, response_key = cache_entry
+        response_cache.put(response_key, user_message["content"], response_text)
+    
+    st.session_state.messages.append({"role": "assistant", "content": response_text})
+    st.session_state.turn_metrics.append(turn_stats)
+    save_turn(user_message, st.session_state.messages[-1])
+    
+    if turn is not None:
+        finish_trace(turn, turn_stats)
+
+
+def recover_jobs():
+    """Deliver answers whose script run was lost, e.g. to a browser refresh"""
+    job_queue = get_job_queue()
+    
+    for job in job_queue.jobs_for(st.session_state.client_id):
+        messages = st.session_state.messages
+        if not (messages and messages[-1]["role"] == "user" and messages[-1]["content"] == job.prompt):
+            messages.append({"role": "user", "content": job.prompt})
+            with st.chat_message("user"):
+                st.markdown(display_markdown(job.prompt))
+        user_message = messages[-1]
+        
+        # Claimed only once delivered: a rerun stopping this stream leaves the job for the next run
+        with st.chat_message("assistant"):
+            try:
+                st.write_stream(display_stream(job.iter_chunks()))
+            except RuntimeError as exc:
+                job_queue.claim(job.id)
+                tracer.increment("turn_errors_total")
+                st.error(str(exc))
+                messages.pop()
+                continue
+        job_queue.claim(job.id)
+        
+        # Finished as the interrupted run would have: cache, trace and metrics
+        complete_turn(
+            user_message, job.text, job.stats,
+            job.context.get("turn"), job.context.get("cache_entry")
+        )
+
+
+def answer_comparison(prompt, settings, is_greek):
+    """
+    Answer the prompt under several jurisdictions concurrently
+    
+    Args:
+        prompt (str): Current user prompt
+        settings (dict): User settings from sidebar
+        is_greek (bool): Whether UI is in Greek
+        
+    Returns:
+        tuple: (combined response text, turn timings)
+    """
+    start_time = time.perf_counter()
+    route = route_request(settings, prompt, len(st.session_state.messages) - 1)
+    turn = tracer.start_turn(
+        mode="compare",
+        branches=len(settings["compare_jurisdictions"]),
+        route=route["name"]
+    )
+    
+    with st.spinner(get_spinner_text(is_greek)):
+        with tracer.span("language_detection", turn):
+            detected_lang = detect_language(prompt)
+            bilingual = is_bilingual(prompt)
+        
+        # One system prompt per compared jurisdiction
+        with tracer.span("system_prompt", turn):
+            system_instructions = {
+                jurisdiction: build_complete_system_prompt(
+                    jurisdiction,
+                    settings["specialty"],
+                    settings,
+                    detected_lang,
+                    bilingual
+                )
+                for jurisdiction in settings["compare_jurisdictions"]
+            }
+        
+        ai_service = AsyncGeminiService(route=route)
+        conversation_contents, _ = prepare_model_request(
+            ai_service, prompt, settings, detected_lang, turn=turn
+        )
+        
+        with tracer.span("generate", turn):
+            results = run_async(
+                ai_service.compare_jurisdictions(conversation_contents, system_instructions)
+            )
+    
+    render_comparison(results, is_greek)
+    
+    total_latency = time.perf_counter() - start_time
+    usage = {}
+    for result in results.values():
+        for field, count in result["usage"].items():
+            usage[field] = usage.get(field, 0) + count
+    turn_stats = {
+        "time_to_first_token": total_latency,
+        "total_latency": total_latency,
+        "streamed": False,
+        "branch_latencies": {label: result["latency"] for label, result in results.items()},
+        "usage": usage,
+        "route": route["name"],
+        "model": ai_service.model,
+        "cost_usd": sum(result["cost_usd"] for result in results.values())
+    }
+    finish_trace(turn, turn_stats)
+    
+    return format_comparison(results, is_greek), turn_stats
+
+
+def batch_review_page(settings, is_greek):
+    """
+    Collect documents for a batch review and show running and finished reviews
+    
+    Args:
+        settings (dict): User settings from sidebar
+        is_greek (bool): Whether UI is in Greek
+    """
+    language = "el" if is_greek else "en"
+    reviewer = get_batch_reviewer()
+    
+    uploaded_files = st.file_uploader(
+        UI_TRANSLATIONS["batch_documents"][language],
+        type="pdf",
+        accept_multiple_files=True,
+        key="batch_files"
+    )
+    folder = st.text_input(UI_TRANSLATIONS["batch_folder"][language]) if BATCH_REVIEW_FOLDER_ROOT else ""
+    
+    start_column, extract_column = st.columns(2)
+    start_review = start_column.button(
+        UI_TRANSLATIONS["batch_start"][language], disabled=not (uploaded_files or folder)
+    )
+    start_extraction = extract_column.button(
+        UI_TRANSLATIONS["extract_start"][language], disabled=not (uploaded_files or folder)
+    )
+    
+    if start_review or start_extraction:
+        documents = [(uploaded_file.name, uploaded_file.getvalue()) for uploaded_file in uploaded_files or []]
+        if folder:
+            try:
+                documents.extend(load_folder(folder))
+            except (OSError, ValueError) as exc:
+                st.error(str(exc))
+                return
+        
+        if start_review:
+            reviewer.start(st.session_state.client_id, documents, settings, language)
+        else:
+            # Typed records per document; filtering below needs no further model calls
+            with st.spinner(get_spinner_text(is_greek)):
+                records, errors = GeminiService().extract_documents(documents, language)
+            st.session_state.extraction_records = records
+            for name, error in errors.items():
+                st.error(f"{name}: {error}")
+    
+    if st.session_state.extraction_records:
+        render_extraction(st.session_state.extraction_records, is_greek)
+    
+    # Newest review first
+    for review in reversed(reviewer.reviews_for(st.session_state.client_id)):
+        st.subheader(time.strftime("%Y-%m-%d %H:%M", time.localtime(review.created_at)))
+        if review.done:
+            render_batch_results(review, is_greek)
+        else:
+            render_batch_progress(review, is_greek)
+
+
+def main_app():
+    """Main application logic"""
+    initialize_chat_state()
+    is_greek = st.session_state.ui_language == "el"
+    
+    # Apply custom CSS
+    render_custom_css()
+    
+    # Render sidebar and get user settings
+    matters = None
+    if CONVERSATION_STORE_ENABLED:
+        matters = get_conversation_store().list_matters(st.session_state.client_id, MATTER_LIST_LIMIT)
+    settings = render_sidebar(is_greek, matters, st.session_state.matter_id)
+    
+    if settings["matter_id"] != st.session_state.matter_id:
+        open_matter(settings["matter_id"])
+    
+    # Drop cached attachments removed from the uploader
+    st.session_state.attachments.sync(settings["uploaded_files"])
+    
+    # Prompts, uploads and the context cache get ready while the user types
+    if PREFETCH_ENABLED and not (settings["batch_mode"] or settings["compare_jurisdictions"]):
+        update_prefetch(settings)
+    
+    # Main chat interface
+    st.title("Draco")
+    
+    if settings["batch_mode"]:
+        batch_review_page(settings, is_greek)
+        return
+    
+    # Display the most recent page of chat history
+    render_chat_history(st.session_state.messages, st.session_state.history_visible)
+    
+    # Pick up answers still running or finished for a lost script run
+    recover_jobs()
+    
+    # Handle user input
+    placeholder_text = get_chat_placeholder(is_greek)
+    
+    if prompt := st.chat_input(placeholder_text):
+        # Add user message to history
+        user_message = {"role": "user", "content": prompt}
+        st.session_state.messages.append(user_message)
+        
+        with st.chat_message("user"):
+            st.markdown(display_markdown(prompt))
+        
+        # Generate assistant response
+        with st.chat_message("assistant"):
+            spinner_text = get_spinner_text(is_greek)
+            
+            if settings["compare_jurisdictions"]:
+                response_text, turn_stats = answer_comparison(prompt, settings, is_greek)
+                st.session_state.messages.append({
+                    "role": "assistant",
+                    "content": response_text
+                })
+                st.session_state.turn_metrics.append(turn_stats)
+                save_turn(user_message, st.session_state.messages[-1])
+                return
+            
+            with st.spinner(spinner_text):
+                start_time = time.perf_counter()
+                turn = tracer.start_turn(
+                    mode="retrieval" if settings["retrieval_mode"] else "chat",
+                    attachments=len(settings["uploaded_files"] or [])
+                )
+                
+                # Detect language of user prompt
+                with tracer.span("language_detection", turn):
+                    detected_lang = detect_language(prompt)
+                    bilingual = is_bilingual(prompt)
+                st.session_state.last_language = detected_lang
+                
+                # Report the work done ahead of time for this turn
+                prefetch = st.session_state.prefetch
+                saved = prefetch.claim(prefetch_signature(settings), detected_lang, start_time) if prefetch else None
+                if saved is not None:
+                    tracer.observe("prefetch_saved", saved, turn)
+                    tracer.increment("prefetch_saved_seconds_total", saved)
+                
+                # Build system prompt (memoized per settings combination)
+                with tracer.span("system_prompt", turn):
+                    system_instruction, prompt_hash = build_complete_system_prompt_with_hash(
+                        settings["jurisdiction"],
+                        settings["specialty"],
+                        settings,
+                        detected_lang,
+                        bilingual
+                    )
+                
+                # Initialize AI service on the model routed for this request
+                ai_service = GeminiService(route=route_request(
+                    settings, prompt, len(st.session_state.messages) - 1
+                ))
+                
+                # Only standalone questions without documents are cacheable
+                response_cache = get_response_cache() if RESPONSE_CACHE_ENABLED else None
+                cacheable = (
+                    response_cache is not None
+                    and not settings["uploaded_files"]
+                    and len(st.session_state.messages) == 1
+                )
+                
+                cached_response = None
+                cache_entry = None
+                if cacheable:
+                    # Answers are only reused on the same model and generation limits
+                    response_key = build_response_key(
+                        prompt_hash, ai_service.model, ai_service.generation_settings()
+                    )
+                    cache_entry = (response_cache, response_key)
+                    with tracer.span("response_cache", turn):
+                        cached_response = response_cache.get(
+                            response_key,
+                            prompt,
+                            embed=ai_service.embed_texts if RESPONSE_CACHE_SEMANTIC else None
+                        )
+                elif response_cache is not None:
+                    response_cache.record_skip()
+                
+                if cached_response is None:
+                    conversation_contents, cached_content = prepare_model_request(
+                        ai_service, prompt, settings, detected_lang,
+                        system_instruction, prompt_hash, turn
+                    )
+            
+            if cached_response is not None:
+                # Answer repeated question from the response cache
+                st.markdown(display_markdown(cached_response))
+                response_text = cached_response
+                total_latency = time.perf_counter() - start_time
+                turn_stats = {
+                    "time_to_first_token": total_latency,
+                    "total_latency": total_latency,
+                    "streamed": False,
+                    "response_cache_hit": True
+                }
+                # Already cached; storing it again would only renew its age
+                cache_entry = None
+            else:
+                # Run the model call on a background worker
+                job_queue = get_job_queue()
+                try:
+                    job_id = job_queue.submit(
+                        st.session_state.client_id,
+                        prompt,
+                        model_job(ai_service, conversation_contents, system_instruction, cached_content, turn),
+                        context={"turn": turn, "cache_entry": cache_entry}
+                    )
+                except JobRejected:
+                    tracer.increment("jobs_rejected_total")
+                    st.warning(get_busy_text(is_greek))
+                    st.session_state.messages.pop()
+                    return
+                
+                # Stream response into the assistant bubble as chunks arrive
+                # A rerun or refresh stopping the stream leaves the job unclaimed for recover_jobs()
+                job = job_queue.get(job_id)
+                try:
+                    st.write_stream(display_stream(job.iter_chunks()))
+                except RuntimeError as exc:
+                    # Retries exhausted or circuit open: report instead of crashing the page
+                    job_queue.claim(job_id)
+                    tracer.increment("turn_errors_total")
+                    st.error(str(exc))
+                    st.session_state.messages.pop()
+                    return
+                job_queue.claim(job_id)
+                response_text = job.text
+                turn_stats = job.stats
+            
+            # Save response and turn timings
+            complete_turn(user_message, response_text, turn_stats, turn, cache_entry)
@@ -1,6 +1,7 @@
 """
 Configuration settings for Draco Legal AI
 """
+import json
 import os
 from dotenv import load_dotenv
 
@@ -24,5 +25,175 @@ GEMINI_CONFIG = {
     "top_k": 40
 }
 
+# Model Routing: the first route whose conditions all hold serves the request.
+# Conditions: depths, min/max_attachment_bytes, min/max_prompt_chars,
+# min/max_history_messages. Override the list with MODEL_ROUTES_JSON.
+GEMINI_DEEP_MODEL = os.getenv("GEMINI_DEEP_MODEL", "gemini-3-pro-preview")
+MODEL_ROUTES = json.loads(os.getenv("MODEL_ROUTES_JSON", "null")) or [
+    {
+        "name": "quick",
+        "when": {"depths": ["Quick Review"], "max_attachment_bytes": 0, "max_prompt_chars": 2000},
+        "model": GEMINI_MODEL,
+        "max_output_tokens": 2048,
+        "thinking_budget": 512
+    },
+    {
+        "name": "deep",
+        "when": {"depths": ["Deep Dive"]},
+        "model": GEMINI_DEEP_MODEL,
+        "max_output_tokens": 16384,
+        "thinking_budget": 8192
+    },
+    {
+        "name": "large_bundle",
+        "when": {"min_attachment_bytes": 10 * 1024 * 1024},
+        "model": GEMINI_DEEP_MODEL,
+        "max_output_tokens": 12288,
+        "thinking_budget": 4096
+    },
+    {
+        "name": "standard",
+        "when": {},
+        "model": GEMINI_MODEL,
+        "max_output_tokens": 8192,
+        "thinking_budget": None
+    }
+]
+
+# USD per million tokens, for per-route cost estimates
+MODEL_PRICES = {
+    "gemini-3-flash-preview": {"input": 0.50, "cached_input": 0.05, "output": 3.00},
+    "gemini-3-pro-preview": {"input": 2.00, "cached_input": 0.20, "output": 12.00}
+}
+
+# Structured extraction calls: deterministic, JSON constrained by a response schema
+EXTRACTION_CONFIG = {
+    "temperature": 0.0,
+    "response_mime_type": "application/json"
+}
+
+# Gemini HTTP Connection Pool
+GEMINI_POOL_SIZE = int(os.getenv("GEMINI_POOL_SIZE", "10"))
+GEMINI_KEEPALIVE_EXPIRY = float(os.getenv("GEMINI_KEEPALIVE_EXPIRY", "120"))
+
+# Offline Backend ("gemini" or "fake" for load tests and benchmarks)
+GEMINI_BACKEND = os.getenv("GEMINI_BACKEND", "gemini")
+FAKE_LATENCY_SECONDS = float(os.getenv("FAKE_LATENCY_SECONDS", "0.05"))
+FAKE_CHUNK_INTERVAL_SECONDS = float(os.getenv("FAKE_CHUNK_INTERVAL_SECONDS", "0.005"))
+
 # Language Detection Threshold
 GREEK_DETECTION_THRESHOLD = 0.3
+LANGUAGE_SAMPLE_CHARS = 64 * 1024
+LANGUAGE_SAMPLE_WINDOWS = 16
+# Share of letters each of Greek and Latin script must reach for a prompt
+# to get the bilingual instruction
+BILINGUAL_MIN_RATIO = float(os.getenv("BILINGUAL_MIN_RATIO", "0.2"))
+
+# Document Upload (Files API)
+DOCUMENT_UPLOAD_ENABLED = os.getenv("DOCUMENT_UPLOAD_ENABLED", "true").lower() == "true"
+DOCUMENT_FILE_TTL_SECONDS = 48 * 3600
+DOCUMENT_REUPLOAD_MARGIN_SECONDS = 3600
+
+# Attachment Cache (per session; 0 keeps every attachment in memory)
+ATTACHMENT_SPILL_BYTES = int(os.getenv("ATTACHMENT_SPILL_BYTES", "0"))
+
+# Prefetch (prepare the next turn while the user types)
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "true").lower() == "true"
+PREFETCH_WORKERS = int(os.getenv("PREFETCH_WORKERS", "2"))
+
+# Context Caching (server-side cached system prompts)
+CONTEXT_CACHE_ENABLED = os.getenv("CONTEXT_CACHE_ENABLED", "true").lower() == "true"
+CONTEXT_CACHE_TTL_SECONDS = int(os.getenv("CONTEXT_CACHE_TTL_SECONDS", "3600"))
+CONTEXT_CACHE_MAX_ENTRIES = int(os.getenv("CONTEXT_CACHE_MAX_ENTRIES", "20"))
+CONTEXT_CACHE_REFRESH_MARGIN_SECONDS = 300
+CONTEXT_CACHE_RETRY_SECONDS = 600
+
+# System Prompt Memoization
+SYSTEM_PROMPT_CACHE_SIZE = 256
+DOCUMENT_COUNT_BUCKET_CAP = 10
+
+# Conversation History Budget
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "32000"))
+HISTORY_MIN_RECENT_MESSAGES = 4
+HISTORY_SUMMARY_BLOCK = 6
+HISTORY_COUNT_TOKENS_API = os.getenv("HISTORY_COUNT_TOKENS_API", "true").lower() == "true"
+
+# Response Cache
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+RESPONSE_CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH", ".cache/response_cache.sqlite3")
+RESPONSE_CACHE_TTL_SECONDS = int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "5000"))
+RESPONSE_CACHE_SEMANTIC = os.getenv("RESPONSE_CACHE_SEMANTIC", "false").lower() == "true"
+RESPONSE_CACHE_SIMILARITY_THRESHOLD = float(os.getenv("RESPONSE_CACHE_SIMILARITY_THRESHOLD", "0.95"))
+# Most recently used entries scored by a similarity lookup
+RESPONSE_CACHE_SEMANTIC_CANDIDATES = int(os.getenv("RESPONSE_CACHE_SEMANTIC_CANDIDATES", "1000"))
+EMBEDDING_MODEL = "gemini-embedding-001"
+
+# Conversation Store (persistent matters and transcripts)
+CONVERSATION_STORE_ENABLED = os.getenv("CONVERSATION_STORE_ENABLED", "true").lower() == "true"
+CONVERSATION_STORE_PATH = os.getenv("CONVERSATION_STORE_PATH", ".cache/conversations.sqlite3")
+MATTER_LIST_LIMIT = 50
+MATTER_TITLE_CHARS = 60
+HISTORY_PAGE_SIZE = 20
+
+# Shared State ("memory" for one process, "sqlite" to share across replicas)
+STATE_BACKEND = os.getenv("STATE_BACKEND", "memory")
+STATE_BACKEND_PATH = os.getenv("STATE_BACKEND_PATH", ".cache/state.sqlite3")
+SESSION_STATE_TTL_SECONDS = int(os.getenv("SESSION_STATE_TTL_SECONDS", str(7 * 24 * 3600)))
+
+# Batch Document Review
+BATCH_REVIEW_USE_BATCH_API = os.getenv("BATCH_REVIEW_USE_BATCH_API", "true").lower() == "true"
+BATCH_POLL_SECONDS = float(os.getenv("BATCH_POLL_SECONDS", "15"))
+BATCH_TIMEOUT_SECONDS = float(os.getenv("BATCH_TIMEOUT_SECONDS", str(24 * 3600)))
+BATCH_FALLBACK_WORKERS = int(os.getenv("BATCH_FALLBACK_WORKERS", "4"))
+BATCH_REVIEW_FOLDER_ROOT = os.getenv("BATCH_REVIEW_FOLDER_ROOT", "")
+BATCH_UI_REFRESH_SECONDS = 3
+
+# Structured Extraction
+EXTRACTION_CACHE_PATH = os.getenv("EXTRACTION_CACHE_PATH", ".cache/extractions.sqlite3")
+EXTRACTION_SCHEMA_VERSION = 1
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", "4"))
+EXTRACTION_MAX_ATTEMPTS = 2
+
+# Jurisdiction Comparison Mode
+COMPARE_MAX_CONCURRENCY = int(os.getenv("COMPARE_MAX_CONCURRENCY", "3"))
+COMPARE_TIMEOUT_SECONDS = float(os.getenv("COMPARE_TIMEOUT_SECONDS", "120"))
+
+# Local Document Ingestion
+INGEST_CHUNK_CHARS = 1500
+INGEST_CHUNK_OVERLAP = 200
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", str(min(4, os.cpu_count() or 1))))
+INGEST_CACHE_MAX_DOCUMENTS = 64
+
+# Retrieval Over Uploaded Documents
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "8"))
+RETRIEVAL_EMBEDDING_WEIGHT = float(os.getenv("RETRIEVAL_EMBEDDING_WEIGHT", "0.0"))
+RETRIEVAL_INDEX_CACHE_SIZE = 16
+RETRIEVAL_EMBEDDING_CACHE_SIZE = int(os.getenv("RETRIEVAL_EMBEDDING_CACHE_SIZE", "4096"))
+EMBEDDING_BATCH_SIZE = 100
+
+# Background Job Queue
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "8"))
+JOB_MAX_IN_FLIGHT_PER_USER = int(os.getenv("JOB_MAX_IN_FLIGHT_PER_USER", "2"))
+JOB_MAX_IN_FLIGHT_TOTAL = int(os.getenv("JOB_MAX_IN_FLIGHT_TOTAL", "32"))
+JOB_RESULT_TTL_SECONDS = int(os.getenv("JOB_RESULT_TTL_SECONDS", "3600"))
+
+# Resilience (rate limiting, retries, circuit breaker, hedging)
+RATE_LIMIT_PER_SECOND = float(os.getenv("RATE_LIMIT_PER_SECOND", "5"))
+RATE_LIMIT_BURST = int(os.getenv("RATE_LIMIT_BURST", "10"))
+RETRY_MAX_ATTEMPTS = int(os.getenv("RETRY_MAX_ATTEMPTS", "4"))
+RETRY_BASE_DELAY_SECONDS = 0.5
+RETRY_MAX_DELAY_SECONDS = 8.0
+CIRCUIT_FAILURE_THRESHOLD = 5
+CIRCUIT_RESET_SECONDS = 30.0
+HEDGING_ENABLED = os.getenv("HEDGING_ENABLED", "false").lower() == "true"
+HEDGE_PERCENTILE = 0.95
+HEDGE_MIN_SAMPLES = 20
+
+# Metrics and Tracing
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+# Loopback only by default: /turns exposes per-turn routes, costs and token counts
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_JSONL_PATH = os.getenv("METRICS_JSONL_PATH", "")
+METRICS_WINDOW = 1000
+ADMIN_METRICS_ENABLED = os.getenv("ADMIN_METRICS_ENABLED", "false").lower() == "true"
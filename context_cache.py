@@ -0,0 +1,220 @@
+"""
+Server-side context caches for system prompts and pinned documents
+"""
+import hashlib
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+from google.genai import types
+from config import (
+    GEMINI_MODEL, CONTEXT_CACHE_TTL_SECONDS, CONTEXT_CACHE_MAX_ENTRIES,
+    CONTEXT_CACHE_REFRESH_MARGIN_SECONDS, CONTEXT_CACHE_RETRY_SECONDS
+)
+
+
+_managers = weakref.WeakKeyDictionary()
+_managers_lock = threading.Lock()
+
+
+def _part_key(part):
+    """Identify a document part by file URI or by a hash of its inline bytes"""
+    if part.file_data is not None:
+        return part.file_data.file_uri
+    if part.inline_data is not None:
+        return hashlib.sha256(part.inline_data.data).hexdigest()
+    return hashlib.sha256((part.text or "").encode("utf-8")).hexdigest()
+
+
+def build_cache_key(prompt_hash, document_parts=None, model=GEMINI_MODEL):
+    """
+    Build the key identifying a cached system prompt and its pinned documents
+    
+    Args:
+        prompt_hash (str): Hash of the system prompt from prompt_builder
+        document_parts (list): Document parts pinned into the cache
+        model (str): Model the cache is created for
+        
+    Returns:
+        tuple: Hashable cache key
+    """
+    return (
+        model,
+        prompt_hash,
+        tuple(_part_key(part) for part in document_parts or ())
+    )
+
+
+class ContextCacheManager:
+    """Creates, reuses, refreshes and evicts cached contents with an LRU limit"""
+    
+    def __init__(self, client, max_entries=CONTEXT_CACHE_MAX_ENTRIES, ttl_seconds=CONTEXT_CACHE_TTL_SECONDS):
+        """
+        Initialize the manager
+        
+        Args:
+            client: Gemini client (or fake) exposing a ``caches`` API
+            max_entries (int): Maximum number of caches kept alive
+            ttl_seconds (int): Lifetime requested for each cache
+        """
+        self.client = client
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.stats = {"hits": 0, "creates": 0, "refreshes": 0, "evictions": 0, "fallbacks": 0}
+        self._entries = OrderedDict()
+        self._unavailable = {}
+        self._lock = threading.Lock()
+        self._create_locks = {}
+    
+    def get(self, key, system_instruction, document_parts=None):
+        """
+        Get the name of a live cache for the key, creating it if needed
+        
+        Args:
+            key (tuple): Key from build_cache_key
+            system_instruction (str): System prompt to cache
+            document_parts (list): Document parts to pin alongside the prompt
+            
+        Returns:
+            str: Cached content name, or None if the caller should send the
+                prompt inline
+        """
+        name = self._lookup(key)
+        if name is not None:
+            return name
+        
+        with self._lock:
+            if self._unavailable.get(key, 0) > time.time():
+                self.stats["fallbacks"] += 1
+                return None
+            create_lock = self._create_locks.setdefault(key, threading.Lock())
+        
+        with create_lock:
+            name = self._lookup(key)
+            if name is not None:
+                return name
+            
+            try:
+                entry = self._create(key, system_instruction, document_parts)
+            except Exception:
+                # Caching unsupported for this model/prompt (e.g. below the
+                # minimum token count): send inline for a while before retrying
+                with self._lock:
+                    self._unavailable[key] = time.time() + CONTEXT_CACHE_RETRY_SECONDS
+                    self.stats["fallbacks"] += 1
+                return None
+            
+            with self._lock:
+                self._entries[key] = entry
+                self._entries.move_to_end(key)
+                self.stats["creates"] += 1
+                evicted = self._evict_overflow()
+        
+        for evicted_name in evicted:
+            self._delete(evicted_name)
+        
+        return entry["name"]
+    
+    def clear(self):
+        """Delete every cache created by this manager"""
+        with self._lock:
+            names = [entry["name"] for entry in self._entries.values()]
+            self._entries.clear()
+        
+        for name in names:
+            self._delete(name)
+    
+    def _lookup(self, key):
+        """Return a live cache name for the key, refreshing its TTL if close to expiry"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+        
+        remaining = entry["expires_at"] - time.time()
+        
+        if remaining <= 0:
+            with self._lock:
+                self._entries.pop(key, None)
+            return None
+        
+        if remaining < CONTEXT_CACHE_REFRESH_MARGIN_SECONDS:
+            try:
+                updated = self.client.caches.update(
+                    name=entry["name"],
+                    config=types.UpdateCachedContentConfig(ttl=f"{self.ttl_seconds}s")
+                )
+                entry["expires_at"] = self._expiry(updated)
+                with self._lock:
+                    self.stats["refreshes"] += 1
+            except Exception:
+                with self._lock:
+                    self._entries.pop(key, None)
+                return None
+        
+        with self._lock:
+            self.stats["hits"] += 1
+        
+        return entry["name"]
+    
+    def _create(self, key, system_instruction, document_parts):
+        """Create a cached content holding the system prompt and documents"""
+        contents = None
+        if document_parts:
+            contents = [types.Content(role="user", parts=list(document_parts))]
+        
+        cached = self.client.caches.create(
+            model=key[0],
+            config=types.CreateCachedContentConfig(
+                system_instruction=system_instruction,
+                contents=contents,
+                ttl=f"{self.ttl_seconds}s",
+                display_name="draco-" + hashlib.sha256(repr(key).encode("utf-8")).hexdigest()[:16]
+            )
+        )
+        
+        return {"name": cached.name, "expires_at": self._expiry(cached)}
+    
+    def _expiry(self, cached):
+        """Expiry timestamp reported by the service, or derived from the TTL"""
+        if getattr(cached, "expire_time", None) is not None:
+            return cached.expire_time.timestamp()
+        return time.time() + self.ttl_seconds
+    
+    def _evict_overflow(self):
+        """Drop least recently used entries beyond the limit (caller holds the lock)"""
+        evicted = []
+        
+        while len(self._entries) > self.max_entries:
+            _, entry = self._entries.popitem(last=False)
+            evicted.append(entry["name"])
+            self.stats["evictions"] += 1
+        
+        return evicted
+    
+    def _delete(self, name):
+        """Delete a cache on the server, ignoring failures (it will expire anyway)"""
+        try:
+            self.client.caches.delete(name=name)
+        except Exception:
+            pass
+
+
+def get_context_cache_manager(client):
+    """
+    Get the process-wide context cache manager for a client
+    
+    Args:
+        client: Gemini client (or fake) exposing a ``caches`` API
+        
+    Returns:
+        ContextCacheManager: Manager shared by every session using this client
+    """
+    with _managers_lock:
+        manager = _managers.get(client)
+        if manager is None:
+            manager = ContextCacheManager(client)
+            _managers[client] = manager
+        return manager
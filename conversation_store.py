@@ -0,0 +1,172 @@
+"""
+Persistent store of matters and their conversation transcripts
+"""
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from config import CONVERSATION_STORE_PATH, MATTER_TITLE_CHARS
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+class ConversationStore:
+    """
+    SQLite-backed, append-only store of matters and messages
+    
+    Every matter belongs to the stable client ID of the browser that opened
+    it; other clients can neither list, read nor extend it.
+    """
+    
+    def __init__(self, path=CONVERSATION_STORE_PATH):
+        """
+        Initialize the store
+        
+        Args:
+            path (str): SQLite database file (':memory:' for a private store)
+        """
+        self._lock = threading.Lock()
+        
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        with self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS matters ("
+                " id TEXT PRIMARY KEY, owner TEXT NOT NULL, title TEXT NOT NULL,"
+                " created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+            columns = {row["name"] for row in self._db.execute("PRAGMA table_info(matters)")}
+            if "owner" not in columns:
+                # Matters from before ownership was recorded stay hidden from every client
+                self._db.execute("ALTER TABLE matters ADD COLUMN owner TEXT NOT NULL DEFAULT ''")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS messages ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT, matter_id TEXT NOT NULL,"
+                " role TEXT NOT NULL, content TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS messages_by_matter ON messages (matter_id, id)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS matters_by_owner ON matters (owner, updated_at)"
+            )
+    
+    def create_matter(self, owner, title):
+        """
+        Open a new matter
+        
+        Args:
+            owner (str): Stable identifier of the user/browser opening it
+            title (str): Display title, truncated to MATTER_TITLE_CHARS
+        
+        Returns:
+            str: Matter ID
+        """
+        matter_id = uuid.uuid4().hex
+        now = time.time()
+        title = " ".join(title.split())
+        if len(title) > MATTER_TITLE_CHARS:
+            title = title[:MATTER_TITLE_CHARS - 1].rstrip() + "…"
+        
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT INTO matters (id, owner, title, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (matter_id, owner, title, now, now)
+            )
+        
+        return matter_id
+    
+    def list_matters(self, owner, limit=50):
+        """
+        List a user's matters, most recently active first
+        
+        Args:
+            owner (str): Stable identifier of the user/browser
+            limit (int): Maximum number of matters returned
+        
+        Returns:
+            list: Dicts with 'id', 'title' and 'updated_at'
+        """
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, title, updated_at FROM matters WHERE owner = ?"
+                " ORDER BY updated_at DESC LIMIT ?",
+                (owner, limit)
+            ).fetchall()
+        return [dict(row) for row in rows]
+    
+    def append_messages(self, owner, matter_id, messages):
+        """
+        Append messages to a matter's transcript in one transaction
+        
+        Stored messages are never rewritten; each message dict gains the
+        'id' it was stored under.
+        
+        Args:
+            owner (str): Stable identifier of the user/browser
+            matter_id (str): Matter the messages belong to
+            messages (list): Message dicts with 'role' and 'content'
+        
+        Raises:
+            KeyError: If the matter does not exist or belongs to another user
+        """
+        now = time.time()
+        
+        with self._lock, self._db:
+            updated = self._db.execute(
+                "UPDATE matters SET updated_at = ? WHERE id = ? AND owner = ?",
+                (now, matter_id, owner)
+            )
+            if updated.rowcount == 0:
+                raise KeyError(f"Unknown matter {matter_id}")
+            
+            for message in messages:
+                cursor = self._db.execute(
+                    "INSERT INTO messages (matter_id, role, content, created_at) VALUES (?, ?, ?, ?)",
+                    (matter_id, message["role"], message["content"], now)
+                )
+                message["id"] = cursor.lastrowid
+    
+    def load_messages(self, owner, matter_id):
+        """
+        Load a matter's full transcript
+        
+        Args:
+            owner (str): Stable identifier of the user/browser
+            matter_id (str): Matter ID
+        
+        Returns:
+            list: Message dicts with 'id', 'role' and 'content', oldest first;
+                empty if the matter belongs to another user
+        """
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT messages.id, role, content FROM messages"
+                " JOIN matters ON matters.id = messages.matter_id"
+                " WHERE matter_id = ? AND owner = ? ORDER BY messages.id",
+                (matter_id, owner)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+
+def get_conversation_store():
+    """
+    Get the process-wide conversation store
+    
+    Returns:
+        ConversationStore: Store shared by all sessions
+    """
+    global _store
+    
+    with _store_lock:
+        if _store is None:
+            _store = ConversationStore()
+        return _store
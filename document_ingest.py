@@ -0,0 +1,232 @@
+"""
+Local PDF text extraction and page-level chunking
+"""
+import hashlib
+import io
+import multiprocessing
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+from pypdf import PdfReader
+from config import (
+    INGEST_CHUNK_CHARS, INGEST_CHUNK_OVERLAP, INGEST_WORKERS, INGEST_CACHE_MAX_DOCUMENTS
+)
+from document_store import hash_document
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class DocumentChunk:
+    """A passage of one page of a document"""
+    doc_hash: str
+    page: int
+    start: int
+    end: int
+    text: str
+    chunk_hash: str
+
+
+def iter_pdf_pages(source):
+    """
+    Extract text from a PDF one page at a time
+    
+    Pages are parsed lazily, so only the page being extracted is decoded.
+    
+    Args:
+        source (bytes | str): PDF bytes or a path to a PDF file
+        
+    Yields:
+        tuple: (1-based page number, page text)
+    """
+    reader = PdfReader(io.BytesIO(source) if isinstance(source, (bytes, bytearray, memoryview)) else source)
+    
+    for index, page in enumerate(reader.pages):
+        try:
+            text = page.extract_text() or ""
+        except Exception:
+            # A damaged page should not cost the rest of the document
+            text = ""
+        yield index + 1, text
+
+
+def chunk_page(doc_hash, page, text, chunk_chars=INGEST_CHUNK_CHARS, overlap=INGEST_CHUNK_OVERLAP):
+    """
+    Split one page's text into overlapping chunks
+    
+    Chunks end at a paragraph or sentence break when one falls in the
+    second half of the window.
+    
+    Args:
+        doc_hash (str): Content hash of the document
+        page (int): 1-based page number
+        text (str): Page text
+        chunk_chars (int): Target chunk length in characters
+        overlap (int): Characters shared by consecutive chunks
+        
+    Returns:
+        list: DocumentChunk objects with offsets into the page text
+    """
+    chunks = []
+    start = 0
+    
+    while start < len(text):
+        end = min(start + chunk_chars, len(text))
+        
+        if end < len(text):
+            window = text[start:end]
+            for separator in ("\n\n", "\n", ". "):
+                cut = window.rfind(separator)
+                if cut > chunk_chars // 2:
+                    end = start + cut + len(separator)
+                    break
+        
+        passage = text[start:end].strip()
+        if passage:
+            chunks.append(DocumentChunk(
+                doc_hash=doc_hash,
+                page=page,
+                start=start,
+                end=end,
+                text=passage,
+                chunk_hash=hashlib.sha256(passage.encode("utf-8")).hexdigest()
+            ))
+        
+        if end >= len(text):
+            break
+        start = max(end - overlap, start + 1)
+    
+    return chunks
+
+
+def extract_chunks(source, doc_hash):
+    """
+    Extract and chunk a whole PDF (runs in a worker process)
+    
+    Args:
+        source (bytes | str): PDF bytes or a path to a PDF file
+        doc_hash (str): Content hash of the document
+        
+    Returns:
+        list: DocumentChunk objects in page order
+    """
+    chunks = []
+    
+    for page, text in iter_pdf_pages(source):
+        chunks.extend(chunk_page(doc_hash, page, text))
+    
+    return chunks
+
+
+class ChunkStore:
+    """Process-wide cache of parsed documents keyed by content hash"""
+    
+    def __init__(self, max_documents=INGEST_CACHE_MAX_DOCUMENTS):
+        self.max_documents = max_documents
+        self.stats = {"parsed": 0, "cached": 0}
+        self._documents = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, doc_hash):
+        """
+        Get the chunks of a parsed document
+        
+        Args:
+            doc_hash (str): Content hash of the document
+            
+        Returns:
+            list: DocumentChunk objects, or None if not parsed yet
+        """
+        with self._lock:
+            chunks = self._documents.get(doc_hash)
+            if chunks is not None:
+                self._documents.move_to_end(doc_hash)
+                self.stats["cached"] += 1
+            return chunks
+    
+    def put(self, doc_hash, chunks):
+        """
+        Store the chunks of a parsed document
+        
+        Args:
+            doc_hash (str): Content hash of the document
+            chunks (list): DocumentChunk objects
+        """
+        with self._lock:
+            self._documents[doc_hash] = chunks
+            self._documents.move_to_end(doc_hash)
+            self.stats["parsed"] += 1
+            while len(self._documents) > self.max_documents:
+                self._documents.popitem(last=False)
+
+
+chunk_store = ChunkStore()
+
+
+def _get_executor():
+    """Lazily start the process pool used for parsing several files"""
+    global _executor
+    
+    with _executor_lock:
+        if _executor is None:
+            # Forking the threaded server could copy locks held by other threads into the workers
+            _executor = ProcessPoolExecutor(
+                max_workers=INGEST_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _executor
+
+
+def ingest_documents(documents):
+    """
+    Extract and chunk documents, reusing results for already parsed content
+    
+    Several uncached documents are parsed in parallel in a process pool;
+    a single one is parsed in the calling thread.
+    
+    Args:
+        documents (list): (name, PDF bytes) pairs, or (name, PDF bytes,
+            content hash) triples when the hash is already known
+        
+    Returns:
+        dict: Per content hash, a dict with 'name' and 'chunks'
+    """
+    results = {}
+    pending = {}
+    order = []
+    
+    for name, data, *known_hash in documents:
+        doc_hash = known_hash[0] if known_hash else hash_document(data)
+        order.append(doc_hash)
+        chunks = chunk_store.get(doc_hash)
+        
+        if chunks is not None:
+            results[doc_hash] = {"name": name, "chunks": chunks}
+        elif doc_hash not in pending:
+            pending[doc_hash] = (name, data)
+    
+    if len(pending) == 1:
+        doc_hash, (name, data) = next(iter(pending.items()))
+        parsed = {doc_hash: extract_chunks(data, doc_hash)}
+    elif pending:
+        executor = _get_executor()
+        futures = {
+            # Views of mapped files cannot be pickled to the workers
+            doc_hash: executor.submit(
+                extract_chunks, bytes(data) if isinstance(data, memoryview) else data, doc_hash
+            )
+            for doc_hash, (name, data) in pending.items()
+        }
+        parsed = {doc_hash: future.result() for doc_hash, future in futures.items()}
+    else:
+        parsed = {}
+    
+    for doc_hash, chunks in parsed.items():
+        chunk_store.put(doc_hash, chunks)
+        results[doc_hash] = {"name": pending[doc_hash][0], "chunks": chunks}
+    
+    return {doc_hash: results[doc_hash] for doc_hash in order}
@@ -0,0 +1,245 @@
+"""
+Upload-once registry for documents sent to Gemini through the Files API
+"""
+import hashlib
+import io
+import os
+import threading
+import time
+import weakref
+
+from google.genai import types
+from config import DOCUMENT_FILE_TTL_SECONDS, DOCUMENT_REUPLOAD_MARGIN_SECONDS
+from state_backend import get_state_backend
+
+
+_stores = weakref.WeakKeyDictionary()
+_stores_lock = threading.Lock()
+
+
+def hash_document(data):
+    """
+    Compute the content hash used to identify a document
+    
+    Args:
+        data (bytes): Raw document bytes
+        
+    Returns:
+        str: Hex SHA-256 digest of the bytes
+    """
+    return hashlib.sha256(data).hexdigest()
+
+
+class BufferReader(io.RawIOBase):
+    """
+    Read-only file object over a bytes-like buffer
+    
+    The Files API reads uploads in chunks from a file object; reading them
+    from the caller's buffer avoids the full copy ``io.BytesIO`` makes of a
+    memoryview, such as the view of a spilled attachment.
+    """
+    
+    def __init__(self, data):
+        """
+        Initialize the reader
+        
+        Args:
+            data (bytes | memoryview): Buffer to read, not copied
+        """
+        super().__init__()
+        self._view = memoryview(data).cast("B")
+        self._position = 0
+    
+    def readable(self):
+        return True
+    
+    def seekable(self):
+        return True
+    
+    def read(self, size=-1):
+        end = len(self._view) if size is None or size < 0 else min(len(self._view), self._position + size)
+        chunk = bytes(self._view[self._position:end])
+        self._position = max(self._position, end)
+        return chunk
+    
+    def readinto(self, buffer):
+        chunk = self.read(len(buffer))
+        buffer[:len(chunk)] = chunk
+        return len(chunk)
+    
+    def seek(self, offset, whence=os.SEEK_SET):
+        base = {os.SEEK_SET: 0, os.SEEK_CUR: self._position, os.SEEK_END: len(self._view)}[whence]
+        self._position = max(0, base + offset)
+        return self._position
+    
+    def tell(self):
+        return self._position
+    
+    def close(self):
+        # Release the view so a memory-mapped source can be closed
+        if not self.closed:
+            self._view.release()
+        super().close()
+
+
+class DocumentStore:
+    """Uploads each distinct document once and reuses its file reference"""
+    
+    def __init__(self, client, backend=None):
+        """
+        Initialize the store
+        
+        Args:
+            client: Gemini client (or fake) exposing a ``files`` API
+            backend: State backend holding the registry, shared with other
+                replicas; defaults to the process-wide backend
+        """
+        self.client = client
+        self.stats = {"uploads": 0, "reuses": 0, "reuploads": 0}
+        self.backend = backend or get_state_backend()
+        # Uploaded files belong to one API project; a fake client's files to that client only
+        self.namespace = "documents:" + getattr(client, "state_scope", "gemini")
+        self._lock = threading.Lock()
+        self._upload_locks = {}
+    
+    def get_part(self, data, mime_type="application/pdf", display_name=None, digest=None):
+        """
+        Get a message part referencing the document, uploading it if needed
+        
+        Args:
+            data (bytes): Raw document bytes
+            mime_type (str): MIME type of the document
+            display_name (str): Optional name shown in the Files API
+            digest (str): Precomputed content hash, computed if omitted
+            
+        Returns:
+            types.Part: Part referencing the uploaded file
+        """
+        entry = self.get_file(data, mime_type, display_name, digest)
+        return types.Part.from_uri(file_uri=entry["uri"], mime_type=entry["mime_type"])
+    
+    def get_file(self, data, mime_type="application/pdf", display_name=None, digest=None):
+        """
+        Get the registry entry for a document, uploading it if needed
+        
+        Args:
+            data (bytes): Raw document bytes
+            mime_type (str): MIME type of the document
+            display_name (str): Optional name shown in the Files API
+            digest (str): Precomputed content hash, computed if omitted
+            
+        Returns:
+            dict: Entry with 'digest', 'name', 'uri', 'mime_type' and 'expires_at'
+        """
+        digest = digest or hash_document(data)
+        
+        entry = self._lookup(digest)
+        if entry is not None:
+            return entry
+        
+        with self._lock:
+            upload_lock = self._upload_locks.setdefault(digest, threading.Lock())
+        
+        with upload_lock:
+            # Another session may have uploaded it while we waited
+            entry = self._lookup(digest)
+            if entry is not None:
+                return entry
+            
+            expired = self.backend.get(self.namespace, digest) is not None
+            entry = self._upload(data, mime_type, display_name, digest)
+            self.backend.set(self.namespace, digest, entry, expires_at=entry["expires_at"])
+            
+            with self._lock:
+                if expired:
+                    self.stats["reuploads"] += 1
+                self.stats["uploads"] += 1
+        
+        return entry
+    
+    def invalidate(self, digest):
+        """
+        Forget a document so that it is uploaded again on next use
+        
+        Args:
+            digest (str): Content hash of the document
+        """
+        entry = self.backend.get(self.namespace, digest)
+        self.backend.delete(self.namespace, digest)
+        
+        if entry is not None:
+            try:
+                self.client.files.delete(name=entry["name"])
+            except Exception:
+                pass
+    
+    def _lookup(self, digest):
+        """Return a live entry for the digest, or None if missing or expiring"""
+        entry = self.backend.get(self.namespace, digest)
+        if entry is None:
+            return None
+        
+        if entry["expires_at"] - DOCUMENT_REUPLOAD_MARGIN_SECONDS <= time.time():
+            return None
+        
+        with self._lock:
+            self.stats["reuses"] += 1
+        return entry
+    
+    def _upload(self, data, mime_type, display_name, digest):
+        """Upload the bytes through the Files API and wait until usable"""
+        with BufferReader(data) as file:
+            uploaded = self.client.files.upload(
+                file=file,
+                config=types.UploadFileConfig(
+                    mime_type=mime_type,
+                    display_name=display_name or digest[:16]
+                )
+            )
+        uploaded = self._wait_until_active(uploaded)
+        
+        if uploaded.expiration_time is not None:
+            expires_at = uploaded.expiration_time.timestamp()
+        else:
+            expires_at = time.time() + DOCUMENT_FILE_TTL_SECONDS
+        
+        return {
+            "digest": digest,
+            "name": uploaded.name,
+            "uri": uploaded.uri,
+            "mime_type": uploaded.mime_type or mime_type,
+            "expires_at": expires_at
+        }
+    
+    def _wait_until_active(self, uploaded, timeout=60.0):
+        """Poll a freshly uploaded file until the service finished processing it"""
+        deadline = time.time() + timeout
+        
+        while uploaded.state == types.FileState.PROCESSING:
+            if time.time() > deadline:
+                raise TimeoutError(f"File {uploaded.name} is still processing")
+            time.sleep(0.5)
+            uploaded = self.client.files.get(name=uploaded.name)
+        
+        if uploaded.state == types.FileState.FAILED:
+            raise RuntimeError(f"File {uploaded.name} failed processing")
+        
+        return uploaded
+
+
+def get_document_store(client):
+    """
+    Get the process-wide document store for a client
+    
+    Args:
+        client: Gemini client (or fake) exposing a ``files`` API
+        
+    Returns:
+        DocumentStore: Store shared by every session using this client
+    """
+    with _stores_lock:
+        store = _stores.get(client)
+        if store is None:
+            store = DocumentStore(client)
+            _stores[client] = store
+        return store
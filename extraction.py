@@ -0,0 +1,256 @@
+"""
+Structured extraction: schema for the Document Analysis Protocol, typed records and queries
+"""
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+from typing import Literal, Optional
+
+from pydantic import BaseModel, Field
+
+from config import EXTRACTION_CACHE_PATH, EXTRACTION_SCHEMA_VERSION
+
+
+_store = None
+_store_lock = threading.Lock()
+
+_ISO_DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}")
+
+EXTRACTION_INSTRUCTIONS = {
+    "en": (
+        "You extract structured data from legal documents following the Document Analysis Protocol. "
+        "Report only what the document states; leave a field empty or null rather than guess. "
+        "Write dates as YYYY-MM-DD where the day is known, otherwise as written. "
+        "Classify each fact as alleged, proven or legal_conclusion."
+    ),
+    "el": (
+        "Εξάγεις δομημένα στοιχεία από νομικά έγγραφα σύμφωνα με το Πρωτόκολλο Ανάλυσης Εγγράφων. "
+        "Ανάφερε μόνο ό,τι αναφέρει το έγγραφο· άφησε ένα πεδίο κενό ή null αντί να μαντέψεις. "
+        "Γράψε τις ημερομηνίες ως YYYY-MM-DD όταν η ημέρα είναι γνωστή, αλλιώς όπως αναγράφονται. "
+        "Κατάταξε κάθε γεγονός ως alleged, proven ή legal_conclusion. Γράψε τα κείμενα στα ελληνικά."
+    )
+}
+
+
+class DatedEvent(BaseModel):
+    """A date in the document and what it refers to"""
+    date: str = Field(description="YYYY-MM-DD where the day is known, otherwise as written")
+    event: str
+
+
+class Authority(BaseModel):
+    """A court, prosecutor, police unit, bailiff or other authority"""
+    name: str
+    role: str
+
+
+class ServiceDetails(BaseModel):
+    """How and whether the document was served"""
+    served: Optional[bool] = Field(description="Whether service is recorded; null if not addressed")
+    date: Optional[str]
+    method: Optional[str] = Field(description="E.g. personal, at residence, by post, by publication")
+    recipient: Optional[str]
+    address: Optional[str]
+    defects: list[str]
+
+
+class Fact(BaseModel):
+    """A factual statement and its evidentiary status"""
+    statement: str
+    status: Literal["alleged", "proven", "legal_conclusion"]
+
+
+class DocumentExtraction(BaseModel):
+    """Fields of the Document Analysis Protocol for one document"""
+    document_type: str
+    procedural_stage: str
+    dates: list[DatedEvent]
+    authorities: list[Authority]
+    service: ServiceDetails
+    attributed_conduct: list[str]
+    facts: list[Fact]
+    inconsistencies: list[str]
+
+
+class ExtractionRecord(BaseModel):
+    """Validated extraction for one document"""
+    document_hash: str
+    document_name: str
+    extraction: DocumentExtraction
+
+
+class ExtractionStore:
+    """SQLite-backed cache of extraction records keyed by document hash"""
+    
+    def __init__(self, path=EXTRACTION_CACHE_PATH, schema_version=EXTRACTION_SCHEMA_VERSION):
+        """
+        Initialize the store
+        
+        Args:
+            path (str): SQLite database file (':memory:' for a private store)
+            schema_version (int): Records stored under other versions are ignored
+        """
+        self.schema_version = schema_version
+        self.stats = {"hits": 0, "misses": 0}
+        self._lock = threading.Lock()
+        
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS extractions ("
+                " key TEXT PRIMARY KEY, document_hash TEXT NOT NULL,"
+                " record TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+    
+    def _key(self, document_hash, language):
+        return f"{document_hash}:{language}:v{self.schema_version}"
+    
+    def get(self, document_hash, language):
+        """
+        Look up the record for a document
+        
+        Args:
+            document_hash (str): Content hash of the document
+            language (str): Language the record was extracted in
+        
+        Returns:
+            ExtractionRecord: Cached record, or None
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT record FROM extractions WHERE key = ?",
+                (self._key(document_hash, language),)
+            ).fetchone()
+            self.stats["hits" if row else "misses"] += 1
+        
+        return ExtractionRecord.model_validate_json(row[0]) if row else None
+    
+    def put(self, record, language):
+        """
+        Store the record for a document
+        
+        Args:
+            record (ExtractionRecord): Validated record
+            language (str): Language the record was extracted in
+        """
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO extractions (key, document_hash, record, created_at)"
+                " VALUES (?, ?, ?, ?)",
+                (self._key(record.document_hash, language), record.document_hash,
+                 record.model_dump_json(), time.time())
+            )
+
+
+def get_extraction_store():
+    """
+    Get the process-wide extraction store
+    
+    Returns:
+        ExtractionStore: Store shared by all sessions
+    """
+    global _store
+    
+    with _store_lock:
+        if _store is None:
+            _store = ExtractionStore()
+        return _store
+
+
+def _date_sort_key(value):
+    """Sort ISO dates chronologically, with dates in other formats last"""
+    return (0, value) if _ISO_DATE_RE.match(value) else (1, value)
+
+
+def timeline(records):
+    """
+    Merge the dated events of all documents into one chronology
+    
+    Args:
+        records (list): ExtractionRecord objects
+    
+    Returns:
+        list: Rows with 'date', 'event' and 'document', in date order
+    """
+    rows = [
+        {"date": event.date, "event": event.event, "document": record.document_name}
+        for record in records
+        for event in record.extraction.dates
+    ]
+    return sorted(rows, key=lambda row: _date_sort_key(row["date"]))
+
+
+def filter_facts(records, status=None, contains=None):
+    """
+    Select facts across documents
+    
+    Args:
+        records (list): ExtractionRecord objects
+        status (str): Keep only 'alleged', 'proven' or 'legal_conclusion' facts
+        contains (str): Keep only facts mentioning this text (case-insensitive)
+    
+    Returns:
+        list: Rows with 'statement', 'status' and 'document'
+    """
+    needle = contains.casefold() if contains else None
+    return [
+        {"statement": fact.statement, "status": fact.status, "document": record.document_name}
+        for record in records
+        for fact in record.extraction.facts
+        if (status is None or fact.status == status)
+        and (needle is None or needle in fact.statement.casefold())
+    ]
+
+
+def service_defects(records):
+    """
+    List service defects and documents without recorded service
+    
+    Args:
+        records (list): ExtractionRecord objects
+    
+    Returns:
+        list: Rows with 'document', 'served', 'method' and 'defect'
+    """
+    rows = []
+    for record in records:
+        service = record.extraction.service
+        defects = service.defects or (["No service recorded"] if service.served is False else [])
+        for defect in defects:
+            rows.append({
+                "document": record.document_name,
+                "served": service.served,
+                "method": service.method,
+                "defect": defect
+            })
+    return rows
+
+
+def count_authorities(records):
+    """
+    Count the documents each authority appears in
+    
+    Args:
+        records (list): ExtractionRecord objects
+    
+    Returns:
+        list: Rows with 'authority', 'role' and 'documents', most frequent first
+    """
+    counts = Counter()
+    roles = {}
+    for record in records:
+        for authority in {(a.name, a.role) for a in record.extraction.authorities}:
+            counts[authority[0]] += 1
+            roles.setdefault(authority[0], authority[1])
+    
+    return [
+        {"authority": name, "role": roles[name], "documents": count}
+        for name, count in counts.most_common()
+    ]
@@ -0,0 +1,488 @@
+"""
+In-process fake of the parts of the Gemini client used by the app
+
+Used by tests and benchmarks to exercise the real service code without
+network access or API quota.
+"""
+import asyncio
+import datetime
+import hashlib
+import itertools
+import json
+import threading
+import time
+import typing
+import uuid
+from collections import deque
+
+import pydantic
+
+from google.genai import errors, types
+from config import DOCUMENT_FILE_TTL_SECONDS
+
+
+def _response(text, usage=None):
+    """Build a GenerateContentResponse carrying the given text and token usage"""
+    return types.GenerateContentResponse(
+        candidates=[
+            types.Candidate(
+                content=types.Content(role="model", parts=[types.Part.from_text(text=text)])
+            )
+        ],
+        usage_metadata=usage
+    )
+
+
+def _usage(contents, response_text):
+    """Approximate usage metadata: about 4 characters per text token"""
+    prompt_chars = 0
+    
+    if isinstance(contents, str):
+        prompt_chars = len(contents)
+    else:
+        for content in contents or []:
+            parts = content.get("parts", []) if isinstance(content, dict) else content.parts or []
+            for part in parts:
+                text = part.get("text") if isinstance(part, dict) else getattr(part, "text", None)
+                prompt_chars += len(text or "")
+    
+    prompt_tokens = max(1, prompt_chars // 4)
+    candidate_tokens = max(1, len(response_text) // 4)
+    return types.GenerateContentResponseUsageMetadata(
+        prompt_token_count=prompt_tokens,
+        candidates_token_count=candidate_tokens,
+        total_token_count=prompt_tokens + candidate_tokens
+    )
+
+
+def schema_example(annotation):
+    """
+    Build the emptiest value that validates against a response schema
+    
+    Args:
+        annotation: Pydantic model class or field annotation
+        
+    Returns:
+        JSON-compatible value
+    """
+    origin = typing.get_origin(annotation)
+    
+    if isinstance(annotation, type) and issubclass(annotation, pydantic.BaseModel):
+        return {name: schema_example(field.annotation) for name, field in annotation.model_fields.items()}
+    if origin is list:
+        return []
+    if origin is typing.Literal:
+        return typing.get_args(annotation)[0]
+    if origin is typing.Union:
+        return None
+    return {str: "", bool: False, int: 0, float: 0.0}.get(annotation)
+
+
+def inline_bytes_sent(contents):
+    """
+    Count the raw document bytes inlined into a request
+    
+    Args:
+        contents (list): Request contents (Content objects or dicts)
+        
+    Returns:
+        int: Total size of inline data parts
+    """
+    total = 0
+    
+    if isinstance(contents, str):
+        return total
+    
+    for content in contents or []:
+        parts = content.get("parts", []) if isinstance(content, dict) else content.parts or []
+        for part in parts:
+            inline_data = getattr(part, "inline_data", None)
+            if inline_data is not None and inline_data.data:
+                total += len(inline_data.data)
+    
+    return total
+
+
+def file_uris_sent(contents):
+    """
+    List the Files API references in a request
+    
+    Args:
+        contents (list): Request contents (Content objects or dicts)
+        
+    Returns:
+        list: File URIs in request order
+    """
+    if isinstance(contents, str):
+        return []
+    
+    return [
+        part.file_data.file_uri
+        for content in contents or []
+        for part in (content.get("parts", []) if isinstance(content, dict) else content.parts or [])
+        if getattr(part, "file_data", None) is not None
+    ]
+
+
+def _bag_of_words_vector(text, dimensions=64):
+    """Deterministic hashed bag-of-words vector standing in for a real embedding"""
+    vector = [0.0] * dimensions
+    for word in text.lower().split():
+        vector[int(hashlib.md5(word.encode("utf-8")).hexdigest(), 16) % dimensions] += 1.0
+    return vector
+
+
+class FakeFiles:
+    """Fake Files API keeping uploaded bytes in memory"""
+    
+    def __init__(self, ttl_seconds=DOCUMENT_FILE_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self.files = {}
+        self.upload_count = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+    
+    def upload(self, file, config=None):
+        data = file.read() if hasattr(file, "read") else open(file, "rb").read()
+        mime_type = getattr(config, "mime_type", None) or "application/octet-stream"
+        
+        with self._lock:
+            name = f"files/fake-{next(self._ids)}"
+            self.upload_count += 1
+            self.files[name] = {
+                "data": data,
+                "file": types.File(
+                    name=name,
+                    uri=f"https://fake.invalid/v1beta/{name}",
+                    mime_type=mime_type,
+                    size_bytes=len(data),
+                    state=types.FileState.ACTIVE,
+                    expiration_time=datetime.datetime.now(datetime.timezone.utc)
+                    + datetime.timedelta(seconds=self.ttl_seconds)
+                )
+            }
+            return self.files[name]["file"]
+    
+    def get(self, name, config=None):
+        with self._lock:
+            return self.files[name]["file"]
+    
+    def delete(self, name, config=None):
+        with self._lock:
+            self.files.pop(name, None)
+
+
+def api_error(code):
+    """
+    Build the SDK error the real service raises for an HTTP status
+    
+    Args:
+        code (int): HTTP status code
+        
+    Returns:
+        errors.APIError: ClientError for 4xx, ServerError for 5xx
+    """
+    statuses = {429: "RESOURCE_EXHAUSTED", 500: "INTERNAL", 503: "UNAVAILABLE", 504: "DEADLINE_EXCEEDED"}
+    response_json = {"error": {"code": code, "message": "Injected by fake", "status": statuses.get(code, "UNKNOWN")}}
+    error_class = errors.ServerError if code >= 500 else errors.ClientError
+    return error_class(code, response_json)
+
+
+def missing_file_error(uri):
+    """The error the real service raises for a deleted or expired file reference"""
+    name = uri.rsplit("/", 1)[-1]
+    return errors.ClientError(403, {"error": {
+        "code": 403,
+        "message": f"You do not have permission to access the File {name} or it may not exist.",
+        "status": "PERMISSION_DENIED"
+    }})
+
+
+class FakeModels:
+    """Fake models API returning canned responses and recording requests"""
+    
+    def __init__(self, response_text="Fake response.", chunk_size=16, latency=0.0,
+                 fail_with=None, chunk_interval=0.0):
+        """
+        Initialize the fake
+        
+        Args:
+            response_text (str): Text every call answers with
+            chunk_size (int): Characters per streamed chunk
+            latency (float): Seconds each call takes before answering
+            fail_with (list): HTTP status codes the next calls fail with, in order
+            chunk_interval (float): Seconds between streamed chunks
+        """
+        self.response_text = response_text
+        self.chunk_size = chunk_size
+        self.latency = latency
+        self.chunk_interval = chunk_interval
+        self.failures = deque(fail_with or [])
+        self.calls = []
+        # Set by FakeGeminiClient so requests naming deleted files are rejected
+        self.files = None
+        self._lock = threading.Lock()
+    
+    def _next_failure(self):
+        """HTTP status the next call fails with, or None"""
+        with self._lock:
+            return self.failures.popleft() if self.failures else None
+    
+    def _finish_call(self, failure, model, contents, config):
+        """Raise the injected failure or record the request"""
+        if failure is not None:
+            raise api_error(failure)
+        
+        if self.files is not None:
+            for uri in file_uris_sent(contents):
+                if uri.split("/v1beta/", 1)[-1] not in self.files.files:
+                    raise missing_file_error(uri)
+        
+        with self._lock:
+            self.calls.append({
+                "model": model,
+                "contents": contents,
+                "config": config,
+                "inline_bytes": inline_bytes_sent(contents)
+            })
+    
+    def _record(self, model, contents, config):
+        failure = self._next_failure()
+        if self.latency:
+            time.sleep(self.latency)
+        self._finish_call(failure, model, contents, config)
+    
+    def _answer(self, contents, config):
+        """Canned response for a request"""
+        text = self.response_text
+        
+        # Structured output: answer with valid JSON unless the canned text already is
+        schema = config.get("response_schema") if isinstance(config, dict) else getattr(config, "response_schema", None)
+        if schema is not None and not text.lstrip().startswith("{"):
+            text = json.dumps(schema_example(schema))
+        
+        return _response(text, _usage(contents, text))
+    
+    def _chunks(self, contents):
+        """Streamed chunks of the canned text, usage on the last one"""
+        text = self.response_text
+        for start in range(0, len(text), self.chunk_size):
+            is_last = start + self.chunk_size >= len(text)
+            yield _response(text[start:start + self.chunk_size], _usage(contents, text) if is_last else None)
+    
+    def generate_content(self, model, contents, config=None):
+        self._record(model, contents, config)
+        return self._answer(contents, config)
+    
+    def count_tokens(self, model, contents, config=None):
+        text = contents if isinstance(contents, str) else "".join(
+            part.text or ""
+            for content in contents
+            for part in (content.parts or [])
+        )
+        return types.CountTokensResponse(total_tokens=max(1, len(text) // 4))
+    
+    def embed_content(self, model, contents, config=None):
+        texts = [contents] if isinstance(contents, str) else list(contents)
+        return types.EmbedContentResponse(
+            embeddings=[types.ContentEmbedding(values=_bag_of_words_vector(text)) for text in texts]
+        )
+    
+    def generate_content_stream(self, model, contents, config=None):
+        self._record(model, contents, config)
+        
+        for index, chunk in enumerate(self._chunks(contents)):
+            if index and self.chunk_interval:
+                time.sleep(self.chunk_interval)
+            yield chunk
+
+
+class FakeCaches:
+    """Fake cached-contents API keeping caches in memory"""
+    
+    def __init__(self, available=True):
+        self.available = available
+        self.caches = {}
+        self.create_count = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+    
+    def _expire_time(self, ttl):
+        seconds = float(str(ttl or "3600s").rstrip("s"))
+        return datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(seconds=seconds)
+    
+    def create(self, model, config=None):
+        if not self.available:
+            raise RuntimeError("Context caching is not available for this model")
+        
+        with self._lock:
+            name = f"cachedContents/fake-{next(self._ids)}"
+            self.create_count += 1
+            self.caches[name] = types.CachedContent(
+                name=name,
+                model=model,
+                display_name=getattr(config, "display_name", None),
+                expire_time=self._expire_time(getattr(config, "ttl", None))
+            )
+            return self.caches[name]
+    
+    def get(self, name, config=None):
+        with self._lock:
+            return self.caches[name]
+    
+    def update(self, name, config=None):
+        with self._lock:
+            cached = self.caches[name]
+            cached.expire_time = self._expire_time(getattr(config, "ttl", None))
+            return cached
+    
+    def delete(self, name, config=None):
+        with self._lock:
+            self.caches.pop(name, None)
+
+
+class FakeBatches:
+    """
+    Fake Batch API answering inlined requests from FakeModels on a worker thread
+    
+    Set ``fail_jobs`` to end jobs as failed without responses, ``stall_jobs``
+    to keep them running until cancelled, and ``reverse_order`` to answer
+    requests last to first, as the real service may.
+    """
+    
+    def __init__(self, models, available=True):
+        self.available = available
+        self.fail_jobs = False
+        self.stall_jobs = False
+        self.reverse_order = False
+        self.cancelled = []
+        self.jobs = {}
+        self._models = models
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+    
+    def create(self, model, src, config=None):
+        if not self.available:
+            raise api_error(400)
+        
+        with self._lock:
+            name = f"batches/fake-{next(self._ids)}"
+            job = types.BatchJob(
+                name=name,
+                display_name=getattr(config, "display_name", None),
+                state=types.JobState.JOB_STATE_PENDING,
+                model=model,
+                completion_stats=types.CompletionStats(successful_count=0, failed_count=0)
+            )
+            self.jobs[name] = job
+        
+        threading.Thread(target=self._process, args=(name, model, list(src)), daemon=True).start()
+        return job.model_copy(deep=True)
+    
+    def _process(self, name, model, requests):
+        responses = []
+        
+        with self._lock:
+            self.jobs[name].state = types.JobState.JOB_STATE_RUNNING
+            if self.fail_jobs:
+                self.jobs[name].state = types.JobState.JOB_STATE_FAILED
+                self.jobs[name].error = types.JobError(code=500, message="Fake batch failure")
+            if self.fail_jobs or self.stall_jobs:
+                return
+        
+        if self.reverse_order:
+            requests = requests[::-1]
+        
+        for request in requests:
+            try:
+                response = self._models.generate_content(model, request.contents, request.config)
+                responses.append(types.InlinedResponse(response=response, metadata=request.metadata))
+                field = "successful_count"
+            except errors.APIError as exc:
+                responses.append(types.InlinedResponse(
+                    error=types.JobError(code=exc.code, message=exc.message),
+                    metadata=request.metadata
+                ))
+                field = "failed_count"
+            
+            with self._lock:
+                stats = self.jobs[name].completion_stats
+                setattr(stats, field, getattr(stats, field) + 1)
+        
+        with self._lock:
+            job = self.jobs[name]
+            if job.state != types.JobState.JOB_STATE_RUNNING:
+                return
+            job.dest = types.BatchJobDestination(inlined_responses=responses)
+            job.state = types.JobState.JOB_STATE_SUCCEEDED
+    
+    def get(self, name, config=None):
+        with self._lock:
+            return self.jobs[name].model_copy(deep=True)
+    
+    def cancel(self, name, config=None):
+        with self._lock:
+            self.cancelled.append(name)
+            job = self.jobs[name]
+            if job.state in (types.JobState.JOB_STATE_PENDING, types.JobState.JOB_STATE_RUNNING):
+                job.state = types.JobState.JOB_STATE_CANCELLED
+
+
+class FakeAsyncModels:
+    """
+    Async counterpart of FakeModels, as exposed under ``client.aio.models``
+    
+    Latency and chunk intervals are awaited, so concurrent calls overlap on
+    one event loop the way real requests do.
+    """
+    
+    def __init__(self, models):
+        self._models = models
+    
+    async def _record(self, model, contents, config):
+        failure = self._models._next_failure()
+        if self._models.latency:
+            await asyncio.sleep(self._models.latency)
+        self._models._finish_call(failure, model, contents, config)
+    
+    async def generate_content(self, model, contents, config=None):
+        await self._record(model, contents, config)
+        return self._models._answer(contents, config)
+    
+    async def generate_content_stream(self, model, contents, config=None):
+        await self._record(model, contents, config)
+        
+        async def stream():
+            for index, chunk in enumerate(self._models._chunks(contents)):
+                if index and self._models.chunk_interval:
+                    await asyncio.sleep(self._models.chunk_interval)
+                yield chunk
+        
+        return stream()
+
+
+class FakeAsyncClient:
+    """Fake of ``client.aio``"""
+    
+    def __init__(self, models):
+        self.models = FakeAsyncModels(models)
+
+
+class FakeGeminiClient:
+    """Drop-in stand-in for ``genai.Client`` backed by in-memory fakes"""
+    
+    def __init__(self, response_text="Fake response.", file_ttl_seconds=DOCUMENT_FILE_TTL_SECONDS,
+                 latency=0.0, chunk_size=16, chunk_interval=0.0):
+        self.models = FakeModels(
+            response_text,
+            chunk_size=chunk_size,
+            latency=latency,
+            chunk_interval=chunk_interval
+        )
+        self.files = FakeFiles(file_ttl_seconds)
+        self.models.files = self.files
+        self.caches = FakeCaches()
+        self.batches = FakeBatches(self.models)
+        self.aio = FakeAsyncClient(self.models)
+        # Fake files exist only in this object, so its shared-state entries stay apart
+        self.state_scope = f"fake-{uuid.uuid4().hex}"
@@ -0,0 +1,280 @@
+"""
+Conversation history management between the chat transcript and Gemini
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+from google.genai import types
+from config import HISTORY_TOKEN_BUDGET, HISTORY_MIN_RECENT_MESSAGES, HISTORY_SUMMARY_BLOCK
+
+
+_summary_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="history-summary")
+
+
+def estimate_tokens(text):
+    """
+    Estimate the token count of a text without calling the API
+    
+    Args:
+        text (str): Text to estimate
+        
+    Returns:
+        int: Approximate number of tokens (about 4 ASCII or 2 non-ASCII
+            characters per token)
+    """
+    ascii_chars = len(text.encode("ascii", "ignore"))
+    return (ascii_chars + 3) // 4 + (len(text) - ascii_chars + 1) // 2
+
+
+def content_text(content):
+    """
+    Join the text parts of a Content
+    
+    Args:
+        content (types.Content): Conversation content
+        
+    Returns:
+        str: Concatenated text of the content's parts
+    """
+    return "".join(part.text or "" for part in content.parts or [])
+
+
+class ConversationHistoryCache:
+    """Keeps converted Gemini contents for a transcript and extends them incrementally"""
+    
+    def __init__(self):
+        self._sources = []
+        self._contents = []
+    
+    def build(self, messages, convert):
+        """
+        Convert messages, reusing contents already built for an unchanged prefix
+        
+        Args:
+            messages (list): List of message dictionaries with 'role' and 'content'
+            convert (callable): Converts one message to a Content, or None to skip it
+            
+        Returns:
+            list: Converted contents (a new list the caller may extend)
+        """
+        if not self._is_prefix_of(messages):
+            self.invalidate()
+        
+        for msg in messages[len(self._sources):]:
+            self._sources.append((msg, msg["content"]))
+            content = convert(msg)
+            if content is not None:
+                self._contents.append(content)
+        
+        return list(self._contents)
+    
+    def invalidate(self):
+        """Drop all cached contents"""
+        self._sources = []
+        self._contents = []
+    
+    def _is_prefix_of(self, messages):
+        """Check that cached messages are still the unedited start of the transcript"""
+        if len(messages) < len(self._sources):
+            return False
+        
+        # Identity checks only: an edited or replaced message is a new object
+        return all(
+            msg is source and msg["content"] is content
+            for msg, (source, content) in zip(messages, self._sources)
+        )
+
+
+class HistoryManager:
+    """Fits the conversation into a token budget, folding old turns into a rolling summary"""
+    
+    def __init__(self, token_budget=HISTORY_TOKEN_BUDGET):
+        """
+        Initialize the manager
+        
+        Args:
+            token_budget (int): Maximum tokens of history sent verbatim
+        """
+        self.token_budget = token_budget
+        self._token_counts = {}
+        self._summary = None
+        self._pending = None
+        self._restored = None
+    
+    def apply(self, contents, service):
+        """
+        Reduce converted history to a summary plus the most recent turns
+        
+        Recent contents are kept verbatim while they fit the budget. Older
+        ones are summarized in the background; until that summary is ready
+        they are still sent verbatim.
+        
+        Args:
+            contents (list): Converted conversation contents, oldest first
+            service (GeminiService): Service used to count tokens and summarize
+            
+        Returns:
+            list: Contents to send to the model
+        """
+        split = self._split_index(contents, service)
+        
+        # Fold in whole blocks so the summary is not recomputed every turn
+        split -= split % HISTORY_SUMMARY_BLOCK
+        
+        self._collect_pending()
+        self._adopt_restored(contents)
+        summary = self._valid_summary(contents)
+        covered = summary["covered"] if summary else 0
+        
+        if split > covered:
+            self._schedule_summary(contents, covered, split, summary, service)
+        
+        if summary is None:
+            return list(contents)
+        
+        summary_content = types.Content(
+            role="user",
+            parts=[types.Part.from_text(text=f"Summary of the earlier conversation:\n{summary['text']}")]
+        )
+        return [summary_content, *contents[covered:]]
+    
+    def invalidate(self):
+        """Drop the summary and token counts"""
+        self._token_counts = {}
+        self._summary = None
+        self._pending = None
+        self._restored = None
+    
+    def export_state(self):
+        """
+        Current summary in a form that can be stored outside the process
+        
+        Returns:
+            dict: 'covered', 'anchor_role', 'anchor_text' and 'text', or
+                None without a summary
+        """
+        summary = self._summary
+        if summary is None:
+            # A restored summary not yet anchored is passed on unchanged
+            return self._restored
+        
+        return {
+            "covered": summary["covered"],
+            "anchor_role": summary["anchor"].role,
+            "anchor_text": content_text(summary["anchor"]),
+            "text": summary["text"]
+        }
+    
+    def restore_state(self, state):
+        """
+        Adopt a summary exported by another process
+        
+        It is used from the next apply() on if the transcript still matches.
+        
+        Args:
+            state (dict): Result of export_state(), or None
+        """
+        self._restored = state
+    
+    @staticmethod
+    def _key(content):
+        """Token count cache key: role and text"""
+        return (content.role, content_text(content))
+    
+    def _count(self, content):
+        """Token count for one content, counted or else estimated locally"""
+        key = self._key(content)
+        
+        if key not in self._token_counts:
+            self._token_counts[key] = estimate_tokens(key[1])
+        
+        return self._token_counts[key]
+    
+    def _walk(self, contents, count):
+        """Index of the first content kept verbatim within the budget, by the given counts"""
+        used = 0
+        split = len(contents)
+        
+        while split > 0:
+            tokens = count(contents[split - 1])
+            kept = len(contents) - split
+            if used + tokens > self.token_budget and kept >= HISTORY_MIN_RECENT_MESSAGES:
+                break
+            used += tokens
+            split -= 1
+        
+        return split
+    
+    def _split_index(self, contents, service):
+        """Index of the first content kept verbatim within the budget"""
+        # Estimate how far back the budget reaches, then count what is new there in one request
+        estimated = self._walk(
+            contents,
+            lambda content: self._token_counts.get(self._key(content)) or estimate_tokens(content_text(content))
+        )
+        uncounted = {}
+        for content in contents[max(0, estimated - 1):]:
+            uncounted.setdefault(self._key(content), content)
+        for key in self._token_counts:
+            uncounted.pop(key, None)
+        
+        if uncounted:
+            counts = service.count_contents_tokens(list(uncounted.values()))
+            self._token_counts.update(zip(uncounted, counts))
+        
+        return self._walk(contents, self._count)
+    
+    def _adopt_restored(self, contents):
+        """Anchor a restored summary to the matching content of this transcript"""
+        restored, self._restored = self._restored, None
+        if restored is None or self._summary is not None:
+            return
+        
+        covered = restored["covered"]
+        if len(contents) < covered or covered < 1:
+            return
+        
+        anchor = contents[covered - 1]
+        if anchor.role == restored["anchor_role"] and content_text(anchor) == restored["anchor_text"]:
+            self._summary = {"covered": covered, "anchor": anchor, "text": restored["text"]}
+    
+    def _valid_summary(self, contents):
+        """Return the current summary if it still matches the transcript"""
+        summary = self._summary
+        
+        if summary is None:
+            return None
+        
+        covered = summary["covered"]
+        if len(contents) < covered or contents[covered - 1] is not summary["anchor"]:
+            self._summary = None
+            return None
+        
+        return summary
+    
+    def _collect_pending(self):
+        """Adopt a finished background summary"""
+        if self._pending is None or not self._pending["future"].done():
+            return
+        
+        pending, self._pending = self._pending, None
+        
+        try:
+            text = pending["future"].result()
+        except Exception:
+            return
+        
+        self._summary = {"covered": pending["covered"], "anchor": pending["anchor"], "text": text}
+    
+    def _schedule_summary(self, contents, covered, split, summary, service):
+        """Start a background call folding contents[covered:split] into the summary"""
+        if self._pending is not None:
+            return
+        
+        previous_text = summary["text"] if summary else ""
+        new_contents = list(contents[covered:split])
+        
+        self._pending = {
+            "covered": split,
+            "anchor": contents[split - 1],
+            "future": _summary_executor.submit(service.summarize_history, previous_text, new_contents)
+        }
@@ -0,0 +1,227 @@
+"""
+Background job queue running model calls outside the Streamlit script run
+"""
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from config import (
+    JOB_WORKERS, JOB_MAX_IN_FLIGHT_PER_USER, JOB_MAX_IN_FLIGHT_TOTAL, JOB_RESULT_TTL_SECONDS
+)
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+class JobRejected(Exception):
+    """Raised when a job would exceed the per-user or global in-flight limit"""
+
+
+class Job:
+    """A submitted prompt whose answer is produced by a worker thread"""
+    
+    def __init__(self, job_id, owner, prompt, context=None):
+        self.id = job_id
+        self.owner = owner
+        self.prompt = prompt
+        self.context = context or {}
+        self.status = "queued"
+        self.chunks = []
+        self.error = None
+        self.stats = {}
+        self.created_at = time.time()
+        self.finished_at = None
+        self._condition = threading.Condition()
+    
+    @property
+    def text(self):
+        """Response text produced so far"""
+        with self._condition:
+            return "".join(self.chunks)
+    
+    @property
+    def done(self):
+        """Whether the job finished, successfully or not"""
+        return self.status in ("done", "failed")
+    
+    def append(self, chunk):
+        """
+        Add a chunk of response text and wake up readers
+        
+        Args:
+            chunk (str): Text chunk
+        """
+        with self._condition:
+            self.status = "running"
+            self.chunks.append(chunk)
+            self._condition.notify_all()
+    
+    def finish(self, error=None, stats=None):
+        """
+        Mark the job finished and wake up readers
+        
+        Args:
+            error (str): Error message if the job failed
+            stats (dict): Timings or other per-turn measurements
+        """
+        with self._condition:
+            self.status = "failed" if error else "done"
+            self.error = error
+            self.stats = stats or {}
+            self.finished_at = time.time()
+            self._condition.notify_all()
+    
+    def iter_chunks(self, poll_interval=0.5):
+        """
+        Yield response chunks as they are produced, until the job finishes
+        
+        Args:
+            poll_interval (float): Maximum wait between checks, in seconds
+            
+        Yields:
+            str: Text chunks, starting from the first one
+            
+        Raises:
+            RuntimeError: If the job failed
+        """
+        position = 0
+        
+        while True:
+            with self._condition:
+                while position == len(self.chunks) and not self.done:
+                    self._condition.wait(poll_interval)
+                new_chunks = self.chunks[position:]
+                position = len(self.chunks)
+                finished = self.done
+                error = self.error
+            
+            yield from new_chunks
+            
+            if finished:
+                if error:
+                    raise RuntimeError(error)
+                return
+
+
+class InProcessJobQueue:
+    """Bounded worker pool with per-user and global back-pressure, no external broker"""
+    
+    def __init__(self, max_workers=JOB_WORKERS, max_per_user=JOB_MAX_IN_FLIGHT_PER_USER,
+                 max_total=JOB_MAX_IN_FLIGHT_TOTAL, result_ttl=JOB_RESULT_TTL_SECONDS):
+        """
+        Initialize the queue
+        
+        Args:
+            max_workers (int): Worker threads running jobs
+            max_per_user (int): Jobs one user may have queued or running
+            max_total (int): Jobs the process may have queued or running
+            result_ttl (float): Seconds finished jobs are kept for pickup
+        """
+        self.max_per_user = max_per_user
+        self.max_total = max_total
+        self.result_ttl = result_ttl
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job-worker")
+    
+    def submit(self, owner, prompt, work, context=None):
+        """
+        Submit a job
+        
+        Args:
+            owner (str): Stable identifier of the submitting user/browser
+            prompt (str): Prompt being answered, kept for recovery
+            work (callable): Called with the Job; appends chunks and returns
+                the per-turn stats dict
+            context (dict): What the submitting run needs to finish the turn
+                (trace, cache key), kept for whichever run delivers the answer
+            
+        Returns:
+            str: Job ID
+            
+        Raises:
+            JobRejected: If the user or the process is at its in-flight limit
+        """
+        with self._lock:
+            self._purge_expired()
+            in_flight = [job for job in self._jobs.values() if not job.done]
+            
+            if len(in_flight) >= self.max_total:
+                raise JobRejected("The service is at capacity, please retry shortly")
+            if sum(1 for job in in_flight if job.owner == owner) >= self.max_per_user:
+                raise JobRejected("Too many requests in progress for this session")
+            
+            job = Job(uuid.uuid4().hex, owner, prompt, context)
+            self._jobs[job.id] = job
+        
+        self._executor.submit(self._run, job, work)
+        return job.id
+    
+    def get(self, job_id):
+        """
+        Get a job by ID
+        
+        Args:
+            job_id (str): Job ID
+            
+        Returns:
+            Job: The job, or None if unknown or already claimed
+        """
+        with self._lock:
+            return self._jobs.get(job_id)
+    
+    def jobs_for(self, owner):
+        """
+        List unclaimed jobs submitted by a user, oldest first
+        
+        Args:
+            owner (str): User/browser identifier
+            
+        Returns:
+            list: Job objects
+        """
+        with self._lock:
+            jobs = [job for job in self._jobs.values() if job.owner == owner]
+        return sorted(jobs, key=lambda job: job.created_at)
+    
+    def claim(self, job_id):
+        """
+        Remove a job once its result has been delivered
+        
+        Args:
+            job_id (str): Job ID
+        """
+        with self._lock:
+            self._jobs.pop(job_id, None)
+    
+    def _run(self, job, work):
+        """Run a job on a worker thread"""
+        try:
+            stats = work(job)
+        except Exception as exc:
+            job.finish(error=str(exc) or exc.__class__.__name__)
+        else:
+            job.finish(stats=stats)
+    
+    def _purge_expired(self):
+        """Drop finished jobs nobody picked up in time (caller holds the lock)"""
+        cutoff = time.time() - self.result_ttl
+        for job_id in [job.id for job in self._jobs.values() if job.done and job.finished_at < cutoff]:
+            del self._jobs[job_id]
+
+
+def get_job_queue():
+    """
+    Get the process-wide job queue
+    
+    Returns:
+        InProcessJobQueue: Queue shared by every session in this process
+    """
+    global _queue
+    
+    with _queue_lock:
+        if _queue is None:
+            _queue = InProcessJobQueue()
+        return _queue
@@ -1,7 +1,84 @@
 """
 Language detection and translation utilities
 """
-from config import GREEK_DETECTION_THRESHOLD
+from collections import Counter
+
+from config import GREEK_DETECTION_THRESHOLD, LANGUAGE_SAMPLE_CHARS, LANGUAGE_SAMPLE_WINDOWS
+
+
+def _is_greek(char):
+    """Check whether a character is in the Greek or Greek Extended block"""
+    return '\u0370' <= char <= '\u03FF' or '\u1F00' <= char <= '\u1FFF'
+
+
+def _sample(text):
+    """
+    Take evenly spaced windows from very long texts
+    
+    Args:
+        text (str): Input text
+        
+    Returns:
+        str: The text itself if short enough, otherwise a sample of about
+            LANGUAGE_SAMPLE_CHARS characters drawn from across the text
+    """
+    if len(text) <= LANGUAGE_SAMPLE_CHARS:
+        return text
+    
+    window = LANGUAGE_SAMPLE_CHARS // LANGUAGE_SAMPLE_WINDOWS
+    step = len(text) // LANGUAGE_SAMPLE_WINDOWS
+    return "".join(text[i * step:i * step + window] for i in range(LANGUAGE_SAMPLE_WINDOWS))
+
+
+def _count_characters(text):
+    """
+    Count Greek, Latin and other letters in a single pass
+    
+    The text is tallied once with Counter (a C-level loop); only the
+    distinct characters are then classified in Python.
+    
+    Args:
+        text (str): Input text
+        
+    Returns:
+        tuple: (characters in the Greek blocks, Greek letters, Latin
+            letters, other letters)
+    """
+    greek_block = greek = latin = other = 0
+    
+    for char, count in Counter(_sample(text)).items():
+        if _is_greek(char):
+            greek_block += count
+            if char.isalpha():
+                greek += count
+        elif char.isalpha():
+            if char < '\u0250':
+                latin += count
+            else:
+                other += count
+    
+    return greek_block, greek, latin, other
+
+
+def language_ratios(text):
+    """
+    Measure the share of Greek, Latin and other letters in a text
+    
+    Args:
+        text (str): Input text to analyze
+        
+    Returns:
+        dict: Ratios for 'el' (Greek), 'en' (Latin script) and 'other',
+            summing to 1.0, or all 0.0 for text without letters
+    """
+    _, greek, latin, other = _count_characters(text or "")
+    total = greek + latin + other
+    
+    if total == 0:
+        return {"el": 0.0, "en": 0.0, "other": 0.0}
+    
+    return {"el": greek / total, "en": latin / total, "other": other / total}
+
 
 def detect_language(text):
     """
@@ -16,8 +93,8 @@ def detect_language(text):
     if not text:
         return "en"
     
-    greek_chars = sum(1 for c in text if '\u0370' <= c <= '\u03FF' or '\u1F00' <= c <= '\u1FFF')
-    total_chars = sum(1 for c in text if c.isalpha())
+    greek_chars, greek, latin, other = _count_characters(text)
+    total_chars = greek + latin + other
     
     if total_chars == 0:
         return "en"
@@ -52,6 +129,30 @@ UI_TRANSLATIONS = {
     "depth": {"en": "Analysis Depth", "el": "Βάθος Ανάλυσης"},
     "focus": {"en": "Focus Areas", "el": "Εστίαση"},
     "logout": {"en": "Log Out", "el": "Αποσύνδεση"},
+    "retrieval": {"en": "Send relevant passages only", "el": "Αποστολή μόνο σχετικών αποσπασμάτων"},
+    "compare": {"en": "Compare jurisdictions", "el": "Σύγκριση δικαιοδοσιών"},
+    "compare_with": {"en": "Jurisdictions to compare", "el": "Δικαιοδοσίες προς σύγκριση"},
+    "busy": {
+        "en": "Too many requests in progress. Please wait for the current answer and try again.",
+        "el": "Υπάρχουν πολλά αιτήματα σε εξέλιξη. Περιμένετε την τρέχουσα απάντηση και δοκιμάστε ξανά."
+    },
+    "matter": {"en": "Matter", "el": "Υπόθεση"},
+    "new_matter": {"en": "➕ New matter", "el": "➕ Νέα υπόθεση"},
+    "load_earlier": {"en": "Load earlier messages", "el": "Φόρτωση παλαιότερων μηνυμάτων"},
+    "batch_mode": {"en": "Batch document review", "el": "Μαζικός έλεγχος εγγράφων"},
+    "batch_documents": {"en": "Documents to review (PDF)", "el": "Έγγραφα προς έλεγχο (PDF)"},
+    "batch_folder": {"en": "Or a server folder", "el": "Ή φάκελος στον διακομιστή"},
+    "batch_start": {"en": "Start review", "el": "Έναρξη ελέγχου"},
+    "batch_progress": {"en": "Reviewed {done} of {total} documents", "el": "Ελέγχθηκαν {done} από {total} έγγραφα"},
+    "batch_download": {"en": "Download results (CSV)", "el": "Λήψη αποτελεσμάτων (CSV)"},
+    "extract_start": {"en": "Extract structured data", "el": "Εξαγωγή δομημένων στοιχείων"},
+    "extract_timeline": {"en": "Timeline", "el": "Χρονολόγιο"},
+    "extract_service": {"en": "Service defects", "el": "Ελαττώματα επίδοσης"},
+    "extract_facts": {"en": "Facts", "el": "Γεγονότα"},
+    "extract_authorities": {"en": "Authorities", "el": "Αρχές"},
+    "extract_status": {"en": "Status", "el": "Κατάσταση"},
+    "extract_download": {"en": "Download records (JSON)", "el": "Λήψη εγγραφών (JSON)"},
+    "metrics": {"en": "Performance metrics", "el": "Μετρήσεις απόδοσης"},
     "analyzing": {"en": "Analyzing legal framework...", "el": "Αναλύω το νομικό πλαίσιο..."},
     "placeholder": {
         "en": "Describe your legal matter or ask a question...",
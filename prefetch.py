@@ -0,0 +1,160 @@
+"""
+Speculative preparation of the next turn while the user is still typing
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from config import PREFETCH_WORKERS
+from prompt_builder import normalize_settings, build_complete_system_prompt_with_hash
+from context_cache import build_cache_key
+from attachment_cache import AttachmentCache
+from ai_service import GeminiService
+from tracing import tracer
+
+
+LANGUAGES = ("en", "el")
+
+_executor = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="prefetch")
+
+
+def prefetch_signature(settings):
+    """
+    Identify the settings and attachments a prefetch prepares for
+    
+    Args:
+        settings (dict): User settings from sidebar
+    
+    Returns:
+        tuple: Hashable signature; a prefetch is only used by turns with
+            the same signature
+    """
+    return (
+        # Fixed language: prompts for both languages are prepared
+        normalize_settings(settings["jurisdiction"], settings["specialty"], settings, "en"),
+        bool(settings["retrieval_mode"]),
+        tuple(AttachmentCache.key(uploaded_file) for uploaded_file in settings["uploaded_files"] or ())
+    )
+
+
+class Prefetch:
+    """Background preparation of one settings and attachments combination"""
+    
+    def __init__(self, signature, language, route=None):
+        """
+        Initialize the prefetch
+        
+        Args:
+            signature (tuple): Result of prefetch_signature()
+            language (str): Language the context cache is warmed for
+            route (dict): Route whose model the context cache is created for
+        """
+        self.signature = signature
+        self.language = language
+        self.route = route
+        self.future = None
+        self.error = None
+        self._stages = {}
+        self._claimed = False
+        self._lock = threading.Lock()
+    
+    @contextmanager
+    def stage(self, name, language=None):
+        """
+        Time one piece of background work
+        
+        Args:
+            name (str): Request-path stage the work stands in for
+            language (str): Language the work applies to, or None for both
+        """
+        start = time.perf_counter()
+        yield
+        finished = time.perf_counter()
+        tracer.observe(f"prefetch_{name}", finished - start)
+        with self._lock:
+            self._stages[(name, language)] = (finished - start, finished)
+    
+    def claim(self, signature, language, started):
+        """
+        Work this prefetch took off a turn's critical path, counted once
+        
+        Args:
+            signature (tuple): prefetch_signature() of the turn's settings
+            language (str): Detected language of the turn's prompt
+            started (float): time.perf_counter() at the start of the turn
+        
+        Returns:
+            float: Seconds of stages that finished before the turn started
+                and that the turn would otherwise have run, or None if an
+                earlier turn already claimed them
+        """
+        with self._lock:
+            if self._claimed:
+                return None
+            if signature != self.signature:
+                return 0.0
+            self._claimed = True
+            
+            return sum(
+                seconds
+                for (name, stage_language), (seconds, finished) in self._stages.items()
+                if finished <= started and stage_language in (None, language)
+            )
+
+
+def start_prefetch(settings, attachments, language, route=None):
+    """
+    Build the system prompts, upload or parse the attachments and warm the
+    context cache in the background
+    
+    Args:
+        settings (dict): User settings from sidebar
+        attachments (AttachmentCache): Session cache the files are read through
+        language (str): Language the context cache is warmed for
+        route (dict): Route from ai_service.route_request(), defaults to the base model
+    
+    Returns:
+        Prefetch: Handle whose claim() reports the time saved
+    """
+    prefetch = Prefetch(prefetch_signature(settings), language, route)
+    prefetch.future = _executor.submit(_run, prefetch, dict(settings), attachments)
+    return prefetch
+
+
+def _run(prefetch, settings, attachments):
+    """Do the request-path work that does not depend on the prompt"""
+    try:
+        service = GeminiService(route=prefetch.route)
+        uploaded_files = settings["uploaded_files"]
+        
+        prompts = {}
+        for language in LANGUAGES:
+            with prefetch.stage("system_prompt", language):
+                prompts[language] = build_complete_system_prompt_with_hash(
+                    settings["jurisdiction"],
+                    settings["specialty"],
+                    settings,
+                    language
+                )
+        
+        document_parts = []
+        if settings["retrieval_mode"]:
+            if uploaded_files:
+                with prefetch.stage("retrieval"):
+                    service.ingest_documents(uploaded_files, attachments)
+        elif uploaded_files:
+            with prefetch.stage("document_upload"):
+                document_parts = service.prepare_document_parts(uploaded_files, attachments)
+        
+        system_instruction, prompt_hash = prompts[prefetch.language]
+        with prefetch.stage("context_cache", prefetch.language):
+            service.get_cached_context(
+                build_cache_key(prompt_hash, document_parts, service.model),
+                system_instruction,
+                document_parts
+            )
+    except Exception as exc:
+        # The turn redoes whatever failed here on its own path
+        prefetch.error = str(exc)
+        tracer.increment("prefetch_errors_total")
@@ -1,7 +1,120 @@
 """
 Build and enhance system prompts based on user settings
 """
+import hashlib
+from functools import lru_cache
+
 from prompts import build_legal_system_prompt
+from language_utils import language_ratios
+from config import SYSTEM_PROMPT_CACHE_SIZE, DOCUMENT_COUNT_BUCKET_CAP, BILINGUAL_MIN_RATIO
+
+
+# Fixed prompt fragments, rendered once at import
+FOCUS_TEMPLATES = {
+    "el": "\n\nΠΡΟΤΕΡΑΙΟΤΗΤΑ ΕΣΤΙΑΣΗΣ: Δώσε ιδιαίτερη προσοχή σε {focus_text}.",
+    "en": "\n\nPRIORITY FOCUS: Pay special attention to {focus_text}."
+}
+
+DEPTH_INSTRUCTIONS = {
+    ("Deep Dive", "el"): "\n\nΟΔΗΓΙΑ ΒΑΘΟΥΣ: Παρέχεις ολοκληρωμένη ανάλυση στοιχείο-προς-στοιχείο με πλήρη διαδικαστική ανάλυση.",
+    ("Deep Dive", "en"): "\n\nDEPTH INSTRUCTION: Provide comprehensive element-by-element breakdown with full procedural analysis.",
+    ("Quick Review", "el"): "\n\nΟΔΗΓΙΑ ΒΑΘΟΥΣ: Παρέχεις συνοπτική στρατηγική αξιολόγηση εστιάζοντας μόνο σε κρίσιμα ζητήματα.",
+    ("Quick Review", "en"): "\n\nDEPTH INSTRUCTION: Provide concise strategic assessment focusing on critical issues only."
+}
+
+DOCUMENT_TEMPLATES = {
+    "el": (
+        "\n\nΑΝΑΛΥΣΗ ΕΓΓΡΑΦΩΝ: Έχουν ανέβει {num_files} έγγραφα. Εφάρμοσε το Πρωτόκολλο Ανάλυσης Εγγράφων: "
+        "εξάγαγε ημερομηνίες, προσδιόρισε διαδικαστικό στάδιο, επισήμανε ελαττώματα, διαχώρισε ισχυριζόμενα "
+        "από αποδεδειγμένα γεγονότα, και φίλτραρε για νομική συνάφεια."
+    ),
+    "en": (
+        "\n\nDOCUMENT ANALYSIS: {num_files} documents have been uploaded. Apply the Document Analysis Protocol: "
+        "extract dates, identify procedural stage, flag defects, separate alleged from proven facts, and filter for legal relevance."
+    )
+}
+
+BILINGUAL_TEMPLATES = {
+    "el": (
+        "\n\nΔΙΓΛΩΣΣΟ ΑΙΤΗΜΑ: Το αίτημα περιέχει ελληνικό και αγγλικό κείμενο. Απάντησε στα ελληνικά, "
+        "παραθέτοντας αυτούσια τα αγγλικά αποσπάσματα και όρους με μετάφραση όπου χρειάζεται."
+    ),
+    "en": (
+        "\n\nBILINGUAL REQUEST: The request mixes Greek and English text. Answer in English, "
+        "quoting Greek passages and terms verbatim with a translation where needed."
+    )
+}
+
+
+def is_bilingual(text):
+    """
+    Check whether a prompt mixes Greek and English substantially
+    
+    Args:
+        text (str): User prompt
+        
+    Returns:
+        bool: True if both Greek and Latin letters reach BILINGUAL_MIN_RATIO
+    """
+    ratios = language_ratios(text)
+    return ratios["el"] >= BILINGUAL_MIN_RATIO and ratios["en"] >= BILINGUAL_MIN_RATIO
+
+
+def _file_count_bucket(num_files):
+    """Bucket the number of uploaded files, capping large counts"""
+    if num_files >= DOCUMENT_COUNT_BUCKET_CAP:
+        return f"{DOCUMENT_COUNT_BUCKET_CAP}+"
+    return str(num_files) if num_files else ""
+
+
+def normalize_settings(jurisdiction, specialty, settings, detected_lang, bilingual=False):
+    """
+    Reduce user settings to the tuple that determines the system prompt
+    
+    Args:
+        jurisdiction (str): Legal jurisdiction
+        specialty (str): Legal specialty
+        settings (dict): User settings from sidebar
+        detected_lang (str): Detected language ('en' or 'el')
+        bilingual (bool): Whether the prompt mixes Greek and English
+        
+    Returns:
+        tuple: (jurisdiction, specialty, language, depth, focus areas, file
+            bucket, bilingual)
+    """
+    return (
+        jurisdiction,
+        specialty,
+        "el" if detected_lang == "el" else "en",
+        settings.get("analysis_depth", "Standard Analysis"),
+        tuple(sorted(settings.get("focus_area") or ())),
+        _file_count_bucket(len(settings.get("uploaded_files") or ())),
+        bool(bilingual)
+    )
+
+
+def _settings_fragments(language, analysis_depth, focus_areas, file_bucket, bilingual):
+    """Collect the prompt fragments selected by the settings"""
+    fragments = []
+    
+    # Add focus area instructions
+    if focus_areas:
+        fragments.append(FOCUS_TEMPLATES[language].format(focus_text=', '.join(focus_areas)))
+    
+    # Add analysis depth instructions
+    depth_instruction = DEPTH_INSTRUCTIONS.get((analysis_depth, language))
+    if depth_instruction:
+        fragments.append(depth_instruction)
+    
+    # Add document analysis instructions if files are uploaded
+    if file_bucket:
+        fragments.append(DOCUMENT_TEMPLATES[language].format(num_files=file_bucket))
+    
+    # Add bilingual instructions for mixed Greek and English prompts
+    if bilingual:
+        fragments.append(BILINGUAL_TEMPLATES[language])
+    
+    return fragments
 
 
 def enhance_prompt_with_settings(base_prompt, settings, detected_lang):
@@ -16,55 +129,48 @@ def enhance_prompt_with_settings(base_prompt, settings, detected_lang):
     Returns:
         str: Enhanced system prompt
     """
-    enhanced_prompt = base_prompt
+    _, _, language, analysis_depth, focus_areas, file_bucket, bilingual = normalize_settings(
+        None, None, settings, detected_lang
+    )
+    fragments = _settings_fragments(language, analysis_depth, focus_areas, file_bucket, bilingual)
+    return "".join([base_prompt, *fragments])
+
+
+@lru_cache(maxsize=SYSTEM_PROMPT_CACHE_SIZE)
+def _render_system_prompt(prompt_key):
+    """Render and hash the system prompt for a normalized settings tuple"""
+    jurisdiction, specialty, language, analysis_depth, focus_areas, file_bucket, bilingual = prompt_key
     
-    # Add focus area instructions
-    if settings.get("focus_area"):
-        focus_text = ', '.join(settings["focus_area"])
-        
-        if detected_lang == "el":
-            enhanced_prompt += f"\n\nΠΡΟΤΕΡΑΙΟΤΗΤΑ ΕΣΤΙΑΣΗΣ: Δώσε ιδιαίτερη προσοχή σε {focus_text}."
-        else:
-            enhanced_prompt += f"\n\nPRIORITY FOCUS: Pay special attention to {focus_text}."
+    base_prompt = build_legal_system_prompt(jurisdiction, specialty, language)
+    fragments = _settings_fragments(language, analysis_depth, focus_areas, file_bucket, bilingual)
+    system_prompt = "".join([base_prompt, *fragments])
     
-    # Add analysis depth instructions
-    analysis_depth = settings.get("analysis_depth", "Standard Analysis")
+    return system_prompt, hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()
+
+
+def build_complete_system_prompt_with_hash(jurisdiction, specialty, settings, detected_lang, bilingual=False):
+    """
+    Build the complete system prompt together with its stable hash
     
-    if analysis_depth == "Deep Dive":
-        depth_instruction = (
-            "\n\nΟΔΗΓΙΑ ΒΑΘΟΥΣ: Παρέχεις ολοκληρωμένη ανάλυση στοιχείο-προς-στοιχείο με πλήρη διαδικαστική ανάλυση."
-            if detected_lang == "el"
-            else "\n\nDEPTH INSTRUCTION: Provide comprehensive element-by-element breakdown with full procedural analysis."
-        )
-        enhanced_prompt += depth_instruction
-        
-    elif analysis_depth == "Quick Review":
-        depth_instruction = (
-            "\n\nΟΔΗΓΙΑ ΒΑΘΟΥΣ: Παρέχεις συνοπτική στρατηγική αξιολόγηση εστιάζοντας μόνο σε κρίσιμα ζητήματα."
-            if detected_lang == "el"
-            else "\n\nDEPTH INSTRUCTION: Provide concise strategic assessment focusing on critical issues only."
-        )
-        enhanced_prompt += depth_instruction
+    Prompts are memoized on the normalized settings, so repeated settings
+    combinations return the same string object and hash.
     
-    # Add document analysis instructions if files are uploaded
-    uploaded_files = settings.get("uploaded_files")
-    if uploaded_files:
-        num_files = len(uploaded_files)
+    Args:
+        jurisdiction (str): Legal jurisdiction
+        specialty (str): Legal specialty
+        settings (dict): User settings from sidebar
+        detected_lang (str): Detected language ('en' or 'el')
+        bilingual (bool): Whether the prompt mixes Greek and English
         
-        doc_instruction = (
-            f"\n\nΑΝΑΛΥΣΗ ΕΓΓΡΑΦΩΝ: Έχουν ανέβει {num_files} έγγραφα. Εφάρμοσε το Πρωτόκολλο Ανάλυσης Εγγράφων: "
-            "εξάγαγε ημερομηνίες, προσδιόρισε διαδικαστικό στάδιο, επισήμανε ελαττώματα, διαχώρισε ισχυριζόμενα "
-            "από αποδεδειγμένα γεγονότα, και φίλτραρε για νομική συνάφεια."
-            if detected_lang == "el"
-            else f"\n\nDOCUMENT ANALYSIS: {num_files} documents have been uploaded. Apply the Document Analysis Protocol: "
-            "extract dates, identify procedural stage, flag defects, separate alleged from proven facts, and filter for legal relevance."
-        )
-        enhanced_prompt += doc_instruction
-    
-    return enhanced_prompt
+    Returns:
+        tuple: (system prompt, SHA-256 hex digest of the prompt)
+    """
+    return _render_system_prompt(
+        normalize_settings(jurisdiction, specialty, settings, detected_lang, bilingual)
+    )
 
 
-def build_complete_system_prompt(jurisdiction, specialty, settings, detected_lang):
+def build_complete_system_prompt(jurisdiction, specialty, settings, detected_lang, bilingual=False):
     """
     Build the complete system prompt with all enhancements
     
@@ -73,9 +179,12 @@ def build_complete_system_prompt(jurisdiction, specialty, settings, detected_lan
         specialty (str): Legal specialty
         settings (dict): User settings from sidebar
         detected_lang (str): Detected language ('en' or 'el')
+        bilingual (bool): Whether the prompt mixes Greek and English
         
     Returns:
         str: Complete enhanced system prompt
     """
-    base_prompt = build_legal_system_prompt(jurisdiction, specialty, detected_lang)
-    return enhance_prompt_with_settings(base_prompt, settings, detected_lang)
+    system_prompt, _ = build_complete_system_prompt_with_hash(
+        jurisdiction, specialty, settings, detected_lang, bilingual
+    )
+    return system_prompt
@@ -0,0 +1,407 @@
+"""
+Client-side resilience for Gemini calls: rate limiting, retries, circuit
+breaking and request hedging
+"""
+import asyncio
+import random
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import httpx
+from google.genai import errors
+from config import (
+    RATE_LIMIT_PER_SECOND, RATE_LIMIT_BURST, RETRY_MAX_ATTEMPTS, RETRY_BASE_DELAY_SECONDS,
+    RETRY_MAX_DELAY_SECONDS, CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_SECONDS,
+    HEDGE_PERCENTILE, HEDGE_MIN_SAMPLES
+)
+
+
+RETRYABLE_STATUS_CODES = frozenset({408, 429, 500, 502, 503, 504})
+
+_caller = None
+_caller_lock = threading.Lock()
+_hedge_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="gemini-hedge")
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling the API while the circuit breaker is open"""
+
+
+def is_retryable(exc):
+    """
+    Decide whether a failed call is worth retrying
+    
+    Args:
+        exc (Exception): Error raised by the call
+        
+    Returns:
+        bool: True for rate limiting, server errors and transport failures
+    """
+    if isinstance(exc, errors.APIError):
+        return exc.code in RETRYABLE_STATUS_CODES
+    return isinstance(exc, (httpx.TransportError, TimeoutError))
+
+
+class TokenBucket:
+    """Thread-safe token bucket limiting request rate across sessions"""
+    
+    def __init__(self, rate=RATE_LIMIT_PER_SECOND, capacity=RATE_LIMIT_BURST):
+        """
+        Initialize the bucket
+        
+        Args:
+            rate (float): Tokens added per second
+            capacity (int): Maximum burst size
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def reserve(self):
+        """
+        Take a token, borrowing against the future if none is available
+        
+        Returns:
+            float: Seconds the caller must wait before proceeding
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+    
+    def acquire(self):
+        """
+        Block until a token is available
+        
+        Returns:
+            float: Seconds spent waiting
+        """
+        delay = self.reserve()
+        if delay:
+            time.sleep(delay)
+        return delay
+
+
+class CircuitBreaker:
+    """Stops calling the API after repeated failures, probing again after a pause"""
+    
+    def __init__(self, failure_threshold=CIRCUIT_FAILURE_THRESHOLD, reset_seconds=CIRCUIT_RESET_SECONDS):
+        """
+        Initialize the breaker
+        
+        Args:
+            failure_threshold (int): Consecutive failures that open the circuit
+            reset_seconds (float): Time open before a trial call is allowed
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+    
+    def before_call(self):
+        """
+        Check that a call may proceed
+        
+        Once the reset time has passed, a single trial call is let through;
+        other callers are rejected until it succeeds or fails.
+        
+        Returns:
+            bool: True if this call is the trial call, which must end in
+                record_success(), record_failure() or release()
+        
+        Raises:
+            CircuitOpenError: If the circuit is open, or half open with the
+                trial call still in flight
+        """
+        with self._lock:
+            if self.state == "closed":
+                return False
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.reset_seconds:
+                self.state = "half_open"
+                self._probing = False
+            if self.state == "open" or self._probing:
+                raise CircuitOpenError("Gemini API temporarily unavailable, please retry shortly")
+            self._probing = True
+            return True
+    
+    def record_success(self):
+        """Close the circuit after a successful call"""
+        with self._lock:
+            self.state = "closed"
+            self._failures = 0
+            self._probing = False
+    
+    def record_failure(self):
+        """Count a retryable failure, opening the circuit at the threshold"""
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self.state == "half_open" or self._failures >= self.failure_threshold:
+                self.state = "open"
+                self._opened_at = time.monotonic()
+    
+    def release(self):
+        """End a trial call that neither proved nor disproved availability, e.g. a 400 or a cancelled call"""
+        with self._lock:
+            self._probing = False
+
+
+class LatencyTracker:
+    """Rolling window of one call type's latencies for hedging decisions"""
+    
+    def __init__(self, size=200):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+    
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+    
+    def percentile(self, fraction):
+        """
+        Latency percentile over the window
+        
+        Args:
+            fraction (float): Percentile as a fraction, e.g. 0.95
+            
+        Returns:
+            float: The percentile, or None with fewer than HEDGE_MIN_SAMPLES samples
+        """
+        with self._lock:
+            if len(self._samples) < HEDGE_MIN_SAMPLES:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class ResilientCaller:
+    """Wraps API calls with rate limiting, retries, circuit breaking and hedging"""
+    
+    def __init__(self, limiter=None, breaker=None, max_attempts=RETRY_MAX_ATTEMPTS,
+                 base_delay=RETRY_BASE_DELAY_SECONDS, max_delay=RETRY_MAX_DELAY_SECONDS):
+        """
+        Initialize the caller
+        
+        Args:
+            limiter (TokenBucket): Shared rate limiter
+            breaker (CircuitBreaker): Shared circuit breaker
+            max_attempts (int): Attempts per call, including the first
+            base_delay (float): First backoff ceiling in seconds
+            max_delay (float): Largest backoff ceiling in seconds
+        """
+        self.limiter = limiter or TokenBucket()
+        self.breaker = breaker or CircuitBreaker()
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        # One window per call type: a summary's latency says nothing about a stream's first token
+        self.latencies = defaultdict(LatencyTracker)
+        self.metrics = {
+            "calls": 0, "attempts": 0, "retries": 0, "failures": 0,
+            "rate_limit_wait_seconds": 0.0, "backoff_wait_seconds": 0.0,
+            "circuit_rejections": 0, "hedges": 0, "hedge_wins": 0
+        }
+        self._lock = threading.Lock()
+    
+    def backoff_delay(self, attempt):
+        """
+        Exponential backoff with full jitter
+        
+        Args:
+            attempt (int): Number of attempts already made (1 after the first)
+            
+        Returns:
+            float: Seconds to wait before the next attempt
+        """
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+    
+    def call(self, function, hedge=False, kind="generate", discard=None):
+        """
+        Call a function with retries
+        
+        Args:
+            function (callable): Zero-argument function making one API call
+            hedge (bool): Fire a second identical call if the first is slower
+                than the recent p95 latency of this kind, using whichever
+                finishes first
+            kind (str): Call type whose latency window is updated and hedged on
+            discard (callable): Releases the result of a hedged call that lost
+                the race, e.g. closes an opened stream
+            
+        Returns:
+            tuple: (function result, per-call metrics dict)
+        """
+        call_metrics = {"attempts": 0, "rate_limit_wait": 0.0, "backoff_wait": 0.0, "hedged": False}
+        
+        try:
+            while True:
+                self._before_attempt(call_metrics)
+                start = time.perf_counter()
+                try:
+                    result = self._hedged(function, call_metrics, kind, discard) if hedge else function()
+                except Exception as exc:
+                    if not self._after_failure(exc, call_metrics):
+                        raise
+                    delay = self.backoff_delay(call_metrics["attempts"])
+                    call_metrics["backoff_wait"] += delay
+                    time.sleep(delay)
+                    continue
+                
+                self.latencies[kind].record(time.perf_counter() - start)
+                self.breaker.record_success()
+                return result, call_metrics
+        except Exception:
+            call_metrics["failed"] = True
+            raise
+        finally:
+            self._end_probe(call_metrics)
+            self._record(call_metrics)
+    
+    async def call_async(self, coroutine_function):
+        """
+        Await a coroutine function with retries (no hedging)
+        
+        Args:
+            coroutine_function (callable): Zero-argument function returning
+                a coroutine that makes one API call
+            
+        Returns:
+            tuple: (coroutine result, per-call metrics dict)
+        """
+        call_metrics = {"attempts": 0, "rate_limit_wait": 0.0, "backoff_wait": 0.0, "hedged": False}
+        
+        try:
+            while True:
+                self._check_breaker(call_metrics)
+                delay = self.limiter.reserve()
+                if delay:
+                    await asyncio.sleep(delay)
+                call_metrics["rate_limit_wait"] += delay
+                call_metrics["attempts"] += 1
+                
+                try:
+                    result = await coroutine_function()
+                except Exception as exc:
+                    if not self._after_failure(exc, call_metrics):
+                        raise
+                    delay = self.backoff_delay(call_metrics["attempts"])
+                    call_metrics["backoff_wait"] += delay
+                    await asyncio.sleep(delay)
+                    continue
+                
+                self.breaker.record_success()
+                return result, call_metrics
+        except Exception:
+            call_metrics["failed"] = True
+            raise
+        finally:
+            self._end_probe(call_metrics)
+            self._record(call_metrics)
+    
+    def snapshot(self):
+        """
+        Aggregate metrics for every call made through this caller
+        
+        Returns:
+            dict: Counters and total waits, plus the circuit state
+        """
+        with self._lock:
+            return {**self.metrics, "circuit_state": self.breaker.state}
+    
+    def _check_breaker(self, call_metrics):
+        """Ask the breaker whether the next attempt may proceed"""
+        # A rejected attempt is not the trial call, even if an earlier attempt was
+        call_metrics["probe"] = False
+        try:
+            call_metrics["probe"] = self.breaker.before_call()
+        except CircuitOpenError:
+            call_metrics["circuit_open"] = True
+            raise
+    
+    def _before_attempt(self, call_metrics):
+        """Check the breaker and wait for a rate-limit token"""
+        self._check_breaker(call_metrics)
+        call_metrics["rate_limit_wait"] += self.limiter.acquire()
+        call_metrics["attempts"] += 1
+    
+    def _end_probe(self, call_metrics):
+        """Let another trial call through if this one ended without a verdict"""
+        if call_metrics.get("probe") and self.breaker.state == "half_open":
+            self.breaker.release()
+    
+    def _after_failure(self, exc, call_metrics):
+        """Record a failure and decide whether another attempt is allowed"""
+        if not is_retryable(exc):
+            return False
+        self.breaker.record_failure()
+        return call_metrics["attempts"] < self.max_attempts
+    
+    def _hedged(self, function, call_metrics, kind, discard):
+        """Run the call, firing a backup once it exceeds the p95 latency of its kind"""
+        threshold = self.latencies[kind].percentile(HEDGE_PERCENTILE)
+        primary = _hedge_executor.submit(function)
+        
+        if threshold is None:
+            return primary.result()
+        
+        done, _ = wait([primary], timeout=threshold)
+        if done:
+            return primary.result()
+        
+        call_metrics["hedged"] = True
+        call_metrics["rate_limit_wait"] += self.limiter.acquire()
+        backup = _hedge_executor.submit(function)
+        done, _ = wait([primary, backup], return_when=FIRST_COMPLETED)
+        winner = next(iter(done))
+        
+        if winner is backup and backup.exception() is None:
+            call_metrics["hedge_won"] = True
+        elif winner.exception() is not None:
+            # The first to finish failed; fall back to the other one
+            winner = backup if winner is primary else primary
+        
+        if discard is not None:
+            def discard_loser(future):
+                if future.exception() is None:
+                    discard(future.result())
+            
+            (primary if winner is backup else backup).add_done_callback(discard_loser)
+        
+        return winner.result()
+    
+    def _record(self, call_metrics):
+        """Fold per-call metrics into the aggregates"""
+        with self._lock:
+            self.metrics["calls"] += 1
+            self.metrics["attempts"] += call_metrics["attempts"]
+            self.metrics["retries"] += max(0, call_metrics["attempts"] - 1)
+            self.metrics["failures"] += int(call_metrics.get("failed", False))
+            self.metrics["rate_limit_wait_seconds"] += call_metrics["rate_limit_wait"]
+            self.metrics["backoff_wait_seconds"] += call_metrics["backoff_wait"]
+            self.metrics["circuit_rejections"] += int(call_metrics.get("circuit_open", False))
+            self.metrics["hedges"] += int(call_metrics["hedged"])
+            self.metrics["hedge_wins"] += int(call_metrics.get("hedge_won", False))
+
+
+def get_resilient_caller():
+    """
+    Get the process-wide resilient caller
+    
+    Returns:
+        ResilientCaller: Caller whose limiter and breaker are shared by all sessions
+    """
+    global _caller
+    
+    with _caller_lock:
+        if _caller is None:
+            _caller = ResilientCaller()
+        return _caller
@@ -0,0 +1,301 @@
+"""
+Persistent cache of model responses for repeated legal questions
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from config import (
+    RESPONSE_CACHE_PATH, RESPONSE_CACHE_TTL_SECONDS, RESPONSE_CACHE_MAX_ENTRIES,
+    RESPONSE_CACHE_SIMILARITY_THRESHOLD, RESPONSE_CACHE_SEMANTIC_CANDIDATES
+)
+from tracing import tracer
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_EDGE_PUNCTUATION = " .,;:!?·\"'«»()[]"
+
+
+def normalize_prompt(prompt):
+    """
+    Normalize a prompt so trivially different phrasings share a cache key
+    
+    Args:
+        prompt (str): User prompt
+        
+    Returns:
+        str: Case-folded, accent-stripped prompt with collapsed whitespace
+    """
+    text = unicodedata.normalize("NFKD", prompt.casefold())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = _WHITESPACE_RE.sub(" ", text)
+    return text.strip(_EDGE_PUNCTUATION)
+
+
+def build_response_key(prompt_hash, model, generation_config):
+    """
+    Build the key scoping cached answers to how they were generated
+    
+    Answers from one route must not be served on another, whose model or
+    output limits may give a different answer.
+    
+    Args:
+        prompt_hash (str): Hash of the system prompt from prompt_builder
+        model (str): Model the request is routed to
+        generation_config (dict): Sampling settings and generation limits
+        
+    Returns:
+        str: Hex digest used as the cache's prompt hash
+    """
+    scope = json.dumps([prompt_hash, model, generation_config], sort_keys=True, default=str)
+    return hashlib.sha256(scope.encode("utf-8")).hexdigest()
+
+
+def _unit_vector(values):
+    """Embedding as a float32 vector of length 1, or None if it is empty or zero"""
+    vector = np.asarray(values, dtype=np.float32)
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if vector.size and norm else None
+
+
+class ResponseCache:
+    """
+    SQLite-backed response cache with exact and embedding-similarity lookup
+    
+    Embeddings are stored as unit float32 vectors, so a similarity lookup
+    is one NumPy matrix-vector product over the most recent candidates.
+    Without NumPy only exact lookups are made.
+    """
+    
+    def __init__(self, path=RESPONSE_CACHE_PATH, ttl_seconds=RESPONSE_CACHE_TTL_SECONDS,
+                 max_entries=RESPONSE_CACHE_MAX_ENTRIES,
+                 similarity_threshold=RESPONSE_CACHE_SIMILARITY_THRESHOLD,
+                 max_candidates=RESPONSE_CACHE_SEMANTIC_CANDIDATES):
+        """
+        Initialize the cache
+        
+        Args:
+            path (str): SQLite database file (':memory:' for a private cache)
+            ttl_seconds (int): Age after which entries are ignored and purged
+            max_entries (int): Entries kept before least recently used are evicted
+            similarity_threshold (float): Minimum cosine similarity for a semantic hit
+            max_candidates (int): Most recently used entries a similarity lookup scores
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+        self.max_candidates = max_candidates
+        self.stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "skips": 0, "embed_errors": 0}
+        self._pending_embeddings = {}
+        self._lock = threading.Lock()
+        
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY, prompt_hash TEXT NOT NULL,"
+                " normalized_prompt TEXT NOT NULL, response TEXT NOT NULL,"
+                " embedding BLOB, created_at REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_prompt_hash ON responses (prompt_hash)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+            if self._db.execute("PRAGMA user_version").fetchone()[0] < 1:
+                # Embeddings from before they were stored normalized cannot be scored by dot product
+                self._db.execute("UPDATE responses SET embedding = NULL")
+                self._db.execute("PRAGMA user_version = 1")
+    
+    def _key(self, prompt_hash, normalized):
+        return hashlib.sha256(f"{prompt_hash}\0{normalized}".encode("utf-8")).hexdigest()
+    
+    def get(self, prompt_hash, prompt, embed=None):
+        """
+        Look up a cached response
+        
+        Args:
+            prompt_hash (str): Key from build_response_key: system prompt, model and generation config
+            prompt (str): User prompt
+            embed (callable): Optional function embedding a list of texts in
+                one request (e.g. GeminiService.embed_texts), enabling
+                similarity lookup when there is no exact match
+            
+        Returns:
+            str: Cached response, or None on a miss
+        """
+        normalized = normalize_prompt(prompt)
+        key = self._key(prompt_hash, normalized)
+        now = time.time()
+        oldest = now - self.ttl_seconds
+        
+        with self._lock:
+            row = self._db.execute(
+                "SELECT response FROM responses WHERE key = ? AND created_at >= ?",
+                (key, oldest)
+            ).fetchone()
+            
+            if row is not None:
+                with self._db:
+                    self._db.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+                self.stats["exact_hits"] += 1
+                return row[0]
+        
+        if embed is not None and np is not None:
+            try:
+                embedding = _unit_vector(embed([normalized])[0])
+            except Exception:
+                # Retries are the embedder's job; a failed lookup is a miss, not a failed turn
+                embedding = None
+                with self._lock:
+                    self.stats["embed_errors"] += 1
+            
+            if embedding is not None:
+                response = self._similar(prompt_hash, embedding, oldest, now)
+                if response is not None:
+                    return response
+                
+                with self._lock:
+                    # Kept for put() so the prompt is not embedded twice
+                    if len(self._pending_embeddings) > 256:
+                        self._pending_embeddings.clear()
+                    self._pending_embeddings[key] = embedding
+        
+        with self._lock:
+            self.stats["misses"] += 1
+        
+        return None
+    
+    def put(self, prompt_hash, prompt, response):
+        """
+        Store a response
+        
+        Args:
+            prompt_hash (str): Key from build_response_key: system prompt, model and generation config
+            prompt (str): User prompt
+            response (str): Model response
+        """
+        normalized = normalize_prompt(prompt)
+        key = self._key(prompt_hash, normalized)
+        now = time.time()
+        
+        with self._lock:
+            embedding = self._pending_embeddings.pop(key, None)
+            blob = embedding.tobytes() if embedding is not None else None
+            
+            with self._db:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, prompt_hash, normalized, response, blob, now, now)
+                )
+                self._evict(now)
+    
+    def record_skip(self):
+        """Count a request that bypassed the cache (documents or prior turns)"""
+        with self._lock:
+            self.stats["skips"] += 1
+    
+    def hit_rate(self):
+        """
+        Fraction of cache lookups answered from the cache
+        
+        Returns:
+            float: Hits divided by lookups, 0.0 before any lookup
+        """
+        with self._lock:
+            hits = self.stats["exact_hits"] + self.stats["semantic_hits"]
+            lookups = hits + self.stats["misses"]
+        return hits / lookups if lookups else 0.0
+    
+    def snapshot(self):
+        """
+        Lookup counters and hit rate for metrics export
+        
+        Returns:
+            dict: Exact hits, semantic hits, misses, skips, embedding errors and 'hit_rate'
+        """
+        with self._lock:
+            stats = dict(self.stats)
+        return {**stats, "hit_rate": self.hit_rate()}
+    
+    def _similar(self, prompt_hash, embedding, oldest, now):
+        """Best recent cached response above the similarity threshold, if any"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT key, response, embedding FROM responses"
+                " WHERE prompt_hash = ? AND created_at >= ? AND embedding IS NOT NULL"
+                " ORDER BY last_access DESC LIMIT ?",
+                (prompt_hash, oldest, self.max_candidates)
+            ).fetchall()
+        
+        # Vectors from another embedding model have another length
+        rows = [row for row in rows if len(row[2]) == embedding.nbytes]
+        if not rows:
+            return None
+        
+        matrix = np.frombuffer(b"".join(row[2] for row in rows), dtype=np.float32).reshape(len(rows), -1)
+        scores = matrix @ embedding
+        best = int(np.argmax(scores))
+        if scores[best] < self.similarity_threshold:
+            return None
+        
+        best_key, best_response = rows[best][0], rows[best][1]
+        with self._lock:
+            with self._db:
+                self._db.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, best_key))
+            self.stats["semantic_hits"] += 1
+        
+        return best_response
+    
+    def _evict(self, now):
+        """Purge expired entries and least recently used overflow (caller holds the lock)"""
+        self._db.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+        self._db.execute(
+            "DELETE FROM responses WHERE key IN ("
+            " SELECT key FROM responses ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+
+
+def get_response_cache():
+    """
+    Get the process-wide response cache
+    
+    Returns:
+        ResponseCache: Cache shared by every session in this process
+    """
+    global _cache
+    
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache()
+        return _cache
+
+
+def get_response_cache_stats():
+    """
+    Get the process-wide cache's counters without creating the cache
+    
+    Returns:
+        dict: ResponseCache.snapshot(), or empty before the first lookup
+    """
+    with _cache_lock:
+        cache = _cache
+    return cache.snapshot() if cache is not None else {}
+
+
+tracer.register_collector("response_cache", get_response_cache_stats)
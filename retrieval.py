@@ -0,0 +1,271 @@
+"""
+Passage retrieval over locally extracted document chunks
+"""
+import math
+import re
+import threading
+import unicodedata
+from collections import Counter, OrderedDict, defaultdict
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from config import (
+    RETRIEVAL_TOP_K, RETRIEVAL_EMBEDDING_WEIGHT, RETRIEVAL_INDEX_CACHE_SIZE, RETRIEVAL_EMBEDDING_CACHE_SIZE
+)
+
+
+_TOKEN_RE = re.compile(r"\w+")
+
+_STOPWORD_TEXT = """
+a an and are as at be by for from has have in is it its of on or that the this to was were will with
+ο η το οι τα του της των τον την τους τις και να σε με για απο από ως που στο στη στην στον στα στους στις
+ειναι είναι δεν θα ή η ενα ένα μια μία αυτο αυτό αυτη αυτή
+"""
+
+_embedding_cache = OrderedDict()
+_embedding_cache_lock = threading.Lock()
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def _strip_accents(text):
+    """Remove combining marks so accented and unaccented Greek match"""
+    return "".join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c))
+
+
+STOPWORDS = frozenset(_strip_accents(word) for word in _STOPWORD_TEXT.split())
+
+
+def tokenize(text):
+    """
+    Split Greek or English text into normalized search terms
+    
+    Args:
+        text (str): Text to tokenize
+        
+    Returns:
+        list: Case-folded, accent-stripped tokens without stopwords
+    """
+    # casefold also maps final sigma to sigma
+    normalized = _strip_accents(text.casefold())
+    return [
+        token for token in _TOKEN_RE.findall(normalized)
+        if token not in STOPWORDS and (len(token) > 1 or token.isdigit())
+    ]
+
+
+class BM25Index:
+    """Okapi BM25 index over document chunks"""
+    
+    def __init__(self, chunks, k1=1.5, b=0.75):
+        """
+        Build the index
+        
+        Args:
+            chunks (list): DocumentChunk objects to index
+            k1 (float): Term frequency saturation
+            b (float): Length normalization strength
+        """
+        self.chunks = list(chunks)
+        self.k1 = k1
+        self.b = b
+        self._postings = defaultdict(list)
+        self._lengths = []
+        
+        for index, chunk in enumerate(self.chunks):
+            terms = Counter(tokenize(chunk.text))
+            self._lengths.append(sum(terms.values()))
+            for term, frequency in terms.items():
+                self._postings[term].append((index, frequency))
+        
+        self._average_length = sum(self._lengths) / len(self._lengths) if self._lengths else 0.0
+        document_count = len(self.chunks)
+        self._idf = {
+            term: math.log(1 + (document_count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self._postings.items()
+        }
+    
+    def scores(self, query):
+        """
+        Score every chunk against a query
+        
+        Args:
+            query (str): Search query
+            
+        Returns:
+            dict: Chunk index to BM25 score, for chunks matching any term
+        """
+        scores = defaultdict(float)
+        
+        for term in set(tokenize(query)):
+            idf = self._idf.get(term)
+            if idf is None:
+                continue
+            for index, frequency in self._postings[term]:
+                length_ratio = self._lengths[index] / self._average_length if self._average_length else 0.0
+                denominator = frequency + self.k1 * (1 - self.b + self.b * length_ratio)
+                scores[index] += idf * frequency * (self.k1 + 1) / denominator
+        
+        return scores
+
+
+def _embed_chunks(chunks, embed):
+    """Embedding matrix for chunks, reusing vectors cached by chunk hash"""
+    vectors = {}
+    with _embedding_cache_lock:
+        for chunk in chunks:
+            vector = _embedding_cache.get(chunk.chunk_hash)
+            if vector is not None:
+                _embedding_cache.move_to_end(chunk.chunk_hash)
+                vectors[chunk.chunk_hash] = vector
+    
+    missing = list({chunk.chunk_hash: chunk.text for chunk in chunks if chunk.chunk_hash not in vectors}.items())
+    if missing:
+        embedded = embed([text for _, text in missing])
+        fresh = {
+            chunk_hash: np.asarray(vector, dtype=np.float32)
+            for (chunk_hash, _), vector in zip(missing, embedded)
+        }
+        vectors.update(fresh)
+        
+        with _embedding_cache_lock:
+            _embedding_cache.update(fresh)
+            while len(_embedding_cache) > RETRIEVAL_EMBEDDING_CACHE_SIZE:
+                _embedding_cache.popitem(last=False)
+    
+    matrix = np.stack([vectors[chunk.chunk_hash] for chunk in chunks])
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+def leading_chunks(chunks, top_k=RETRIEVAL_TOP_K):
+    """
+    Opening chunks of every document, taken in turns
+    
+    Used when the query matches nothing, e.g. "summarize this document" or
+    a Greek question over an English file.
+    
+    Args:
+        chunks (list): DocumentChunk objects in reading order per document
+        top_k (int): Number of chunks to return
+        
+    Returns:
+        list: Up to top_k DocumentChunk objects, first chunks of each document first
+    """
+    by_document = defaultdict(list)
+    for chunk in chunks:
+        by_document[chunk.doc_hash].append(chunk)
+    
+    selected = []
+    for position in range(max((len(group) for group in by_document.values()), default=0)):
+        for group in by_document.values():
+            if position < len(group):
+                selected.append(group[position])
+                if len(selected) == top_k:
+                    return selected
+    return selected
+
+
+def get_index(chunks):
+    """
+    Get a BM25 index for chunks, reusing one built for the same documents
+    
+    Args:
+        chunks (list): DocumentChunk objects
+        
+    Returns:
+        BM25Index: Index over the chunks
+    """
+    key = tuple(sorted({chunk.doc_hash for chunk in chunks}))
+    
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is not None:
+            _indexes.move_to_end(key)
+            return index
+    
+    index = BM25Index(chunks)
+    
+    with _indexes_lock:
+        _indexes[key] = index
+        while len(_indexes) > RETRIEVAL_INDEX_CACHE_SIZE:
+            _indexes.popitem(last=False)
+    
+    return index
+
+
+def retrieve(query, chunks, top_k=RETRIEVAL_TOP_K, embed=None, embedding_weight=RETRIEVAL_EMBEDDING_WEIGHT):
+    """
+    Select the chunks most relevant to a query
+    
+    BM25 scores are normalized to [0, 1] and, when an embedding function
+    is given, NumPy is available and the weight is positive, mixed with
+    cosine similarity. A query matching nothing gets the leading chunks of
+    each document instead.
+    
+    Args:
+        query (str): Search query (the user prompt)
+        chunks (list): DocumentChunk objects to search
+        top_k (int): Number of chunks to return
+        embed (callable): Optional function embedding a list of texts in
+            one request, returning one vector per text
+        embedding_weight (float): Weight of embedding similarity in [0, 1]
+        
+    Returns:
+        list: Up to top_k DocumentChunk objects, best first
+    """
+    if not chunks:
+        return []
+    
+    index = get_index(chunks)
+    bm25 = index.scores(query)
+    best = max(bm25.values(), default=0.0)
+    
+    if embed is not None and np is not None and embedding_weight > 0:
+        lexical = np.zeros(len(index.chunks), dtype=np.float32)
+        for position, score in bm25.items():
+            lexical[position] = score / best if best else 0.0
+        
+        query_vector = np.asarray(embed([query])[0], dtype=np.float32)
+        query_vector /= np.linalg.norm(query_vector) or 1.0
+        semantic = _embed_chunks(index.chunks, embed) @ query_vector
+        
+        combined = (1 - embedding_weight) * lexical + embedding_weight * semantic
+        ranked = np.argsort(-combined)[:top_k].tolist()
+    elif bm25:
+        ranked = sorted(bm25, key=bm25.get, reverse=True)[:top_k]
+    else:
+        return leading_chunks(index.chunks, top_k)
+    
+    return [index.chunks[position] for position in ranked]
+
+
+def format_passages(passages, document_names, is_greek=False):
+    """
+    Format retrieved passages with page citations for the model
+    
+    Args:
+        passages (list): DocumentChunk objects
+        document_names (dict): Document name per content hash
+        is_greek (bool): Whether to label the block in Greek
+        
+    Returns:
+        str: Passage block to prepend to the user's message
+    """
+    header = (
+        "ΣΧΕΤΙΚΑ ΑΠΟΣΠΑΣΜΑΤΑ ΑΠΟ ΤΑ ΑΝΑΡΤΗΜΕΝΑ ΕΓΓΡΑΦΑ (παράθεσε έγγραφο και σελίδα):"
+        if is_greek
+        else "RELEVANT PASSAGES FROM THE UPLOADED DOCUMENTS (cite document and page):"
+    )
+    
+    # Present passages in reading order within each document
+    ordered = sorted(passages, key=lambda chunk: (document_names.get(chunk.doc_hash, ""), chunk.page, chunk.start))
+    blocks = [
+        f"[{document_names.get(chunk.doc_hash, chunk.doc_hash[:12])}, p. {chunk.page}]\n{chunk.text}"
+        for chunk in ordered
+    ]
+    
+    return "\n\n".join([header, *blocks])
@@ -0,0 +1,170 @@
+"""
+Shared state backends: key-value state that replicas of the app can share
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from config import STATE_BACKEND, STATE_BACKEND_PATH
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+class MemoryStateBackend:
+    """State kept in this process only"""
+    
+    def __init__(self):
+        """Initialize the backend"""
+        self.stats = {"hits": 0, "misses": 0, "writes": 0}
+        self._values = {}
+        self._lock = threading.Lock()
+    
+    def get(self, namespace, key):
+        """
+        Look up a value
+        
+        Args:
+            namespace (str): Kind of state, e.g. 'documents' or 'sessions'
+            key (str): Key within the namespace
+        
+        Returns:
+            Value stored under the key, or None if missing or expired
+        """
+        with self._lock:
+            item = self._values.get((namespace, key))
+            if item is not None and item[1] is not None and item[1] <= time.time():
+                del self._values[(namespace, key)]
+                item = None
+            self.stats["hits" if item else "misses"] += 1
+        return item[0] if item else None
+    
+    def set(self, namespace, key, value, expires_at=None):
+        """
+        Store a value
+        
+        Args:
+            namespace (str): Kind of state
+            key (str): Key within the namespace
+            value: JSON-serializable value
+            expires_at (float): Unix time after which the value is ignored
+        """
+        with self._lock:
+            self._values[(namespace, key)] = (value, expires_at)
+            self.stats["writes"] += 1
+    
+    def delete(self, namespace, key):
+        """
+        Remove a value
+        
+        Args:
+            namespace (str): Kind of state
+            key (str): Key within the namespace
+        """
+        with self._lock:
+            self._values.pop((namespace, key), None)
+
+
+class SQLiteStateBackend:
+    """State in an SQLite file that every process on the host (or a shared volume) can open"""
+    
+    def __init__(self, path=STATE_BACKEND_PATH):
+        """
+        Initialize the backend
+        
+        Args:
+            path (str): SQLite database file (':memory:' for a private backend)
+        """
+        self.stats = {"hits": 0, "misses": 0, "writes": 0}
+        self._lock = threading.Lock()
+        
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        
+        # Other replicas write to the same file; wait for their locks instead of failing
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=10.0)
+        with self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS state ("
+                " namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL,"
+                " expires_at REAL, PRIMARY KEY (namespace, key))"
+            )
+            self._db.execute("DELETE FROM state WHERE expires_at <= ?", (time.time(),))
+    
+    def get(self, namespace, key):
+        """
+        Look up a value
+        
+        Args:
+            namespace (str): Kind of state, e.g. 'documents' or 'sessions'
+            key (str): Key within the namespace
+        
+        Returns:
+            Value stored under the key, or None if missing or expired
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value FROM state WHERE namespace = ? AND key = ?"
+                " AND (expires_at IS NULL OR expires_at > ?)",
+                (namespace, key, time.time())
+            ).fetchone()
+            self.stats["hits" if row else "misses"] += 1
+        return json.loads(row[0]) if row else None
+    
+    def set(self, namespace, key, value, expires_at=None):
+        """
+        Store a value
+        
+        Args:
+            namespace (str): Kind of state
+            key (str): Key within the namespace
+            value: JSON-serializable value
+            expires_at (float): Unix time after which the value is ignored
+        """
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO state (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                (namespace, key, json.dumps(value), expires_at)
+            )
+            self.stats["writes"] += 1
+    
+    def delete(self, namespace, key):
+        """
+        Remove a value
+        
+        Args:
+            namespace (str): Kind of state
+            key (str): Key within the namespace
+        """
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM state WHERE namespace = ? AND key = ?", (namespace, key))
+
+
+BACKENDS = {
+    "memory": MemoryStateBackend,
+    "sqlite": SQLiteStateBackend
+}
+
+
+def get_state_backend():
+    """
+    Get the process-wide state backend selected by STATE_BACKEND
+    
+    Returns:
+        MemoryStateBackend | SQLiteStateBackend: Backend shared by all sessions
+    
+    Raises:
+        ValueError: If STATE_BACKEND names no known backend
+    """
+    global _backend
+    
+    with _backend_lock:
+        if _backend is None:
+            if STATE_BACKEND not in BACKENDS:
+                raise ValueError(f"Unknown STATE_BACKEND {STATE_BACKEND!r}; use one of {', '.join(BACKENDS)}")
+            _backend = BACKENDS[STATE_BACKEND]()
+        return _backend
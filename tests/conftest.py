@@ -0,0 +1,19 @@
+"""
+Shared pytest setup: offline backend and throwaway stores
+"""
+import os
+import tempfile
+
+# config reads the environment at import time, so this runs before any app module loads
+_workdir = tempfile.mkdtemp(prefix="draco-tests-")
+os.environ.setdefault("GEMINI_API_KEY", "test")
+os.environ["GEMINI_BACKEND"] = "fake"
+os.environ["APP_PASSWORD"] = "test-password"
+os.environ["METRICS_PORT"] = "0"
+for name, file_name in (
+    ("RESPONSE_CACHE_PATH", "response_cache.sqlite3"),
+    ("CONVERSATION_STORE_PATH", "conversations.sqlite3"),
+    ("EXTRACTION_CACHE_PATH", "extractions.sqlite3"),
+    ("STATE_BACKEND_PATH", "state.sqlite3")
+):
+    os.environ[name] = os.path.join(_workdir, file_name)
@@ -0,0 +1,101 @@
+"""
+BatchReviewer: Batch API results, metadata mapping and the per-item fallback
+"""
+import re
+import time
+
+from ai_service import GeminiService
+from batch_review import BatchReviewer
+from fake_gemini import FakeGeminiClient, _response
+from resilience import ResilientCaller
+
+
+DOCUMENTS = [(f"doc-{index}.pdf", b"%PDF-1.4 " + bytes([index]) * 64) for index in range(4)]
+SETTINGS = {"jurisdiction": "Greece", "specialty": "Criminal Law", "analysis_depth": "Quick Review"}
+
+
+def echo_document_name(client):
+    """Answer each request with the document name from its prompt"""
+    def answer(contents, config):
+        name = re.search(r"doc-\d+\.pdf", contents[0].parts[-1].text).group(0)
+        return _response(f"Analysis of {name}", None)
+    
+    client.models._answer = answer
+
+
+def run_review(client, **options):
+    service = GeminiService(client)
+    # Own limiter, so the fallback calls do not drain the process-wide budget
+    service.resilience = ResilientCaller()
+    reviewer = BatchReviewer(service, poll_seconds=0.01, workers=2, **options)
+    review = reviewer.start("owner", DOCUMENTS, SETTINGS, "en")
+    deadline = time.monotonic() + 10
+    while not review.done and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert review.done
+    return review
+
+
+def assert_each_document_answered(review):
+    assert review.state == "done"
+    for row in review.rows():
+        assert row["status"] == "done"
+        assert row["analysis"] == f"Analysis of {row['document']}"
+
+
+def test_batch_api_answers_every_document():
+    client = FakeGeminiClient()
+    echo_document_name(client)
+    
+    review = run_review(client)
+    
+    assert review.backend == "batch"
+    assert_each_document_answered(review)
+    # Every document was answered inside the batch job, none interactively
+    assert len(client.models.calls) == len(DOCUMENTS)
+
+
+def test_responses_are_mapped_back_by_metadata_index():
+    client = FakeGeminiClient()
+    client.batches.reverse_order = True
+    echo_document_name(client)
+    
+    review = run_review(client)
+    
+    assert review.backend == "batch"
+    assert_each_document_answered(review)
+
+
+def test_failed_batch_job_falls_back_to_per_item_calls():
+    client = FakeGeminiClient()
+    client.batches.fail_jobs = True
+    echo_document_name(client)
+    
+    review = run_review(client)
+    
+    assert review.backend == "batch+threads"
+    assert_each_document_answered(review)
+    assert len(client.models.calls) == len(DOCUMENTS)
+
+
+def test_timed_out_batch_job_is_cancelled_and_falls_back():
+    client = FakeGeminiClient()
+    client.batches.stall_jobs = True
+    echo_document_name(client)
+    
+    review = run_review(client, batch_timeout=0.05)
+    
+    assert review.backend == "batch+threads"
+    assert client.batches.cancelled == [review.batch_name]
+    assert_each_document_answered(review)
+
+
+def test_unavailable_batch_api_uses_threads():
+    client = FakeGeminiClient()
+    client.batches.available = False
+    echo_document_name(client)
+    
+    review = run_review(client)
+    
+    assert review.backend == "threads"
+    assert_each_document_answered(review)
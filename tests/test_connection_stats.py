@@ -0,0 +1,85 @@
+"""
+Connection accounting of the shared client's HTTP transport
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+import ai_service
+from ai_service import _CountingTransport
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    barrier = None
+    
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+    
+    def do_GET(self):
+        if self.barrier is not None:
+            # Hold the first requests so they need connections of their own
+            try:
+                self.barrier.wait(timeout=2)
+            except threading.BrokenBarrierError:
+                pass
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+    
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+    server.connections = 0
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    KeepAliveHandler.barrier = None
+
+
+@pytest.fixture
+def stats(monkeypatch):
+    counters = {"created": 0, "reused": 0}
+    monkeypatch.setattr(ai_service, "_connection_stats", counters)
+    return counters
+
+
+def test_concurrent_requests_count_their_own_connections(server, stats):
+    url = f"http://127.0.0.1:{server.server_address[1]}/"
+    KeepAliveHandler.barrier = threading.Barrier(4)
+    
+    with httpx.Client(transport=_CountingTransport(limits=httpx.Limits(max_connections=4))) as client:
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            list(executor.map(lambda _: client.get(url), range(4)))
+        KeepAliveHandler.barrier = None
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            list(executor.map(lambda _: client.get(url), range(8)))
+    
+    assert stats["created"] + stats["reused"] == 12
+    assert stats["created"] == server.connections
+    assert stats["created"] >= 4
+
+
+def test_sequential_requests_reuse_one_connection(server, stats):
+    url = f"http://127.0.0.1:{server.server_address[1]}/"
+    seen = []
+    
+    with httpx.Client(transport=_CountingTransport()) as client:
+        for _ in range(3):
+            client.get(url, extensions={"trace": lambda name, info: seen.append(name)})
+    
+    assert stats == {"created": 1, "reused": 2}
+    # A caller's own trace callback still receives the events
+    assert "connection.connect_tcp.started" in seen
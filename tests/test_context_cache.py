@@ -0,0 +1,74 @@
+"""
+ContextCacheManager: reuse, LRU eviction and inline fallback
+"""
+from context_cache import ContextCacheManager, build_cache_key
+from fake_gemini import FakeGeminiClient
+
+
+def key(name):
+    return build_cache_key(f"prompt-{name}", model="fake-model")
+
+
+def test_same_key_reuses_cache():
+    client = FakeGeminiClient()
+    manager = ContextCacheManager(client, max_entries=4)
+    
+    first = manager.get(key("a"), "System prompt")
+    second = manager.get(key("a"), "System prompt")
+    
+    assert first == second
+    assert client.caches.create_count == 1
+    assert manager.stats["hits"] == 1
+
+
+def test_least_recently_used_cache_is_evicted_and_deleted():
+    client = FakeGeminiClient()
+    manager = ContextCacheManager(client, max_entries=2)
+    
+    name_a = manager.get(key("a"), "A")
+    name_b = manager.get(key("b"), "B")
+    # Touch A so that B is the least recently used
+    manager.get(key("a"), "A")
+    manager.get(key("c"), "C")
+    
+    assert manager.stats["evictions"] == 1
+    assert name_b not in client.caches.caches
+    assert name_a in client.caches.caches
+    assert manager.get(key("a"), "A") == name_a
+    assert client.caches.create_count == 3
+
+
+def test_evicted_key_is_created_again():
+    client = FakeGeminiClient()
+    manager = ContextCacheManager(client, max_entries=1)
+    
+    manager.get(key("a"), "A")
+    manager.get(key("b"), "B")
+    manager.get(key("a"), "A")
+    
+    assert client.caches.create_count == 3
+    assert len(client.caches.caches) == 1
+
+
+def test_unavailable_caching_falls_back_to_inline():
+    client = FakeGeminiClient()
+    client.caches.available = False
+    manager = ContextCacheManager(client)
+    
+    assert manager.get(key("a"), "A") is None
+    # Not retried until CONTEXT_CACHE_RETRY_SECONDS pass
+    client.caches.available = True
+    assert manager.get(key("a"), "A") is None
+    assert manager.stats["fallbacks"] == 2
+    assert client.caches.create_count == 0
+
+
+def test_clear_deletes_every_cache():
+    client = FakeGeminiClient()
+    manager = ContextCacheManager(client)
+    
+    manager.get(key("a"), "A")
+    manager.get(key("b"), "B")
+    manager.clear()
+    
+    assert client.caches.caches == {}
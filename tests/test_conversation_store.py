@@ -0,0 +1,46 @@
+"""
+ConversationStore: matters are private to the client that opened them
+"""
+import sqlite3
+
+import pytest
+
+from conversation_store import ConversationStore
+
+
+def test_owners_cannot_see_each_others_matters():
+    store = ConversationStore(":memory:")
+    alice = store.create_matter("client-a", "Appeal against the fraud conviction")
+    store.append_messages("client-a", alice, [{"role": "user", "content": "Privileged facts"}])
+    bob = store.create_matter("client-b", "Lease dispute")
+    
+    assert [matter["id"] for matter in store.list_matters("client-a")] == [alice]
+    assert [matter["id"] for matter in store.list_matters("client-b")] == [bob]
+    assert store.load_messages("client-b", alice) == []
+    assert store.load_messages("client-a", alice)[0]["content"] == "Privileged facts"
+
+
+def test_appending_to_another_owners_matter_is_refused():
+    store = ConversationStore(":memory:")
+    matter = store.create_matter("client-a", "Appeal")
+    
+    with pytest.raises(KeyError):
+        store.append_messages("client-b", matter, [{"role": "user", "content": "Injected"}])
+    
+    assert store.load_messages("client-a", matter) == []
+
+
+def test_matters_without_owner_are_hidden_after_upgrade(tmp_path):
+    path = str(tmp_path / "conversations.sqlite3")
+    with sqlite3.connect(path) as db:
+        db.execute(
+            "CREATE TABLE matters (id TEXT PRIMARY KEY, title TEXT NOT NULL,"
+            " created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+        db.execute("INSERT INTO matters VALUES ('old', 'Legacy matter', 0, 0)")
+    
+    store = ConversationStore(path)
+    
+    assert store.list_matters("client-a") == []
+    with pytest.raises(KeyError):
+        store.append_messages("client-a", "old", [{"role": "user", "content": "Hello"}])
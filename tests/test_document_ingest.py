@@ -0,0 +1,23 @@
+"""
+Document ingest: parallel parsing in spawned worker processes
+"""
+import document_ingest
+from benchmarks.common import make_case_bundle
+from document_ingest import ChunkStore, extract_chunks, ingest_documents
+from document_store import hash_document
+
+
+def test_pool_workers_are_spawned_not_forked():
+    assert document_ingest._get_executor()._mp_context.get_start_method() == "spawn"
+
+
+def test_several_documents_are_parsed_in_the_pool(monkeypatch):
+    monkeypatch.setattr(document_ingest, "chunk_store", ChunkStore())
+    documents = [(f"bundle-{index}.pdf", make_case_bundle(3, seed_topic=f"file {index}")) for index in range(2)]
+    
+    results = ingest_documents(documents)
+    
+    for name, data in documents:
+        doc_hash = hash_document(data)
+        assert results[doc_hash]["name"] == name
+        assert results[doc_hash]["chunks"] == extract_chunks(data, doc_hash)
@@ -0,0 +1,181 @@
+"""
+DocumentStore: upload once, reuse, and re-upload before the file expires
+"""
+import mmap
+import os
+import threading
+
+import pytest
+from google.genai import errors, types
+
+from ai_service import GeminiService, is_file_reference_error
+from config import DOCUMENT_REUPLOAD_MARGIN_SECONDS
+from document_store import BufferReader, DocumentStore, hash_document
+from fake_gemini import FakeGeminiClient, api_error, missing_file_error
+from resilience import ResilientCaller
+from state_backend import MemoryStateBackend
+
+
+PDF = b"%PDF-1.4 fake document body"
+
+
+def make_store(file_ttl_seconds=48 * 3600):
+    client = FakeGeminiClient(file_ttl_seconds=file_ttl_seconds)
+    return DocumentStore(client, backend=MemoryStateBackend()), client
+
+
+def test_same_document_is_uploaded_once():
+    store, client = make_store()
+    
+    first = store.get_part(PDF, display_name="a.pdf")
+    second = store.get_part(PDF, display_name="a.pdf")
+    
+    assert first.file_data.file_uri == second.file_data.file_uri
+    assert client.files.upload_count == 1
+    assert store.stats == {"uploads": 1, "reuses": 1, "reuploads": 0}
+
+
+def test_precomputed_digest_matches_content_hash():
+    store, client = make_store()
+    
+    store.get_file(PDF)
+    store.get_file(PDF, digest=hash_document(PDF))
+    
+    assert client.files.upload_count == 1
+
+
+def test_distinct_documents_are_uploaded_separately():
+    store, client = make_store()
+    
+    store.get_file(PDF)
+    store.get_file(PDF + b" second")
+    
+    assert client.files.upload_count == 2
+
+
+def test_file_inside_reupload_margin_is_uploaded_again():
+    # Files expire before the margin runs out, so every lookup finds them expiring
+    store, client = make_store(file_ttl_seconds=DOCUMENT_REUPLOAD_MARGIN_SECONDS - 60)
+    
+    first = store.get_file(PDF)
+    second = store.get_file(PDF)
+    
+    assert first["name"] != second["name"]
+    assert client.files.upload_count == 2
+    assert store.stats["reuploads"] == 1
+    assert store.stats["reuses"] == 0
+
+
+def test_invalidate_deletes_remote_file_and_forces_upload():
+    store, client = make_store()
+    
+    entry = store.get_file(PDF)
+    store.invalidate(entry["digest"])
+    
+    assert entry["name"] not in client.files.files
+    store.get_file(PDF)
+    assert client.files.upload_count == 2
+
+
+def test_concurrent_sessions_share_one_upload():
+    store, client = make_store()
+    barrier = threading.Barrier(8)
+    names = []
+    
+    def session():
+        barrier.wait()
+        names.append(store.get_file(PDF)["name"])
+    
+    threads = [threading.Thread(target=session) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert client.files.upload_count == 1
+    assert len(set(names)) == 1
+
+
+def test_stores_share_entries_through_backend():
+    client = FakeGeminiClient()
+    backend = MemoryStateBackend()
+    
+    DocumentStore(client, backend=backend).get_file(PDF)
+    DocumentStore(client, backend=backend).get_file(PDF)
+    
+    assert client.files.upload_count == 1
+
+
+def test_buffer_reader_reads_chunks_and_reports_size():
+    reader = BufferReader(memoryview(PDF))
+    
+    # The Files API measures the upload by seeking to the end
+    assert reader.seek(0, os.SEEK_END) == len(PDF)
+    reader.seek(0)
+    chunks = iter(lambda: reader.read(5), b"")
+    
+    assert b"".join(chunks) == PDF
+    assert reader.tell() == len(PDF)
+
+
+def test_memory_mapped_document_is_uploaded_from_its_view():
+    store, client = make_store()
+    mapped = mmap.mmap(-1, len(PDF))
+    mapped.write(PDF)
+    
+    entry = store.get_file(memoryview(mapped))
+    
+    assert client.files.files[entry["name"]]["data"] == PDF
+    # The upload released its view, so the mapping can be closed
+    mapped.close()
+
+
+def service_with_dead_file():
+    """Service whose uploaded document was deleted behind the registry's back"""
+    client = FakeGeminiClient("Answer about the document.")
+    service = GeminiService(client)
+    service.documents = DocumentStore(client, backend=MemoryStateBackend())
+    service.resilience = ResilientCaller()
+    part = service.document_part(PDF, "a.pdf")
+    client.files.delete(name=service.documents.get_file(PDF)["name"])
+    contents = [types.Content(role="user", parts=[part, types.Part.from_text(text="Summarize")])]
+    return service, client, part, contents
+
+
+def test_rejected_file_is_reuploaded_and_request_retried():
+    service, client, dead_part, contents = service_with_dead_file()
+    
+    answer = "".join(service.stream_response(contents, "System prompt"))
+    
+    assert answer == "Answer about the document."
+    assert client.files.upload_count == 2
+    sent_uri = client.models.calls[-1]["contents"][0]["parts"][0].file_data.file_uri
+    assert sent_uri != dead_part.file_data.file_uri
+    # The registry no longer hands out the dead reference
+    assert service.documents.get_file(PDF)["uri"] == sent_uri
+
+
+def test_generate_response_recovers_from_rejected_file():
+    service, client, _, contents = service_with_dead_file()
+    
+    assert service.generate_response(contents, "System prompt") == "Answer about the document."
+    assert client.files.upload_count == 2
+
+
+def test_file_error_for_unknown_document_is_raised():
+    client = FakeGeminiClient()
+    service = GeminiService(client)
+    service.resilience = ResilientCaller()
+    contents = [{"role": "user", "parts": [types.Part.from_uri(
+        file_uri="https://fake.invalid/v1beta/files/unknown", mime_type="application/pdf"
+    )]}]
+    
+    with pytest.raises(errors.ClientError):
+        service.generate_response(contents, "System prompt")
+    assert client.files.upload_count == 0
+
+
+def test_only_file_reference_errors_trigger_reupload():
+    assert is_file_reference_error(missing_file_error("https://fake.invalid/v1beta/files/fake-1"))
+    assert not is_file_reference_error(api_error(400))
+    assert not is_file_reference_error(api_error(503))
@@ -0,0 +1,61 @@
+"""
+Fake client: async calls overlap instead of blocking the event loop
+"""
+import asyncio
+import time
+
+import pytest
+
+from ai_service import AsyncGeminiService
+from fake_gemini import FakeGeminiClient
+
+
+def test_async_calls_run_concurrently():
+    client = FakeGeminiClient(latency=0.2)
+    
+    async def three_calls():
+        return await asyncio.gather(*(
+            client.aio.models.generate_content(model="fake", contents="question") for _ in range(3)
+        ))
+    
+    start = time.perf_counter()
+    responses = asyncio.run(three_calls())
+    
+    assert time.perf_counter() - start < 0.45
+    assert [response.text for response in responses] == ["Fake response."] * 3
+    assert len(client.models.calls) == 3
+
+
+def test_async_stream_yields_whole_text():
+    client = FakeGeminiClient(response_text="Streamed answer text", chunk_size=5, chunk_interval=0.01)
+    
+    async def collect():
+        stream = await client.aio.models.generate_content_stream(model="fake", contents="question")
+        return [chunk.text async for chunk in stream]
+    
+    assert "".join(asyncio.run(collect())) == "Streamed answer text"
+
+
+def test_async_injected_failure_raises():
+    client = FakeGeminiClient()
+    client.models.failures.append(400)
+    
+    with pytest.raises(Exception):
+        asyncio.run(client.aio.models.generate_content(model="fake", contents="question"))
+    assert client.models.calls == []
+
+
+def test_compare_branches_overlap():
+    service = AsyncGeminiService(FakeGeminiClient(latency=0.2))
+    
+    start = time.perf_counter()
+    results = asyncio.run(service.compare_jurisdictions(
+        [{"role": "user", "parts": [{"text": "question"}]}],
+        {"Greece": "Greek law", "Cyprus": "Cypriot law", "EU": "EU law"},
+        max_concurrency=3
+    ))
+    wall = time.perf_counter() - start
+    
+    assert wall < 0.45
+    assert all(result["error"] is None for result in results.values())
+    assert all(result["latency"] < 0.45 for result in results.values())
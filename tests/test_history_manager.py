@@ -0,0 +1,172 @@
+"""
+History: incremental conversion, budget split, summaries and batched token counts
+"""
+import time
+
+from google.genai import types
+
+from ai_service import GeminiService
+from config import HISTORY_MIN_RECENT_MESSAGES, HISTORY_SUMMARY_BLOCK
+from fake_gemini import FakeGeminiClient, api_error
+from history_manager import ConversationHistoryCache, HistoryManager, content_text, estimate_tokens
+from resilience import ResilientCaller
+
+
+def message(index):
+    return {"role": "user" if index % 2 == 0 else "assistant", "content": f"Message {index} " + "word " * 40}
+
+
+def to_content(msg):
+    return types.Content(role="user" if msg["role"] == "user" else "model", parts=[types.Part.from_text(text=msg["content"])])
+
+
+def make_contents(count):
+    return [to_content(message(index)) for index in range(count)]
+
+
+class CountingConverter:
+    def __init__(self):
+        self.converted = 0
+    
+    def __call__(self, msg):
+        self.converted += 1
+        return to_content(msg)
+
+
+def make_service(client=None):
+    service = GeminiService(client or FakeGeminiClient())
+    # Own limiter and breaker, so the counting calls do not touch the process-wide ones
+    service.resilience = ResilientCaller(max_attempts=1)
+    return service
+
+
+def count_requests(client, monkeypatch):
+    requests = []
+    original = client.models.count_tokens
+    monkeypatch.setattr(
+        client.models, "count_tokens",
+        lambda model, contents, config=None: requests.append(len(contents)) or original(model, contents, config)
+    )
+    return requests
+
+
+def test_history_cache_converts_only_new_messages():
+    cache = ConversationHistoryCache()
+    convert = CountingConverter()
+    messages = [message(index) for index in range(4)]
+    
+    cache.build(messages, convert)
+    messages.append(message(4))
+    contents = cache.build(messages, convert)
+    
+    assert convert.converted == 5
+    assert [content_text(content) for content in contents] == [msg["content"] for msg in messages]
+
+
+def test_history_cache_rebuilds_after_an_edit():
+    cache = ConversationHistoryCache()
+    convert = CountingConverter()
+    messages = [message(index) for index in range(4)]
+    cache.build(messages, convert)
+    
+    messages[1] = dict(messages[1], content="Edited answer")
+    contents = cache.build(messages, convert)
+    
+    assert convert.converted == 8
+    assert content_text(contents[1]) == "Edited answer"
+
+
+def test_history_cache_rebuilds_for_a_shorter_transcript():
+    cache = ConversationHistoryCache()
+    convert = CountingConverter()
+    messages = [message(index) for index in range(4)]
+    cache.build(messages, convert)
+    
+    contents = cache.build(messages[:2], convert)
+    
+    assert len(contents) == 2
+    assert convert.converted == 6
+
+
+def test_history_within_budget_is_sent_verbatim():
+    contents = make_contents(6)
+    
+    assert HistoryManager(token_budget=100000).apply(contents, make_service()) == contents
+
+
+def test_split_keeps_recent_contents_within_budget():
+    contents = make_contents(20)
+    per_content = estimate_tokens(content_text(contents[-1]))
+    manager = HistoryManager(token_budget=per_content * 5)
+    
+    split = manager._split_index(contents, make_service())
+    
+    assert 20 - split in (5, 6)
+
+
+def test_split_keeps_minimum_recent_messages_over_budget():
+    contents = make_contents(10)
+    
+    split = HistoryManager(token_budget=1)._split_index(contents, make_service())
+    
+    assert len(contents) - split == HISTORY_MIN_RECENT_MESSAGES
+
+
+def test_old_contents_are_folded_into_a_summary_block():
+    client = FakeGeminiClient("Summary text")
+    contents = make_contents(HISTORY_SUMMARY_BLOCK + HISTORY_MIN_RECENT_MESSAGES + 1)
+    manager = HistoryManager(token_budget=1)
+    service = make_service(client)
+    
+    first = manager.apply(contents, service)
+    deadline = time.monotonic() + 5
+    while manager._pending is not None and not manager._pending["future"].done() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    second = manager.apply(contents, service)
+    
+    # Sent verbatim until the background summary is ready
+    assert first == contents
+    assert content_text(second[0]) == "Summary of the earlier conversation:\nSummary text"
+    assert second[1:] == contents[HISTORY_SUMMARY_BLOCK:]
+
+
+def test_new_contents_are_counted_in_one_request(monkeypatch):
+    client = FakeGeminiClient()
+    service = make_service(client)
+    requests = count_requests(client, monkeypatch)
+    manager = HistoryManager(token_budget=100000)
+    contents = make_contents(30)
+    
+    manager.apply(contents, service)
+    manager.apply(contents + [to_content(message(30)), to_content(message(31))], service)
+    
+    # A reopened matter is counted at once; a later turn only sends its new contents
+    assert requests == [30, 2]
+    assert "count_tokens" in service.resilience.latencies
+
+
+def test_only_contents_within_reach_of_the_budget_are_counted(monkeypatch):
+    client = FakeGeminiClient()
+    service = make_service(client)
+    requests = count_requests(client, monkeypatch)
+    contents = make_contents(40)
+    per_content = estimate_tokens(content_text(contents[-1]))
+    
+    HistoryManager(token_budget=per_content * 5)._split_index(contents, service)
+    
+    assert len(requests) == 1
+    assert requests[0] < 10
+
+
+def test_count_failure_falls_back_to_estimates(monkeypatch):
+    client = FakeGeminiClient()
+    service = make_service(client)
+    
+    def fail(model, contents, config=None):
+        raise api_error(503)
+    
+    monkeypatch.setattr(client.models, "count_tokens", fail)
+    contents = make_contents(3)
+    
+    assert service.count_contents_tokens(contents) == [estimate_tokens(content_text(c)) for c in contents]
+    assert service.resilience.metrics["failures"] == 1
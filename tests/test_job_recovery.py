@@ -0,0 +1,71 @@
+"""
+Answers streamed by a script run that gets interrupted are recovered on the next run
+"""
+import os
+import time
+
+import pytest
+from streamlit.testing.v1 import AppTest
+
+import ai_service
+from fake_gemini import FakeGeminiClient
+from jobs import get_job_queue
+from tracing import tracer
+
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+ANSWER = "Recovered answer text. " * 8
+
+
+@pytest.fixture
+def slow_client(monkeypatch):
+    # About 2 s of streaming, so a short script-run timeout stops the stream midway
+    client = FakeGeminiClient(ANSWER, chunk_size=8, chunk_interval=0.08)
+    monkeypatch.setattr(ai_service, "_client", client)
+    return client
+
+
+def logged_in_app(client_id):
+    app = AppTest.from_file(APP_PATH, default_timeout=30)
+    app.query_params["client"] = client_id
+    app.run()
+    app.text_input[0].input(os.environ["APP_PASSWORD"])
+    next(button for button in app.button if button.label == "Log In").click().run()
+    assert not app.exception
+    return app
+
+
+def wait_for_job(owner, timeout=10.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        jobs = get_job_queue().jobs_for(owner)
+        if jobs and jobs[0].done:
+            return jobs[0]
+        time.sleep(0.05)
+    raise AssertionError("job did not finish")
+
+
+def test_stream_stopped_by_rerun_is_recovered(slow_client):
+    app = logged_in_app("recovery-test")
+    
+    app.chat_input[0].set_value("Is the limitation period over? (recovery)")
+    with pytest.raises(RuntimeError):
+        # Timing out stops the script run mid-stream, as a refresh or rerun does
+        app.run(timeout=0.5)
+    
+    job = wait_for_job("recovery-test")
+    assert job.text == ANSWER
+    
+    app.run()
+    
+    assert not app.exception
+    messages = [(message["role"], message["content"]) for message in app.session_state.messages]
+    assert messages[-2:] == [("user", "Is the limitation period over? (recovery)"), ("assistant", ANSWER)]
+    assert get_job_queue().jobs_for("recovery-test") == []
+    
+    # Finished like an uninterrupted turn: trace closed and answer cached
+    turn = job.context["turn"]
+    assert "finished_at" in turn
+    assert turn["id"] in [recent["id"] for recent in tracer.recent_turns()]
+    response_cache, response_key = job.context["cache_entry"]
+    assert response_cache.get(response_key, "Is the limitation period over? (recovery)") == ANSWER
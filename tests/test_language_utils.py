@@ -0,0 +1,57 @@
+"""
+Language detection: Greek, English, mixed, empty and sampled texts
+"""
+import pytest
+
+from config import LANGUAGE_SAMPLE_CHARS
+from language_utils import detect_language, language_ratios
+
+
+GREEK_TEXT = "Η προθεσμία παραγραφής για την απάτη αρχίζει από την τέλεση της πράξης. "
+ENGLISH_TEXT = "The limitation period for fraud runs from the commission of the offence. "
+
+
+def test_greek_text_is_detected_as_greek():
+    assert detect_language(GREEK_TEXT) == "el"
+
+
+def test_english_text_is_detected_as_english():
+    assert detect_language(ENGLISH_TEXT) == "en"
+
+
+def test_mixed_text_above_threshold_is_greek():
+    # Greek question quoting an English clause
+    assert detect_language(GREEK_TEXT + ENGLISH_TEXT) == "el"
+    assert detect_language(GREEK_TEXT + ENGLISH_TEXT * 4) == "en"
+
+
+@pytest.mark.parametrize("text", ["", None, "386 / 2024 - §§ 1-3"])
+def test_text_without_letters_defaults_to_english(text):
+    assert detect_language(text) == "en"
+
+
+def test_ratios_of_single_script_texts():
+    assert language_ratios(GREEK_TEXT) == {"el": 1.0, "en": 0.0, "other": 0.0}
+    assert language_ratios(ENGLISH_TEXT) == {"el": 0.0, "en": 1.0, "other": 0.0}
+
+
+def test_ratios_of_mixed_text_sum_to_one():
+    ratios = language_ratios("Καλημέρα hello привет")
+    
+    assert ratios["el"] == pytest.approx(8 / 19)
+    assert ratios["en"] == pytest.approx(5 / 19)
+    assert ratios["other"] == pytest.approx(6 / 19)
+    assert sum(ratios.values()) == pytest.approx(1.0)
+
+
+@pytest.mark.parametrize("text", ["", None, "12 + 34 = 46"])
+def test_ratios_of_text_without_letters_are_zero(text):
+    assert language_ratios(text) == {"el": 0.0, "en": 0.0, "other": 0.0}
+
+
+def test_long_text_is_sampled_across_its_length():
+    # An English preamble followed by a long Greek body
+    text = ENGLISH_TEXT * 10 + GREEK_TEXT * (4 * LANGUAGE_SAMPLE_CHARS // len(GREEK_TEXT))
+    
+    assert detect_language(text) == "el"
+    assert language_ratios(text)["el"] > 0.9
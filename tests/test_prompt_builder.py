@@ -0,0 +1,36 @@
+"""
+System prompts: bilingual instruction and memoized rendering
+"""
+from prompt_builder import (
+    BILINGUAL_TEMPLATES, build_complete_system_prompt_with_hash, is_bilingual
+)
+
+
+SETTINGS = {"analysis_depth": "Standard Analysis", "focus_area": [], "uploaded_files": []}
+
+
+def test_mixed_prompt_is_bilingual():
+    assert is_bilingual("Ποια είναι η προθεσμία για the limitation period under art. 386?")
+
+
+def test_single_language_or_empty_prompt_is_not_bilingual():
+    assert not is_bilingual("Ποια είναι η προθεσμία παραγραφής για την απάτη του άρθρου 386 ΠΚ;")
+    assert not is_bilingual("What is the limitation period for fraud under art. 386 PC?")
+    # A single English term in a Greek question stays below the threshold
+    assert not is_bilingual("Ποια είναι η προθεσμία παραγραφής για την απάτη (fraud) του άρθρου 386;")
+    assert not is_bilingual("")
+
+
+def test_bilingual_prompt_adds_instruction_with_its_own_hash():
+    plain, plain_hash = build_complete_system_prompt_with_hash("Greek", "Criminal Law", SETTINGS, "el")
+    bilingual, bilingual_hash = build_complete_system_prompt_with_hash(
+        "Greek", "Criminal Law", SETTINGS, "el", bilingual=True
+    )
+    
+    assert BILINGUAL_TEMPLATES["el"] not in plain
+    assert bilingual == plain + BILINGUAL_TEMPLATES["el"]
+    assert bilingual_hash != plain_hash
+    # Memoized per settings combination, bilingual flag included
+    assert build_complete_system_prompt_with_hash(
+        "Greek", "Criminal Law", SETTINGS, "el", bilingual=True
+    )[0] is bilingual
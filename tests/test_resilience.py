@@ -0,0 +1,185 @@
+"""
+ResilientCaller: circuit breaker states, per-kind latency windows and hedging
+"""
+import threading
+import time
+
+import pytest
+
+import ai_service
+from ai_service import GeminiService
+from config import HEDGE_MIN_SAMPLES
+from fake_gemini import FakeGeminiClient, api_error
+from resilience import CircuitBreaker, CircuitOpenError, ResilientCaller, TokenBucket
+
+
+def make_caller(**kwargs):
+    return ResilientCaller(
+        limiter=TokenBucket(rate=1000, capacity=1000),
+        breaker=kwargs.pop("breaker", CircuitBreaker(failure_threshold=2, reset_seconds=0.1)),
+        base_delay=0.0,
+        max_delay=0.0,
+        **kwargs
+    )
+
+
+def open_breaker(breaker):
+    for _ in range(breaker.failure_threshold):
+        breaker.before_call()
+        breaker.record_failure()
+    assert breaker.state == "open"
+
+
+def test_breaker_opens_after_threshold_and_rejects():
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=60)
+    open_breaker(breaker)
+    
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_half_open_lets_exactly_one_probe_through():
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=0.05)
+    open_breaker(breaker)
+    time.sleep(0.06)
+    
+    assert breaker.before_call() is True
+    assert breaker.state == "half_open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.before_call() is False
+
+
+def test_failed_probe_reopens_circuit():
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=0.05)
+    open_breaker(breaker)
+    time.sleep(0.06)
+    
+    breaker.before_call()
+    breaker.record_failure()
+    
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_concurrent_callers_send_one_probe():
+    caller = make_caller()
+    client = FakeGeminiClient(latency=0.2)
+    open_breaker(caller.breaker)
+    time.sleep(0.11)
+    
+    outcomes = []
+    
+    def session():
+        try:
+            caller.call(lambda: client.models.generate_content(model="fake", contents="question"))
+            outcomes.append("answered")
+        except CircuitOpenError:
+            outcomes.append("rejected")
+    
+    threads = [threading.Thread(target=session) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert sorted(outcomes) == ["answered"] + ["rejected"] * 5
+    assert len(client.models.calls) == 1
+    assert caller.breaker.state == "closed"
+
+
+def test_non_retryable_probe_frees_the_next_probe():
+    caller = make_caller()
+    open_breaker(caller.breaker)
+    time.sleep(0.11)
+    
+    def bad_request():
+        raise api_error(400)
+    
+    with pytest.raises(Exception):
+        caller.call(bad_request)
+    
+    assert caller.breaker.state == "half_open"
+    result, _ = caller.call(lambda: "ok")
+    assert result == "ok"
+    assert caller.breaker.state == "closed"
+
+
+def test_retryable_failures_are_retried_then_open_the_circuit():
+    caller = make_caller(max_attempts=3)
+    client = FakeGeminiClient()
+    client.models.failures.extend([503, 503])
+    
+    with pytest.raises(Exception):
+        caller.call(lambda: client.models.generate_content(model="fake", contents="question"))
+    
+    assert caller.breaker.state == "open"
+    assert caller.snapshot()["circuit_rejections"] == 1
+
+
+def test_latency_windows_are_kept_per_kind():
+    caller = make_caller()
+    
+    for _ in range(HEDGE_MIN_SAMPLES):
+        caller.call(lambda: time.sleep(0.01), kind="summary")
+    
+    assert caller.latencies["summary"].percentile(0.95) >= 0.01
+    assert caller.latencies["stream_open"].percentile(0.95) is None
+
+
+def test_slow_call_is_hedged_and_backup_wins():
+    caller = make_caller()
+    for _ in range(HEDGE_MIN_SAMPLES):
+        caller.latencies["generate"].record(0.02)
+    delays = iter([1.0, 0.0])
+    
+    def call():
+        time.sleep(next(delays))
+        return "answer"
+    
+    start = time.perf_counter()
+    result, metrics = caller.call(call, hedge=True)
+    
+    assert result == "answer"
+    assert time.perf_counter() - start < 0.5
+    assert metrics["hedged"] and metrics.get("hedge_won")
+
+
+def test_chat_stream_open_is_hedged_and_loser_closed(monkeypatch):
+    monkeypatch.setattr(ai_service, "HEDGING_ENABLED", True)
+    client = FakeGeminiClient("Hedged streamed answer", chunk_size=4)
+    service = GeminiService(client)
+    service.resilience = make_caller()
+    for _ in range(HEDGE_MIN_SAMPLES):
+        service.resilience.latencies["stream_open"].record(0.02)
+    
+    opened = []
+    original = client.models.generate_content_stream
+    delays = iter([0.6, 0.0])
+    
+    def generate_content_stream(model, contents, config=None):
+        delay = next(delays)
+        
+        def stream():
+            time.sleep(delay)
+            try:
+                yield from original(model, contents, config)
+            finally:
+                opened.append(delay)
+        
+        return stream()
+    
+    monkeypatch.setattr(client.models, "generate_content_stream", generate_content_stream)
+    
+    text = "".join(service.stream_response([{"role": "user", "parts": [{"text": "q"}]}], "System"))
+    time.sleep(0.8)
+    
+    assert text == "Hedged streamed answer"
+    assert service.last_turn_stats["hedged"]
+    assert service.last_turn_stats["time_to_first_token"] < 0.4
+    # Both streams were closed: the winner by exhaustion, the slow loser by the discard hook
+    assert sorted(opened) == [0.0, 0.6]
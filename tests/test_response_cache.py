@@ -0,0 +1,138 @@
+"""
+ResponseCache: hit counting and metrics export
+"""
+import sqlite3
+import time
+
+import numpy as np
+import pytest
+
+import response_cache
+from ai_service import GeminiService
+from config import MODEL_ROUTES
+from fake_gemini import FakeGeminiClient
+from response_cache import ResponseCache, build_response_key
+from tracing import tracer
+
+
+def test_snapshot_reports_hits_misses_and_rate():
+    cache = ResponseCache(":memory:")
+    
+    assert cache.get("prompt", "What is art. 386?") is None
+    cache.put("prompt", "What is art. 386?", "Fraud.")
+    assert cache.get("prompt", "what is ART. 386") == "Fraud."
+    cache.record_skip()
+    
+    snapshot = cache.snapshot()
+    assert snapshot["exact_hits"] == 1
+    assert snapshot["misses"] == 1
+    assert snapshot["skips"] == 1
+    assert snapshot["hit_rate"] == 0.5
+
+
+def test_semantic_hits_count_towards_hit_rate():
+    cache = ResponseCache(":memory:", similarity_threshold=0.5)
+    embed = lambda texts: [[1.0, 0.0] if "limitation" in text else [0.0, 1.0] for text in texts]
+    
+    cache.get("prompt", "limitation period for fraud", embed=embed)
+    cache.put("prompt", "limitation period for fraud", "Five years.")
+    
+    assert cache.get("prompt", "fraud limitation period?", embed=embed) == "Five years."
+    assert cache.snapshot()["semantic_hits"] == 1
+    assert cache.hit_rate() == 0.5
+
+
+def test_process_cache_is_exported_to_metrics(monkeypatch):
+    cache = ResponseCache(":memory:")
+    monkeypatch.setattr(response_cache, "_cache", cache)
+    cache.get("prompt", "question")
+    
+    assert tracer.collect()["response_cache"]["misses"] == 1
+    assert "draco_response_cache_hit_rate 0" in tracer.export_prometheus()
+
+
+def route_key(route):
+    service = GeminiService(FakeGeminiClient(), route=route)
+    return build_response_key("prompt", service.model, service.generation_settings())
+
+
+def test_key_depends_on_model_and_generation_limits():
+    route = {"name": "quick", "model": "model-a", "max_output_tokens": 2048, "thinking_budget": None}
+    
+    assert route_key(route) == route_key(dict(route, name="renamed"))
+    assert route_key(route) != route_key(dict(route, model="model-b"))
+    assert route_key(route) != route_key(dict(route, max_output_tokens=8192))
+    assert route_key(route) != route_key(dict(route, thinking_budget=0))
+
+
+def test_answer_is_not_served_on_another_route():
+    cache = ResponseCache(":memory:", similarity_threshold=0.5)
+    embed = lambda texts: [[1.0, 0.0] for _ in texts]
+    first, second = (route_key(route) for route in MODEL_ROUTES[:2])
+    
+    cache.get(first, "limitation period for fraud", embed=embed)
+    cache.put(first, "limitation period for fraud", "Five years.")
+    
+    assert cache.get(second, "limitation period for fraud", embed=embed) is None
+    assert cache.get(first, "limitation period for fraud") == "Five years."
+
+
+def test_embeddings_are_stored_as_unit_vectors():
+    cache = ResponseCache(":memory:")
+    
+    cache.get("prompt", "limitation period", embed=lambda texts: [[3.0, 4.0] for _ in texts])
+    cache.put("prompt", "limitation period", "Five years.")
+    
+    blob = cache._db.execute("SELECT embedding FROM responses").fetchone()[0]
+    assert np.frombuffer(blob, dtype=np.float32) == pytest.approx([0.6, 0.8])
+
+
+def test_similarity_picks_the_best_of_many_entries():
+    cache = ResponseCache(":memory:", similarity_threshold=0.9)
+    vectors = {f"question {index}": np.eye(50)[index] for index in range(50)}
+    embed = lambda texts: [vectors.get(text, np.eye(50)[20] + 0.01) for text in texts]
+    for text in vectors:
+        cache.get("prompt", text, embed=embed)
+        cache.put("prompt", text, f"answer to {text}")
+    
+    assert cache.get("prompt", "unseen question", embed=embed) == "answer to question 20"
+
+
+def test_similarity_scores_only_the_most_recent_candidates():
+    cache = ResponseCache(":memory:", similarity_threshold=0.9, max_candidates=1)
+    embed = lambda texts: [[1.0, 0.0] if "fraud" in text else [0.0, 1.0] for text in texts]
+    cache.get("prompt", "fraud limitation", embed=embed)
+    cache.put("prompt", "fraud limitation", "Five years.")
+    cache.get("prompt", "lease termination", embed=embed)
+    cache.put("prompt", "lease termination", "Three months.")
+    
+    assert cache.get("prompt", "fraud limitation period", embed=embed) is None
+    assert cache.get("prompt", "lease termination notice", embed=embed) == "Three months."
+
+
+def test_embedding_failure_is_counted_as_a_miss():
+    cache = ResponseCache(":memory:")
+    
+    def fail(texts):
+        raise RuntimeError("embedding service unavailable")
+    
+    assert cache.get("prompt", "question", embed=fail) is None
+    assert cache.snapshot()["embed_errors"] == 1
+    assert cache.snapshot()["misses"] == 1
+
+
+def test_embeddings_from_before_normalization_are_dropped(tmp_path):
+    path = str(tmp_path / "responses.sqlite3")
+    key = ResponseCache(path)._key("prompt", "question")
+    with sqlite3.connect(path) as db:
+        db.execute("PRAGMA user_version = 0")
+        db.execute(
+            "INSERT INTO responses VALUES (?, 'prompt', 'question', 'Answer.', ?, ?, ?)",
+            (key, np.array([3.0, 4.0], dtype=np.float32).tobytes(),
+             time.time(), time.time())
+        )
+    
+    cache = ResponseCache(path)
+    
+    assert cache._db.execute("SELECT embedding FROM responses").fetchone()[0] is None
+    assert cache.get("prompt", "question") == "Answer."
@@ -0,0 +1,114 @@
+"""
+Retrieval: fallbacks when nothing matches, batched and bounded embeddings
+"""
+import pytest
+from streamlit.runtime.uploaded_file_manager import UploadedFile, UploadedFileRec
+
+import retrieval
+from ai_service import GeminiService
+from attachment_cache import AttachmentCache
+from benchmarks.common import make_case_bundle, make_pdf
+from document_ingest import DocumentChunk
+from fake_gemini import FakeGeminiClient
+from retrieval import leading_chunks, retrieve
+
+
+def chunk(doc_hash, page, text):
+    return DocumentChunk(doc_hash, page, 0, len(text), text, f"{doc_hash}-{page}")
+
+
+CHUNKS = [
+    chunk("doc-a", 1, "The summons was served at the old address"),
+    chunk("doc-a", 2, "The bailiff report omits personal service"),
+    chunk("doc-a", 3, "Invoices and correspondence"),
+    chunk("doc-b", 1, "Lease agreement between the parties"),
+    chunk("doc-b", 2, "Rent arrears since January")
+]
+
+
+def upload(name, data):
+    return UploadedFile(UploadedFileRec(f"id-{name}", name, "application/pdf", data), None)
+
+
+def test_matching_query_ranks_by_bm25():
+    assert retrieve("bailiff personal service", CHUNKS, top_k=1) == [CHUNKS[1]]
+
+
+def test_unmatched_query_gets_leading_chunks_of_each_document():
+    passages = retrieve("Συνόψισε το έγγραφο", CHUNKS, top_k=3)
+    
+    assert passages == [CHUNKS[0], CHUNKS[3], CHUNKS[1]]
+
+
+def test_leading_chunks_stop_at_top_k_and_at_the_end():
+    assert leading_chunks(CHUNKS, top_k=10) == [CHUNKS[0], CHUNKS[3], CHUNKS[1], CHUNKS[4], CHUNKS[2]]
+    assert leading_chunks([], top_k=3) == []
+
+
+def test_passage_parts_never_drop_document_content():
+    service = GeminiService(FakeGeminiClient())
+    files = [upload("bundle.pdf", make_case_bundle(5))]
+    
+    parts = service.prepare_passage_parts("Συνόψισε το έγγραφο", files, "el", AttachmentCache())
+    
+    assert len(parts) == 1
+    assert "Page 1" in parts[0].text
+
+
+def test_document_without_text_is_sent_whole():
+    client = FakeGeminiClient()
+    service = GeminiService(client)
+    files = [upload("scan.pdf", make_pdf([""]))]
+    
+    parts = service.prepare_passage_parts("What does the scan say?", files, "en", AttachmentCache())
+    
+    assert len(parts) == 1
+    assert parts[0].file_data is not None
+    assert client.files.upload_count == 1
+
+
+def test_scanned_document_is_sent_whole_next_to_passages():
+    client = FakeGeminiClient()
+    service = GeminiService(client)
+    files = [upload("bundle.pdf", make_case_bundle(5)), upload("scan.pdf", make_pdf([""]))]
+    
+    parts = service.prepare_passage_parts("Was the summons served?", files, "en", AttachmentCache())
+    
+    assert len(parts) == 2
+    assert "bundle.pdf" in parts[0].text
+    assert parts[1].file_data is not None
+    assert client.files.upload_count == 1
+
+
+def test_chunk_embeddings_are_batched_through_the_limiter(monkeypatch):
+    pytest.importorskip("numpy")
+    monkeypatch.setattr(retrieval, "_embedding_cache", retrieval.OrderedDict())
+    client = FakeGeminiClient()
+    service = GeminiService(client)
+    requests = []
+    original = client.models.embed_content
+    monkeypatch.setattr(
+        client.models, "embed_content",
+        lambda model, contents, config=None: requests.append(len(contents)) or original(model, contents, config)
+    )
+    acquired = []
+    original_acquire = service.resilience.limiter.acquire
+    monkeypatch.setattr(service.resilience.limiter, "acquire", lambda: acquired.append(1) or original_acquire())
+    
+    retrieve("served summons", CHUNKS, top_k=2, embed=service.embed_texts, embedding_weight=0.5)
+    retrieve("served summons", CHUNKS, top_k=2, embed=service.embed_texts, embedding_weight=0.5)
+    
+    # One request for the five chunks, then only the query each time
+    assert requests == [1, 5, 1]
+    assert len(acquired) == 3
+
+
+def test_embedding_cache_is_bounded(monkeypatch):
+    pytest.importorskip("numpy")
+    monkeypatch.setattr(retrieval, "_embedding_cache", retrieval.OrderedDict())
+    monkeypatch.setattr(retrieval, "RETRIEVAL_EMBEDDING_CACHE_SIZE", 3)
+    embed = lambda texts: [[float(len(text)), 1.0] for text in texts]
+    
+    retrieve("summons", CHUNKS, embed=embed, embedding_weight=0.5)
+    
+    assert list(retrieval._embedding_cache) == [c.chunk_hash for c in CHUNKS[2:]]
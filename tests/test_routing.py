@@ -0,0 +1,125 @@
+"""
+Model routing: per-rule matches, the MODEL_ROUTES_JSON override, cost estimates and per-route metrics
+"""
+import importlib
+import json
+from types import SimpleNamespace
+
+import pytest
+from google.genai import types
+
+import ai_service
+import config
+from ai_service import AsyncGeminiService, DEFAULT_ROUTE, estimate_cost, route_request, run_async
+from fake_gemini import FakeGeminiClient
+from resilience import ResilientCaller
+from tracing import Tracer
+
+
+MB = 1024 * 1024
+
+
+def settings(depth="Standard Analysis", attachment_sizes=()):
+    return {
+        "analysis_depth": depth,
+        "uploaded_files": [SimpleNamespace(size=size) for size in attachment_sizes]
+    }
+
+
+def test_quick_review_without_attachments_uses_quick_route():
+    route = route_request(settings("Quick Review"), "Short question")
+    
+    assert route["name"] == "quick"
+    assert route["max_output_tokens"] == 2048
+
+
+@pytest.mark.parametrize("request_settings, prompt", [
+    (settings("Quick Review", [1024]), "Short question"),
+    (settings("Quick Review"), "x" * 2001)
+])
+def test_quick_route_requires_no_attachments_and_a_short_prompt(request_settings, prompt):
+    assert route_request(request_settings, prompt)["name"] == "standard"
+
+
+def test_deep_dive_uses_deep_route():
+    route = route_request(settings("Deep Dive", [20 * MB]), "Question")
+    
+    # Depth rule is listed first, so it wins over the bundle size
+    assert route["name"] == "deep"
+    assert route["model"] == config.GEMINI_DEEP_MODEL
+
+
+def test_large_bundle_uses_deep_model():
+    route = route_request(settings(attachment_sizes=[6 * MB, 5 * MB]), "Question")
+    
+    assert route["name"] == "large_bundle"
+    assert route["model"] == config.GEMINI_DEEP_MODEL
+
+
+def test_other_requests_use_standard_route():
+    route = route_request(settings(attachment_sizes=[MB]), "Question")
+    
+    assert route["name"] == "standard"
+    assert route["model"] == config.GEMINI_MODEL
+
+
+def test_history_bounds_and_default_fallback():
+    routes = [
+        {"name": "short", "when": {"max_history_messages": 4}, "model": "short-model"},
+        {"name": "long", "when": {"min_history_messages": 20}, "model": "long-model"}
+    ]
+    
+    assert route_request(settings(), "Question", 2, routes)["name"] == "short"
+    assert route_request(settings(), "Question", 30, routes)["name"] == "long"
+    assert route_request(settings(), "Question", 10, routes) is DEFAULT_ROUTE
+
+
+def test_model_routes_json_overrides_the_rules(monkeypatch):
+    override = [{"name": "everything", "when": {}, "model": "custom-model", "max_output_tokens": 1024}]
+    monkeypatch.setenv("MODEL_ROUTES_JSON", json.dumps(override))
+    try:
+        routes = importlib.reload(config).MODEL_ROUTES
+    finally:
+        monkeypatch.delenv("MODEL_ROUTES_JSON")
+        importlib.reload(config)
+    
+    assert routes == override
+    assert route_request(settings("Deep Dive"), "Question", routes=routes)["model"] == "custom-model"
+
+
+def test_estimate_cost_prices_cached_uncached_and_thinking_tokens():
+    usage = {
+        "prompt_token_count": 1_000_000,
+        "cached_content_token_count": 400_000,
+        "candidates_token_count": 100_000,
+        "thoughts_token_count": 100_000
+    }
+    prices = config.MODEL_PRICES["gemini-3-pro-preview"]
+    
+    cost = estimate_cost("gemini-3-pro-preview", usage)
+    
+    assert cost == pytest.approx(0.6 * prices["input"] + 0.4 * prices["cached_input"] + 0.2 * prices["output"])
+
+
+def test_estimate_cost_is_zero_for_unpriced_models_and_missing_usage():
+    assert estimate_cost("unknown-model", {"prompt_token_count": 1000}) == 0.0
+    assert estimate_cost("gemini-3-pro-preview", {}) == 0.0
+
+
+def test_comparison_branches_are_recorded_under_their_route(monkeypatch):
+    tracer = Tracer()
+    monkeypatch.setattr(ai_service, "tracer", tracer)
+    service = AsyncGeminiService(FakeGeminiClient("Answer"), route=route_request(settings("Deep Dive"), "Question"))
+    # Own limiter, so the branch calls do not drain the process-wide budget
+    service.resilience = ResilientCaller()
+    instructions = {"Greece": "Greek law", "Cyprus": "Cypriot law"}
+    
+    results = run_async(service.compare_jurisdictions(
+        [types.Content(role="user", parts=[types.Part.from_text(text="Question")])], instructions
+    ))
+    
+    assert tracer._counters["route_deep_requests_total"] == 2
+    assert tracer.stage_summary()["route_deep"]["count"] == 2
+    for result in results.values():
+        assert result["text"] == "Answer"
+        assert "prompt_token_count" in result["usage"]
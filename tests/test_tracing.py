@@ -0,0 +1,36 @@
+"""
+Metrics server: loopback binding and exported endpoints
+"""
+import json
+import urllib.request
+
+import pytest
+
+import tracing
+from tracing import tracer
+
+
+@pytest.fixture
+def metrics_server(monkeypatch):
+    monkeypatch.setattr(tracing, "_server", None)
+    tracing.start_metrics_server(0)
+    server = tracing._server
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_server_binds_loopback_by_default(metrics_server):
+    assert metrics_server.server_address[0] == "127.0.0.1"
+
+
+def test_server_exports_metrics_and_turns(metrics_server):
+    turn = tracer.start_turn(mode="chat")
+    tracer.finish_turn(turn, {"total_latency": 0.1})
+    base = f"http://127.0.0.1:{metrics_server.server_address[1]}"
+    
+    with urllib.request.urlopen(f"{base}/metrics") as response:
+        assert b"draco_stage_seconds" in response.read()
+    with urllib.request.urlopen(f"{base}/turns") as response:
+        turns = [json.loads(line) for line in response.read().decode("utf-8").splitlines()]
+    assert turns[-1]["id"] == turn["id"]
@@ -0,0 +1,40 @@
+"""
+Chat rendering: live streamed answers render the same as answers from history
+"""
+import os
+
+import pytest
+from streamlit.testing.v1 import AppTest
+
+import ai_service
+from fake_gemini import FakeGeminiClient
+from ui_components import display_markdown, display_stream
+
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+ANSWER = "The fee is $500 and the deposit \\$50, leaving $200 due."
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, len(ANSWER)])
+def test_stream_escaping_matches_whole_text(chunk_size):
+    chunks = [ANSWER[start:start + chunk_size] for start in range(0, len(ANSWER), chunk_size)]
+    
+    assert "".join(display_stream(chunks)) == display_markdown(ANSWER)
+
+
+def test_live_and_history_rendering_match(monkeypatch):
+    monkeypatch.setattr(ai_service, "_client", FakeGeminiClient(ANSWER, chunk_size=5))
+    app = AppTest.from_file(APP_PATH, default_timeout=30)
+    app.query_params["client"] = "render-test"
+    app.run()
+    app.text_input[0].input(os.environ["APP_PASSWORD"])
+    next(button for button in app.button if button.label == "Log In").click().run()
+    
+    app.chat_input[0].set_value("What do we owe? (render)").run()
+    live = app.chat_message[-1].markdown[-1].value
+    app.run()
+    from_history = app.chat_message[-1].markdown[-1].value
+    
+    assert not app.exception
+    assert live == from_history == display_markdown(ANSWER)
+    assert app.session_state.messages[-1]["content"] == ANSWER
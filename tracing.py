@@ -0,0 +1,308 @@
+"""
+Lightweight per-turn tracing with Prometheus-style and JSONL export
+"""
+import json
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from config import METRICS_HOST, METRICS_JSONL_PATH, METRICS_WINDOW
+
+
+USAGE_FIELDS = (
+    "prompt_token_count", "candidates_token_count", "cached_content_token_count",
+    "thoughts_token_count", "total_token_count"
+)
+
+
+def _percentile(ordered, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))]
+
+
+def usage_to_dict(usage_metadata):
+    """
+    Extract token counts from a response's usage metadata
+    
+    Args:
+        usage_metadata: ``usage_metadata`` of a Gemini response, or None
+        
+    Returns:
+        dict: Token counts by field name, zero where not reported
+    """
+    return {
+        field: (getattr(usage_metadata, field, None) or 0) if usage_metadata is not None else 0
+        for field in USAGE_FIELDS
+    }
+
+
+class Tracer:
+    """Collects span timings and token usage per turn and per stage"""
+    
+    def __init__(self, window=METRICS_WINDOW, jsonl_path=METRICS_JSONL_PATH):
+        """
+        Initialize the tracer
+        
+        Args:
+            window (int): Samples kept per stage for percentiles
+            jsonl_path (str): File finished turns are appended to, '' to disable
+        """
+        self.jsonl_path = jsonl_path
+        self._stages = defaultdict(lambda: deque(maxlen=window))
+        self._stage_totals = defaultdict(lambda: [0, 0.0])
+        self._tokens = defaultdict(int)
+        self._counters = defaultdict(float)
+        self._turns = deque(maxlen=100)
+        self._collectors = {}
+        self._lock = threading.Lock()
+    
+    def start_turn(self, **attributes):
+        """
+        Start a trace for one chat turn
+        
+        Args:
+            **attributes: Labels stored with the turn (e.g. mode)
+            
+        Returns:
+            dict: Turn record passed to span() and finish_turn()
+        """
+        return {
+            "id": uuid.uuid4().hex,
+            "started_at": time.time(),
+            "attributes": attributes,
+            "spans": {},
+            "tokens": {},
+            "stats": {}
+        }
+    
+    @contextmanager
+    def span(self, name, turn=None):
+        """
+        Time a block of code as a named stage
+        
+        Args:
+            name (str): Stage name
+            turn (dict): Turn record to attach the timing to
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, turn)
+    
+    def observe(self, name, seconds, turn=None):
+        """
+        Record a stage duration measured elsewhere
+        
+        Args:
+            name (str): Stage name
+            seconds (float): Duration in seconds
+            turn (dict): Turn record to attach the timing to
+        """
+        with self._lock:
+            self._stages[name].append(seconds)
+            totals = self._stage_totals[name]
+            totals[0] += 1
+            totals[1] += seconds
+            if turn is not None:
+                turn["spans"][name] = turn["spans"].get(name, 0.0) + seconds
+    
+    def record_usage(self, usage, turn=None):
+        """
+        Add token counts to the totals and the turn
+        
+        Args:
+            usage (dict): Token counts from usage_to_dict
+            turn (dict): Turn record to attach the counts to
+        """
+        with self._lock:
+            for field, count in usage.items():
+                self._tokens[field] += count
+                if turn is not None:
+                    turn["tokens"][field] = turn["tokens"].get(field, 0) + count
+    
+    def increment(self, name, value=1.0):
+        """
+        Increase a free-form counter
+        
+        Args:
+            name (str): Counter name
+            value (float): Amount to add
+        """
+        with self._lock:
+            self._counters[name] += value
+    
+    def finish_turn(self, turn, stats=None):
+        """
+        Close a turn, keeping it for inspection and appending it to the JSONL file
+        
+        Args:
+            turn (dict): Turn record
+            stats (dict): Per-turn measurements reported by the service
+        """
+        turn["finished_at"] = time.time()
+        turn["stats"] = {key: value for key, value in (stats or {}).items() if key != "usage"}
+        
+        with self._lock:
+            self._turns.append(turn)
+            if self.jsonl_path:
+                with open(self.jsonl_path, "a", encoding="utf-8") as handle:
+                    handle.write(json.dumps(turn, ensure_ascii=False, default=str) + "\n")
+    
+    def register_collector(self, name, collector):
+        """
+        Register a callable whose numeric results are exported as gauges
+        
+        Args:
+            name (str): Metric name prefix
+            collector (callable): Returns a dict of metric name to number
+        """
+        with self._lock:
+            self._collectors[name] = collector
+    
+    def collect(self):
+        """
+        Run the registered collectors
+        
+        Returns:
+            dict: Per collector name, its metrics (failed collectors are skipped)
+        """
+        with self._lock:
+            collectors = dict(self._collectors)
+        
+        results = {}
+        for prefix, collector in sorted(collectors.items()):
+            try:
+                results[prefix] = collector()
+            except Exception:
+                continue
+        return results
+    
+    def stage_summary(self):
+        """
+        Percentiles per stage over the recent window
+        
+        Returns:
+            dict: Per stage, 'count', 'p50' and 'p95' in seconds
+        """
+        with self._lock:
+            samples = {name: sorted(values) for name, values in self._stages.items()}
+        
+        return {
+            name: {"count": len(values), "p50": _percentile(values, 0.5), "p95": _percentile(values, 0.95)}
+            for name, values in sorted(samples.items())
+        }
+    
+    def token_totals(self):
+        """
+        Token counts summed over all recorded responses
+        
+        Returns:
+            dict: Totals by usage field
+        """
+        with self._lock:
+            return dict(self._tokens)
+    
+    def recent_turns(self):
+        """
+        Most recently finished turns, oldest first
+        
+        Returns:
+            list: Turn records
+        """
+        with self._lock:
+            return list(self._turns)
+    
+    def export_prometheus(self):
+        """
+        Render all metrics in the Prometheus text exposition format
+        
+        Returns:
+            str: Metrics text
+        """
+        summary = self.stage_summary()
+        
+        with self._lock:
+            totals = {name: list(values) for name, values in self._stage_totals.items()}
+            tokens = dict(self._tokens)
+            counters = dict(self._counters)
+        
+        lines = ["# TYPE draco_stage_seconds summary"]
+        for name, stats in summary.items():
+            lines.append(f'draco_stage_seconds{{stage="{name}",quantile="0.5"}} {stats["p50"]:.6f}')
+            lines.append(f'draco_stage_seconds{{stage="{name}",quantile="0.95"}} {stats["p95"]:.6f}')
+            lines.append(f'draco_stage_seconds_count{{stage="{name}"}} {totals[name][0]}')
+            lines.append(f'draco_stage_seconds_sum{{stage="{name}"}} {totals[name][1]:.6f}')
+        
+        lines.append("# TYPE draco_tokens_total counter")
+        for field, count in sorted(tokens.items()):
+            lines.append(f'draco_tokens_total{{type="{field}"}} {count}')
+        
+        for name, value in sorted(counters.items()):
+            lines.append(f"# TYPE draco_{name} counter")
+            lines.append(f"draco_{name} {value:g}")
+        
+        for prefix, values in self.collect().items():
+            for name, value in sorted(values.items()):
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                lines.append(f"draco_{prefix}_{name} {value:g}")
+        
+        return "\n".join(lines) + "\n"
+
+
+tracer = Tracer()
+
+_server = None
+_server_lock = threading.Lock()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """Serves /metrics in Prometheus format and /turns as JSONL"""
+    
+    def do_GET(self):
+        if self.path == "/metrics":
+            body = tracer.export_prometheus().encode("utf-8")
+            content_type = "text/plain; version=0.0.4"
+        elif self.path == "/turns":
+            body = "".join(
+                json.dumps(turn, ensure_ascii=False, default=str) + "\n" for turn in tracer.recent_turns()
+            ).encode("utf-8")
+            content_type = "application/x-ndjson"
+        else:
+            self.send_error(404)
+            return
+        
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port, host=METRICS_HOST):
+    """
+    Serve metrics over HTTP from a daemon thread, once per process
+    
+    The server has no authentication; bind it to a non-loopback host only
+    behind a network boundary that limits who can reach it.
+    
+    Args:
+        port (int): Port to listen on
+        host (str): Interface to bind, loopback by default
+    """
+    global _server
+    
+    with _server_lock:
+        if _server is not None:
+            return
+        _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
@@ -1,10 +1,21 @@
 """
 Reusable UI components for the Streamlit app
 """
+import re
+
 import streamlit as st
+from config import ADMIN_METRICS_ENABLED, HISTORY_PAGE_SIZE, BATCH_UI_REFRESH_SECONDS
 from language_utils import (
     JURISDICTION_MAP, SPECIALTY_MAP, UI_TRANSLATIONS, FOCUS_OPTIONS
 )
+from tracing import tracer
+from extraction import timeline, service_defects, filter_facts, count_authorities
+
+
+JURISDICTION_OPTIONS = ["Greek", "USA (Federal)", "UK", "European Union"]
+
+# Unescaped dollar signs, which Streamlit would typeset as LaTeX
+_DOLLAR_RE = re.compile(r"(?<!\\)\$")
 
 
 def render_custom_css():
@@ -39,12 +50,14 @@ def render_language_toggle(current_language):
             st.rerun()
 
 
-def render_sidebar(is_greek):
+def render_sidebar(is_greek, matters=None, current_matter=None):
     """
     Render the sidebar with settings
     
     Args:
         is_greek (bool): Whether UI is in Greek
+        matters (list): Saved matters to offer, or None to hide the picker
+        current_matter (str): ID of the matter open in this session
         
     Returns:
         dict: Dictionary containing user settings
@@ -57,10 +70,25 @@ def render_sidebar(is_greek):
         render_language_toggle(st.session_state.ui_language)
         st.markdown("---")
         
+        # Matter picker: reopen a saved conversation or start a new one
+        matter_id = current_matter
+        if matters is not None:
+            titles = {matter["id"]: matter["title"] for matter in matters}
+            options = [None] + list(titles)
+            if current_matter and current_matter not in titles:
+                # Open matter fell outside the listed most recent ones
+                options.insert(1, current_matter)
+            matter_id = st.selectbox(
+                UI_TRANSLATIONS["matter"]["el" if is_greek else "en"],
+                options,
+                index=options.index(current_matter),
+                format_func=lambda x: titles.get(x, x) if x else UI_TRANSLATIONS["new_matter"]["el" if is_greek else "en"]
+            )
+        
         # Jurisdiction selection
         jurisdiction = st.selectbox(
             UI_TRANSLATIONS["jurisdiction"]["el" if is_greek else "en"],
-            ["Greek", "USA (Federal)", "UK", "European Union"],
+            JURISDICTION_OPTIONS,
             format_func=lambda x: JURISDICTION_MAP.get(x, x) if is_greek else x
         )
         
@@ -95,6 +123,28 @@ def render_sidebar(is_greek):
                 focus_options,
                 default=default_focus
             )
+            
+            # Retrieval mode: send cited passages instead of whole PDFs
+            retrieval_mode = st.checkbox(
+                UI_TRANSLATIONS["retrieval"]["el" if is_greek else "en"]
+            )
+            
+            # Comparative mode: answer under several jurisdictions at once
+            compare_jurisdictions = []
+            if st.checkbox(UI_TRANSLATIONS["compare"]["el" if is_greek else "en"]):
+                compare_jurisdictions = st.multiselect(
+                    UI_TRANSLATIONS["compare_with"]["el" if is_greek else "en"],
+                    JURISDICTION_OPTIONS,
+                    default=["Greek", "European Union", "UK"],
+                    format_func=lambda x: JURISDICTION_MAP.get(x, x) if is_greek else x
+                )
+            
+            # Batch mode: the same document analysis over many files
+            batch_mode = st.checkbox(UI_TRANSLATIONS["batch_mode"]["el" if is_greek else "en"])
+        
+        # Operator view of latency and token metrics
+        if ADMIN_METRICS_ENABLED:
+            render_admin_metrics(is_greek)
         
         # Logout button
         if st.button(UI_TRANSLATIONS["logout"]["el" if is_greek else "en"]):
@@ -106,20 +156,235 @@ def render_sidebar(is_greek):
         "specialty": specialty,
         "uploaded_files": uploaded_files,
         "analysis_depth": analysis_depth,
-        "focus_area": focus_area
+        "focus_area": focus_area,
+        "retrieval_mode": retrieval_mode,
+        "compare_jurisdictions": compare_jurisdictions,
+        "batch_mode": batch_mode,
+        "matter_id": matter_id
     }
 
 
-def render_chat_history(messages):
+def render_admin_metrics(is_greek):
+    """
+    Display per-stage latency percentiles, token totals and pool gauges
+    
+    Args:
+        is_greek (bool): Whether UI is in Greek
+    """
+    with st.expander(UI_TRANSLATIONS["metrics"]["el" if is_greek else "en"]):
+        stages = tracer.stage_summary()
+        if stages:
+            st.dataframe(
+                [
+                    {
+                        "stage": name,
+                        "count": stats["count"],
+                        "p50 (ms)": round(stats["p50"] * 1000, 1),
+                        "p95 (ms)": round(stats["p95"] * 1000, 1)
+                    }
+                    for name, stats in stages.items()
+                ],
+                hide_index=True
+            )
+        
+        st.json(tracer.token_totals())
+        st.json(tracer.collect())
+        
+        st.download_button(
+            "metrics.prom",
+            tracer.export_prometheus(),
+            file_name="metrics.prom",
+            mime="text/plain"
+        )
+
+
+def display_markdown(content):
+    """
+    Prepare message text for display
+    
+    Args:
+        content (str): Message text as stored
+        
+    Returns:
+        str: Markdown with currency amounts protected from math rendering
+    """
+    return _DOLLAR_RE.sub(r"\\$", content)
+
+
+def display_stream(chunks):
+    """
+    Prepare streamed message text for display, chunk by chunk
+    
+    Args:
+        chunks (iterable): Text chunks as produced by the model
+        
+    Yields:
+        str: Chunks escaped as display_markdown() escapes the whole text, so
+            a live answer renders the same as it does from history
+    """
+    after_backslash = False
+    
+    for chunk in chunks:
+        if not chunk:
+            continue
+        # A backslash ending the previous chunk already escapes a leading dollar
+        if after_backslash and chunk.startswith("$"):
+            yield "$" + display_markdown(chunk[1:])
+        else:
+            yield display_markdown(chunk)
+        after_backslash = chunk.endswith("\\")
+
+
+def _show_earlier_messages():
+    """Widen the rendered history window by one page"""
+    st.session_state.history_visible += HISTORY_PAGE_SIZE
+
+
+def render_chat_history(messages, visible_count=None):
     """
     Display chat message history
     
+    Only the most recent messages are rendered; a button reveals earlier
+    pages.
+    
     Args:
         messages (list): List of message dictionaries
+        visible_count (int): Number of most recent messages to render, all if None
     """
-    for message in messages:
+    hidden = max(0, len(messages) - visible_count) if visible_count is not None else 0
+    
+    if hidden:
+        st.button(
+            UI_TRANSLATIONS["load_earlier"]["el" if st.session_state.ui_language == "el" else "en"]
+            + f" ({hidden})",
+            on_click=_show_earlier_messages
+        )
+    
+    for message in messages[hidden:]:
         with st.chat_message(message["role"]):
-            st.markdown(message["content"])
+            st.markdown(display_markdown(message["content"]))
+
+
+def render_comparison(results, is_greek):
+    """
+    Display per-jurisdiction answers side by side
+    
+    Args:
+        results (dict): Per jurisdiction, a dict with 'text', 'error' and 'latency'
+        is_greek (bool): Whether UI is in Greek
+    """
+    columns = st.columns(len(results))
+    
+    for column, (jurisdiction, result) in zip(columns, results.items()):
+        with column:
+            st.subheader(JURISDICTION_MAP.get(jurisdiction, jurisdiction) if is_greek else jurisdiction)
+            if result["error"]:
+                st.error(result["error"])
+            else:
+                st.markdown(display_markdown(result["text"]))
+            st.caption(f"{result['latency']:.1f}s")
+
+
+def format_comparison(results, is_greek):
+    """
+    Combine per-jurisdiction answers into one chat message
+    
+    Args:
+        results (dict): Per jurisdiction, a dict with 'text', 'error' and 'latency'
+        is_greek (bool): Whether UI is in Greek
+        
+    Returns:
+        str: Markdown with one section per jurisdiction
+    """
+    sections = []
+    
+    for jurisdiction, result in results.items():
+        title = JURISDICTION_MAP.get(jurisdiction, jurisdiction) if is_greek else jurisdiction
+        sections.append(f"### {title}\n\n{result['text'] or result['error']}")
+    
+    return "\n\n".join(sections)
+
+
+def render_batch_results(review, is_greek):
+    """
+    Display a finished batch review as a table with a CSV download
+    
+    Args:
+        review (BatchReview): Finished review
+        is_greek (bool): Whether UI is in Greek
+    """
+    if review.error:
+        st.error(review.error)
+    
+    st.dataframe(review.rows(), hide_index=True)
+    st.download_button(
+        UI_TRANSLATIONS["batch_download"]["el" if is_greek else "en"],
+        review.to_csv(),
+        file_name=f"review-{review.id[:8]}.csv",
+        mime="text/csv",
+        key=f"download-{review.id}"
+    )
+
+
+def render_extraction(records, is_greek):
+    """
+    Display extraction records aggregated across documents
+    
+    Args:
+        records (list): ExtractionRecord objects
+        is_greek (bool): Whether UI is in Greek
+    """
+    language = "el" if is_greek else "en"
+    timeline_tab, service_tab, facts_tab, authorities_tab = st.tabs([
+        UI_TRANSLATIONS["extract_timeline"][language],
+        UI_TRANSLATIONS["extract_service"][language],
+        UI_TRANSLATIONS["extract_facts"][language],
+        UI_TRANSLATIONS["extract_authorities"][language]
+    ])
+    
+    with timeline_tab:
+        st.dataframe(timeline(records), hide_index=True)
+    
+    with service_tab:
+        st.dataframe(service_defects(records), hide_index=True)
+    
+    with facts_tab:
+        status = st.selectbox(
+            UI_TRANSLATIONS["extract_status"][language],
+            [None, "alleged", "proven", "legal_conclusion"],
+            format_func=lambda x: "—" if x is None else x
+        )
+        st.dataframe(filter_facts(records, status), hide_index=True)
+    
+    with authorities_tab:
+        st.dataframe(count_authorities(records), hide_index=True)
+    
+    st.download_button(
+        UI_TRANSLATIONS["extract_download"][language],
+        "[" + ",".join(record.model_dump_json() for record in records) + "]",
+        file_name="extraction.json",
+        mime="application/json"
+    )
+
+
+@st.fragment(run_every=BATCH_UI_REFRESH_SECONDS)
+def render_batch_progress(review, is_greek):
+    """
+    Display progress of a running batch review, refreshing on a timer
+    
+    Args:
+        review (BatchReview): Review in progress
+        is_greek (bool): Whether UI is in Greek
+    """
+    if review.done:
+        # Rerun the page so the results replace the progress bar
+        st.rerun()
+    
+    done, total = review.progress
+    st.progress(
+        done / total if total else 0.0,
+        text=UI_TRANSLATIONS["batch_progress"]["el" if is_greek else "en"].format(done=done, total=total)
+    )
 
 
 def get_chat_placeholder(is_greek):
@@ -135,6 +400,19 @@ def get_chat_placeholder(is_greek):
     return UI_TRANSLATIONS["placeholder"]["el" if is_greek else "en"]
 
 
+def get_busy_text(is_greek):
+    """
+    Get the message shown when a request is rejected for back-pressure
+    
+    Args:
+        is_greek (bool): Whether UI is in Greek
+        
+    Returns:
+        str: Busy message
+    """
+    return UI_TRANSLATIONS["busy"]["el" if is_greek else "en"]
+
+
 def get_spinner_text(is_greek):
     """
     Get the loading spinner text